@@ -0,0 +1,46 @@
+# backend/authentication/authentication.py
+from rest_framework import exceptions
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from task_manager import query_budgets, routers, timing
+
+from .token_cache import token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """トークン認証（token_cache にヒットした場合はデータベースを参照しない）"""
+
+    def authenticate(self, request):
+        with timing.phase('auth'), query_budgets.unbudgeted():
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is not None:
+            token = Token(key=key, user=user)
+            token._state.adding = False
+        else:
+            # 無効なトークン・無効化されたユーザーは例外になりキャッシュされない
+            try:
+                user, token = super().authenticate_credentials(key)
+            except exceptions.AuthenticationFailed:
+                if not routers.get_replicas():
+                    raise
+                # 発行直後のトークンがレプリカにまだ無い場合
+                with routers.use_primary():
+                    user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user)
+        routers.set_user(user.pk)
+        return (user, token)
+
+
+class RoutedSessionAuthentication(SessionAuthentication):
+    """セッション認証（トークン認証と同じく、シャード・レプリカの振り分けにユーザーを設定）"""
+
+    def authenticate(self, request):
+        with timing.phase('auth'), query_budgets.unbudgeted():
+            result = super().authenticate(request)
+        if result is not None:
+            routers.set_user(result[0].pk)
+        return result
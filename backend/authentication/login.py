@@ -0,0 +1,173 @@
+# backend/authentication/login.py
+"""ログイン処理
+
+パスワードハッシュの検証は PasswordGate で同時に計算する数と待ち行列の長さを制限する。
+あふれた場合は待たずに 429 を返し、ログインが集中してもリクエストスレッドが
+ハッシュ計算の順番待ちで埋まらないようにする。
+トークンのみのログインではセッションを作らず、last_login の更新を
+LastLoginRecorder でまとめて 1 回の UPDATE にする。
+"""
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import authenticate as django_authenticate
+from django.contrib.auth import get_user_model, user_login_failed
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import connections
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+from rest_framework import exceptions
+
+from .token_cache import token_cache
+
+DEFAULTS = {
+    # False にするとログイン時にセッションを作成しない（リクエストの session で上書き可）
+    'SESSION': True,
+    'PASSWORD_WORKERS': 4,
+    'PASSWORD_QUEUE_SIZE': 32,
+    'LAST_LOGIN_FLUSH_INTERVAL': 30,
+    'LAST_LOGIN_MAX_PENDING': 1000,
+}
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+# user_login_failed に渡す資格情報のパスワード（django.contrib.auth と同じ置き換え）
+CLEANSED_PASSWORD = '********************'
+
+
+def get_option(name):
+    return {**DEFAULTS, **getattr(settings, 'LOGIN_OPTIONS', {})}[name]
+
+
+class PasswordGate:
+    """パスワードハッシュ計算の同時実行数の制限（アドミッション制御）
+
+    ハッシュ計算は呼び出し元のスレッドで行う（別スレッドに渡しても結果を待つ間は
+    呼び出し元が塞がるため）。同時に計算するのは workers 件まで、それを超えた分は
+    queue_size 件まで順番を待ち、さらにあふれた分は待たずに Throttled にする。
+    """
+
+    busy_message = 'ログインが混み合っています。しばらくしてから再度お試しください。'
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.running = threading.BoundedSemaphore(workers)
+
+    def run(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            raise exceptions.Throttled(detail=self.busy_message)
+        try:
+            with self.running:
+                return func(*args)
+        finally:
+            self.slots.release()
+
+
+class LastLoginRecorder:
+    """last_login の更新をためて、一定間隔・一定件数ごとに 1 回の UPDATE で書き込む
+
+    最初にためた更新から interval 秒後にはタイマーのスレッドが書き込むため、
+    次のログインが無くても遅れは interval 秒まで。プロセス終了時にも書き込むが、
+    異常終了した場合は未書き込みの分が失われる。
+    """
+
+    def __init__(self, interval, max_pending):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending = {}
+        self.flushed_at = time.monotonic()
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def record(self, user):
+        now = timezone.now()
+        user.last_login = now
+        with self.lock:
+            self.pending[user.pk] = now
+            due = (
+                len(self.pending) >= self.max_pending
+                or time.monotonic() - self.flushed_at >= self.interval
+            )
+            if not due and self.timer is None:
+                self.timer = threading.Timer(self.interval, self.flush_in_background)
+                self.timer.daemon = True
+                self.timer.start()
+        if due:
+            self.flush()
+
+    def flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            # タイマーのスレッドで開いた接続を閉じる
+            connections.close_all()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed_at = time.monotonic()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not pending:
+            return
+        get_user_model()._default_manager.filter(pk__in=pending).update(
+            last_login=Case(
+                *[When(pk=pk, then=Value(value)) for pk, value in pending.items()],
+                output_field=DateTimeField()
+            )
+        )
+        # QuerySet.update は post_save を送らないため、キャッシュを直接無効化する
+        for pk in pending:
+            token_cache.invalidate_user(pk)
+
+
+password_gate = PasswordGate(get_option('PASSWORD_WORKERS'), get_option('PASSWORD_QUEUE_SIZE'))
+last_login_recorder = LastLoginRecorder(
+    get_option('LAST_LOGIN_FLUSH_INTERVAL'), get_option('LAST_LOGIN_MAX_PENDING')
+)
+atexit.register(last_login_recorder.flush)
+
+
+def authenticate(request=None, username=None, password=None):
+    """django.contrib.auth.authenticate と同じ結果を返す（ハッシュ計算は password_gate で制限）
+
+    失敗時は同じく user_login_failed シグナルを送る。
+    ModelBackend 以外の認証バックエンドが設定されている場合はそのまま委譲する。
+    """
+    if list(settings.AUTHENTICATION_BACKENDS) != [MODEL_BACKEND]:
+        return django_authenticate(request, username=username, password=password)
+
+    user = authenticate_model_user(username, password)
+    if user is None:
+        user_login_failed.send(
+            sender=auth.__name__,
+            credentials={'username': username, 'password': CLEANSED_PASSWORD},
+            request=request,
+        )
+    return user
+
+
+def authenticate_model_user(username, password):
+    UserModel = get_user_model()
+    try:
+        user = UserModel._default_manager.get_by_natural_key(username)
+    except UserModel.DoesNotExist:
+        # ユーザーの有無で応答時間が変わらないように同じ計算を行う
+        password_gate.run(make_password, password)
+        return None
+
+    # ハッシュ方式の更新が必要な場合の保存もリクエストスレッドで行う
+    outdated = []
+    if not password_gate.run(check_password, password, user.password, outdated.append):
+        return None
+    if outdated:
+        user.set_password(password)
+        user.save(update_fields=['password'])
+    if not ModelBackend().user_can_authenticate(user):
+        return None
+    user.backend = MODEL_BACKEND
+    return user
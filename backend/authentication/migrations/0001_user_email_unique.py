@@ -0,0 +1,52 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+# 大文字小文字を区別しないメールアドレスの一意制約（未入力の空文字は対象外）
+EMAIL_INDEX = 'auth_user_email_ci_uniq'
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """インデックス作成前に、大文字小文字だけが異なる重複メールアドレスを報告して中断
+
+    どのアカウントを残すかは運用判断のため自動では解消しない。
+    一覧のユーザーのメールアドレスを修正してから再度 migrate する。
+    """
+    User = apps.get_model('auth', 'User')
+    duplicates = (
+        User.objects.using(schema_editor.connection.alias)
+        .exclude(email='')
+        .values(address=Lower('email'))
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .order_by('address')
+    )
+    lines = [
+        f"{row['address']}: " + ', '.join(
+            User.objects.using(schema_editor.connection.alias)
+            .filter(email__iexact=row['address'])
+            .order_by('id')
+            .values_list('username', flat=True)
+        )
+        for row in duplicates
+    ]
+    if lines:
+        raise RuntimeError(
+            '大文字小文字だけが異なる重複メールアドレスがあるため、一意インデックスを作成できません。\n'
+            + '\n'.join(lines)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.RunSQL(
+            f"CREATE UNIQUE INDEX {EMAIL_INDEX} ON auth_user (LOWER(email)) WHERE email <> ''",
+            f'DROP INDEX IF EXISTS {EMAIL_INDEX}',
+        ),
+    ]
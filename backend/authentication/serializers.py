@@ -1,12 +1,36 @@
 # backend/authentication/serializers.py
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from django.contrib.auth import authenticate
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
 from django.contrib.auth.password_validation import validate_password
+from task_manager import timing
+from task_manager.timing import TimedSerializerMixin
+from .login import authenticate
+
+# マイグレーション 0001 で作成するメールアドレスの一意インデックス
+EMAIL_UNIQUE_INDEX = 'auth_user_email_ci_uniq'
+DUPLICATE_USERNAME_MESSAGE = "このユーザー名は既に使用されています。"
+DUPLICATE_EMAIL_MESSAGE = "このメールアドレスは既に使用されています。"
+
+
+def unique_violation(exc):
+    """一意制約違反の IntegrityError をフィールドのエラーに変換（該当しなければそのまま）"""
+    message = str(exc)
+    if EMAIL_UNIQUE_INDEX in message:
+        return serializers.ValidationError({'email': [DUPLICATE_EMAIL_MESSAGE]})
+    if 'username' in message:
+        return serializers.ValidationError({'username': [DUPLICATE_USERNAME_MESSAGE]})
+    return exc
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
-    """ユーザー登録シリアライザー"""
+    """ユーザー登録シリアライザー
+    
+    ユーザー名・メールアドレスの重複は事前に問い合わせず、データベースの
+    一意制約（メールアドレスは大文字小文字を区別しない）で検出する。
+    """
     
     password = serializers.CharField(write_only=True, validators=[validate_password])
     password_confirm = serializers.CharField(write_only=True)
@@ -14,6 +38,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['username', 'email', 'password', 'password_confirm']
+        # 既定の UniqueValidator は exists() クエリを発行するため外す
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
     
     def validate(self, attrs):
         """パスワード確認のバリデーション"""
@@ -21,22 +47,15 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("パスワードが一致しません。")
         return attrs
     
-    def validate_username(self, value):
-        """ユーザー名の重複チェック"""
-        if User.objects.filter(username=value).exists():
-            raise serializers.ValidationError("このユーザー名は既に使用されています。")
-        return value
-    
-    def validate_email(self, value):
-        """メールアドレスの重複チェック"""
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError("このメールアドレスは既に使用されています。")
-        return value
-    
     def create(self, validated_data):
-        """ユーザー作成"""
+        """ユーザーとトークンを 1 トランザクションで作成"""
         validated_data.pop('password_confirm')
-        user = User.objects.create_user(**validated_data)
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(**validated_data)
+                Token.objects.create(user=user)
+        except IntegrityError as exc:
+            raise unique_violation(exc) from exc
         return user
 
 
@@ -45,6 +64,8 @@ class UserLoginSerializer(serializers.Serializer):
     
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
+    # False の場合はセッションを作らずトークンのみ発行する（省略時は LOGIN_OPTIONS['SESSION']）
+    session = serializers.BooleanField(required=False, allow_null=True, default=None)
     
     def validate(self, attrs):
         """認証情報の検証"""
@@ -52,7 +73,10 @@ class UserLoginSerializer(serializers.Serializer):
         password = attrs.get('password')
         
         if username and password:
-            user = authenticate(username=username, password=password)
+            with timing.phase('auth'):
+                user = authenticate(
+                    self.context.get('request'), username=username, password=password
+                )
             if not user:
                 raise serializers.ValidationError("ユーザー名またはパスワードが間違っています。")
             if not user.is_active:
@@ -63,10 +87,18 @@ class UserLoginSerializer(serializers.Serializer):
             raise serializers.ValidationError("ユーザー名とパスワードを入力してください。")
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """ユーザー情報シリアライザー"""
     
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'date_joined', 'last_login']
-        read_only_fields = ['id', 'date_joined', 'last_login']
\ No newline at end of file
+        read_only_fields = ['id', 'date_joined', 'last_login']
+    
+    def update(self, instance, validated_data):
+        """メールアドレスの重複はデータベースの一意制約で検出"""
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError as exc:
+            raise unique_violation(exc) from exc
@@ -0,0 +1,20 @@
+# backend/authentication/signals.py
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .token_cache import token_cache
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token_cache_on_token_delete(sender, instance, **kwargs):
+    """トークン削除（ログアウト）時にキャッシュを削除"""
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_token_cache_on_user_change(sender, instance, **kwargs):
+    """ユーザー更新・削除時にキャッシュ済みのスナップショットを削除"""
+    token_cache.invalidate_user(instance.pk)
@@ -1,12 +1,28 @@
 # backend/authentication/tests.py
+import importlib
+import threading
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.signals import user_login_failed
+from django.contrib.sessions.models import Session
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 
+from rest_framework.exceptions import Throttled
+
+from task_manager.query_budgets import enforce_query_budgets
+from .login import LastLoginRecorder, PasswordGate, last_login_recorder
+from .token_cache import TokenCache, token_cache
 
+
+@enforce_query_budgets()
 class UserRegistrationTest(APITestCase):
     """ユーザー登録の単体テスト"""
     
@@ -51,8 +67,71 @@ class UserRegistrationTest(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(User.objects.count(), 1)
+    
+    def test_single_insert(self):
+        """重複チェックの SELECT を発行せず、ユーザーとトークンを挿入するだけ"""
+        url = reverse('user-register')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, self.registration_data)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statements = [
+            query['sql'] for query in queries.captured_queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+        ]
+        self.assertEqual(len(statements), 2)
+        self.assertTrue(all(sql.startswith('INSERT') for sql in statements))
+        self.assertEqual(Token.objects.get().key, response.data['token'])
+    
+    def test_duplicate_username_message(self):
+        """ユーザー名の重複は従来と同じメッセージ"""
+        User.objects.create_user(username='testuser', password='password123')
+        
+        response = self.client.post(reverse('user-register'), self.registration_data)
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['username'], ['このユーザー名は既に使用されています。'])
+        self.assertFalse(Token.objects.exists())
+    
+    def test_duplicate_email_case_insensitive(self):
+        """メールアドレスは大文字小文字を区別せずに重複を検出する"""
+        User.objects.create_user(
+            username='existing',
+            email='Test@Example.com',
+            password='password123'
+        )
+        
+        response = self.client.post(reverse('user-register'), self.registration_data)
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['email'], ['このメールアドレスは既に使用されています。'])
+        self.assertEqual(User.objects.count(), 1)
+    
+    def test_blank_email_not_unique(self):
+        """メールアドレス未入力のユーザーは複数登録できる"""
+        User.objects.create_user(username='existing', password='password123')
+        self.registration_data['email'] = ''
+        
+        response = self.client.post(reverse('user-register'), self.registration_data)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+    
+    def test_migration_reports_duplicate_emails(self):
+        """既存データに大文字小文字違いの重複があれば、インデックス作成前に一覧を示して中断"""
+        migration = importlib.import_module('authentication.migrations.0001_user_email_unique')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX {migration.EMAIL_INDEX}')
+        User.objects.create_user(username='first', email='Foo@Example.com', password='password123')
+        User.objects.create_user(username='second', email='foo@example.com', password='password123')
+        User.objects.create_user(username='third', email='', password='password123')
+        User.objects.create_user(username='fourth', email='', password='password123')
+        schema_editor = mock.Mock(connection=connection)
+        
+        with self.assertRaisesMessage(RuntimeError, 'foo@example.com: first, second'):
+            migration.check_duplicate_emails(apps, schema_editor)
 
 
+@enforce_query_budgets()
 class UserLoginTest(APITestCase):
     """ユーザーログインの結合テスト"""
     
@@ -75,6 +154,8 @@ class UserLoginTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue('token' in response.data)
         self.assertTrue('user' in response.data)
+        # パスワード検証の時間は Server-Timing の auth に入る
+        self.assertIn('auth;dur=', response['Server-Timing'])
     
     def test_invalid_credentials(self):
         """不正な認証情報テスト"""
@@ -91,8 +172,92 @@ class UserLoginTest(APITestCase):
         response = self.client.post(url, {'username': 'testuser'})
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_session_login(self):
+        """既定ではセッションを作成する"""
+        response = self.client.post(reverse('user-login'), self.login_data)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('sessionid', response.cookies)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+    
+    def test_token_only_login(self):
+        """session: false ではユーザー取得とトークン取得の 2 クエリのみ"""
+        Token.objects.create(user=self.user)
+        self.addCleanup(last_login_recorder.flush)
+        self.login_data['session'] = False
+        with mock.patch.object(last_login_recorder, 'interval', 3600):
+            with self.assertNumQueries(2):
+                response = self.client.post(
+                    reverse('user-login'), self.login_data, format='json'
+                )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('sessionid', response.cookies)
+        self.assertFalse(Session.objects.exists())
+        self.assertIsNotNone(response.data['user']['last_login'])
+        
+        last_login_recorder.flush()
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+    
+    def test_inactive_user(self):
+        """無効なユーザーはログインできない"""
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.post(reverse('user-login'), self.login_data)
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_password_gate_full(self):
+        """パスワード検証の待ち行列があふれた場合は 429"""
+        gate = PasswordGate(workers=1, queue_size=0)
+        gate.slots.acquire()
+        with self.assertRaises(Throttled):
+            gate.run(len, 'password')
+        gate.slots.release()
+        self.assertEqual(gate.run(len, 'password'), 8)
+    
+    def test_login_failed_signal(self):
+        """ログインに失敗した場合は user_login_failed を送る"""
+        received = []
+        
+        def receiver(sender, credentials, **kwargs):
+            received.append(credentials)
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+        
+        self.client.post(reverse('user-login'), {'username': 'testuser', 'password': 'wrong'})
+        self.client.post(reverse('user-login'), {'username': 'nobody', 'password': 'wrong'})
+        self.client.post(reverse('user-login'), self.login_data)
+        self.assertEqual([credentials['username'] for credentials in received], ['testuser', 'nobody'])
+        self.assertNotIn('wrong', received[0].values())
+    
+    def test_last_login_batched(self):
+        """last_login は件数上限に達した時点でまとめて書き込む"""
+        other = User.objects.create_user(username='other', password='testpass123')
+        recorder = LastLoginRecorder(interval=3600, max_pending=2)
+        
+        recorder.record(self.user)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+        
+        with self.assertNumQueries(1):
+            recorder.record(other)
+        self.assertEqual(User.objects.filter(last_login__isnull=False).count(), 2)
+        self.assertIsNone(recorder.timer)
+    
+    def test_last_login_timer(self):
+        """次のログインが無くても interval 秒後に書き込む"""
+        recorder = LastLoginRecorder(interval=0.01, max_pending=10)
+        flushed = threading.Event()
+        with mock.patch.object(recorder, 'flush', side_effect=flushed.set):
+            recorder.record(self.user)
+            self.assertTrue(flushed.wait(5))
 
 
+@enforce_query_budgets()
 class UserLogoutTest(APITestCase):
     """ユーザーログアウトテスト"""
     
@@ -119,4 +284,88 @@ class UserLogoutTest(APITestCase):
         url = reverse('user-logout')
         response = self.client.post(url)
         
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@enforce_query_budgets()
+class TokenCacheTest(APITestCase):
+    """トークン認証キャッシュのテスト"""
+    
+    def setUp(self):
+        token_cache.clear()
+        token_cache.cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('user-profile')
+    
+    def test_cache_hit_skips_query(self):
+        """2 回目以降の認証はデータベースを参照しない"""
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['username'], 'testuser')
+    
+    def test_shared_cache_hit(self):
+        """プロセス内 LRU に無くても共有キャッシュから復元する"""
+        self.client.get(self.url)
+        token_cache.clear()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['email'], 'test@example.com')
+    
+    def test_logout_invalidates(self):
+        """ログアウト後はキャッシュ済みのトークンでも認証できない"""
+        self.client.get(self.url)
+        self.client.post(reverse('user-logout'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_update_profile_invalidates(self):
+        """プロフィール更新後は新しい値で認証される"""
+        self.client.get(self.url)
+        self.client.put(reverse('update-profile'), {'email': 'new@example.com'})
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['email'], 'new@example.com')
+        # パスワードなど他のカラムはスナップショットで上書きされない
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('testpass123'))
+    
+    def test_deactivated_user(self):
+        """無効化されたユーザーはキャッシュがあっても認証できない"""
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_snapshot_excludes_password(self):
+        """共有キャッシュのスナップショットにパスワードのハッシュを含めない"""
+        self.client.get(self.url)
+        _, values, _ = token_cache.cache.get(token_cache.key_prefix + self.token.key)
+        self.assertNotIn(self.user.password, values)
+        user = token_cache.get(self.token.key)
+        self.assertEqual(user.get_deferred_fields(), {'password', 'first_name', 'last_name'})
+        self.assertTrue(user.check_password('testpass123'))
+    
+    def test_logout_invalidates_other_process(self):
+        """別プロセスの LRU にあるトークンもログアウト後は使えない"""
+        other = TokenCache()
+        self.client.get(self.url)
+        self.assertIsNotNone(other.get(self.token.key))
+        self.client.post(reverse('user-logout'))
+        self.assertIn(self.token.key, other.local)
+        self.assertIsNone(other.get(self.token.key))
+        self.assertNotIn(self.token.key, other.local)
+    
+    def test_local_entries_bounded(self):
+        """プロセス内 LRU は件数上限を超えると古いものから捨てる"""
+        cache = TokenCache({'LOCAL_MAX_ENTRIES': 2})
+        for key in ('a', 'b', 'c'):
+            cache.set_local(key, ('default', (), ''))
+        self.assertEqual(list(cache.local), ['b', 'c'])
@@ -0,0 +1,142 @@
+# backend/authentication/token_cache.py
+"""トークン → ユーザーのキャッシュ
+
+プロセス内の LRU（件数上限 + TTL）と Django のキャッシュフレームワークの
+2 段構成。トークン削除・ユーザー更新時はシグナルで両方から削除する
+（authentication.signals）。LRU のエントリーは共有キャッシュのバージョンキーと
+照合してから使うため、別プロセスでのログアウトも次のリクエストから反映される
+（プロセス間で失効させるには CACHE_ALIAS にプロセス間で共有されるキャッシュを指定する）。
+スナップショットにはパスワードのハッシュなど CACHED_FIELDS 以外のカラムを含めない。
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+from task_manager import metrics
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_TIMEOUT': 30,
+    'LOCAL_MAX_ENTRIES': 10000,
+}
+
+# 認証とプロフィールの表示に使うカラム（それ以外は参照時にデータベースから読む）
+CACHED_FIELDS = (
+    'id', 'username', 'email', 'is_active', 'is_staff', 'is_superuser',
+    'date_joined', 'last_login',
+)
+
+
+class TokenCache:
+    """トークンキーからユーザーのスナップショット（CACHED_FIELDS の値）を引くキャッシュ"""
+
+    key_prefix = 'auth:token:'
+    version_prefix = 'auth:token-version:'
+    user_prefix = 'auth:token-user:'
+
+    def __init__(self, options=None):
+        options = {**DEFAULTS, **(options or {})}
+        self.cache_alias = options['CACHE_ALIAS']
+        self.timeout = options['TIMEOUT']
+        self.local_timeout = options['LOCAL_TIMEOUT']
+        self.local_max_entries = options['LOCAL_MAX_ENTRIES']
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get(self, key):
+        """キャッシュされたユーザー（毎回新しいインスタンス）を返す。無ければ None"""
+        snapshot = self.get_local(key)
+        if snapshot is not None and self.cache.get(self.version_prefix + key) != snapshot[2]:
+            # 別プロセスで失効・更新された
+            with self.lock:
+                self.local.pop(key, None)
+            snapshot = None
+        metrics.record_cache('token_local', snapshot is not None)
+        if snapshot is None:
+            snapshot = self.cache.get(self.key_prefix + key)
+            metrics.record_cache('token_shared', snapshot is not None)
+            if snapshot is None:
+                return None
+            self.set_local(key, snapshot)
+        db, values, _ = snapshot
+        return get_user_model().from_db(db, self.attnames(), values)
+
+    def set(self, key, user):
+        snapshot = (
+            user._state.db,
+            tuple(getattr(user, attname) for attname in self.attnames()),
+            uuid.uuid4().hex,
+        )
+        self.set_local(key, snapshot)
+        self.cache.set_many({
+            self.key_prefix + key: snapshot,
+            self.version_prefix + key: snapshot[2],
+            self.user_prefix + str(user.pk): key,
+        }, self.timeout)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.local.pop(key, None)
+        self.cache.delete_many([self.key_prefix + key, self.version_prefix + key])
+
+    def invalidate_user(self, user_id):
+        key = self.cache.get(self.user_prefix + str(user_id))
+        pk_index = self.attnames().index(get_user_model()._meta.pk.attname)
+        with self.lock:
+            stale = [
+                k for k, (_, (_, values, _)) in self.local.items() if values[pk_index] == user_id
+            ]
+            for k in stale:
+                del self.local[k]
+        if key is not None:
+            self.cache.delete_many([
+                self.key_prefix + key, self.version_prefix + key, self.user_prefix + str(user_id),
+            ])
+
+    @staticmethod
+    def attnames():
+        """スナップショットに含めるカラム（Model.from_db に渡すためモデルの定義順）"""
+        return [
+            field.attname for field in get_user_model()._meta.concrete_fields
+            if field.name in CACHED_FIELDS
+        ]
+
+    def clear(self):
+        with self.lock:
+            self.local.clear()
+
+    def get_local(self, key):
+        if not self.local_timeout:
+            return None
+        with self.lock:
+            entry = self.local.get(key)
+            if entry is None:
+                return None
+            expires, snapshot = entry
+            if expires < time.monotonic():
+                del self.local[key]
+                return None
+            self.local.move_to_end(key)
+            return snapshot
+
+    def set_local(self, key, snapshot):
+        if not self.local_timeout:
+            return
+        with self.lock:
+            self.local[key] = (time.monotonic() + self.local_timeout, snapshot)
+            self.local.move_to_end(key)
+            while len(self.local) > self.local_max_entries:
+                self.local.popitem(last=False)
+
+
+token_cache = TokenCache(getattr(settings, 'TOKEN_AUTH_CACHE', None))
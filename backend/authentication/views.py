@@ -5,9 +5,12 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import login, logout
+from task_manager.query_budgets import query_budget
+from .login import get_option, last_login_recorder
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserSerializer
 
 
+@query_budget(POST=2)
 class UserRegistrationView(generics.CreateAPIView):
     """ユーザー登録API"""
     
@@ -18,27 +21,36 @@ class UserRegistrationView(generics.CreateAPIView):
         """ユーザー登録とトークン発行"""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        # ユーザーとトークンを同じトランザクションで作成
         user = serializer.save()
         
-        # トークン作成
-        token, created = Token.objects.get_or_create(user=user)
-        
         return Response({
             'user': UserSerializer(user).data,
-            'token': token.key,
+            'token': user.auth_token.key,
             'message': 'ユーザー登録が完了しました。'
         }, status=status.HTTP_201_CREATED)
 
 
+@query_budget(7)
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def user_login(request):
-    """ユーザーログインAPI"""
-    serializer = UserLoginSerializer(data=request.data)
+    """ユーザーログインAPI
+    
+    session に false を指定するとセッションを作成せず、トークンのみを発行する。
+    """
+    serializer = UserLoginSerializer(data=request.data, context={'request': request})
     
     if serializer.is_valid():
         user = serializer.validated_data['user']
-        login(request, user)
+        session = serializer.validated_data['session']
+        if session is None:
+            session = get_option('SESSION')
+        if session:
+            login(request, user)
+        else:
+            # セッションの作成・保存を省き、last_login はまとめて更新する
+            last_login_recorder.record(user)
         
         # トークン取得または作成
         token, created = Token.objects.get_or_create(user=user)
@@ -55,6 +67,7 @@ def user_login(request):
     )
 
 
+@query_budget(4)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def user_logout(request):
@@ -72,6 +85,7 @@ def user_logout(request):
         })
 
 
+@query_budget(0)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_profile(request):
@@ -80,6 +94,7 @@ def user_profile(request):
     return Response(serializer.data)
 
 
+@query_budget(2)
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def update_profile(request):
@@ -0,0 +1,96 @@
+# backend/benchmarks/asgi_vs_wsgi.py
+"""同時リクエスト時のスループット比較: WSGI（同期ビュー）と ASGI（非同期ビュー）
+
+サーバーを介さずに WSGIHandler（スレッドプール）と ASGIHandler（asyncio）を
+同じ同時実行数で呼び出し、エンドポイントごとのスループットとレイテンシーを比較する。
+
+    python -m benchmarks.asgi_vs_wsgi --concurrency 16 --requests 1000
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import asgi_call, print_report, seed, setup_django, summarize, wsgi_call
+
+ENDPOINTS = {
+    'list': '/api/tasks/',
+    'detail': '/api/tasks/{task_id}/',
+    'statistics': '/api/tasks/statistics/',
+}
+
+
+def run_wsgi(path, headers, concurrency, total):
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIHandler
+
+    settings.ROOT_URLCONF = 'task_manager.urls'
+    handler = WSGIHandler()
+
+    def request(_):
+        start = time.perf_counter()
+        status, _ = wsgi_call(handler, 'GET', path, headers)
+        assert status == 200, status
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(request, range(total)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def run_asgi(path, headers, concurrency, total):
+    from django.conf import settings
+    from django.core.handlers.asgi import ASGIHandler
+
+    settings.ROOT_URLCONF = 'task_manager.asgi_urls'
+    application = ASGIHandler()
+    latencies = []
+
+    async def worker(remaining):
+        while remaining:
+            remaining.pop()
+            start = time.perf_counter()
+            status, _ = await asgi_call(application, 'GET', path, headers)
+            assert status == 200, status
+            latencies.append(time.perf_counter() - start)
+
+    async def main():
+        remaining = list(range(total))
+        await asyncio.gather(*(worker(remaining) for _ in range(concurrency)))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint and server type')
+    parser.add_argument('--tasks', type=int, default=200, help='Tasks owned by the benchmark user')
+    parser.add_argument('--database', help='SQLite file to use (default: temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.database)
+    (user, token), = seed(users=1, tasks_per_user=args.tasks)
+    from tasks.models import Task
+    task_id = Task.objects.filter(user=user).values_list('pk', flat=True).first()
+    headers = {'Authorization': f'Token {token.key}'}
+
+    report = {}
+    for name, path in ENDPOINTS.items():
+        path = path.format(task_id=task_id)
+        # ウォームアップ（統計カウンター行の作成など）
+        run_wsgi(path, headers, 1, 5)
+        report[name] = {
+            'wsgi': run_wsgi(path, headers, args.concurrency, args.requests),
+            'asgi': run_asgi(path, headers, args.concurrency, args.requests),
+        }
+    print_report(
+        f'concurrency={args.concurrency} requests={args.requests} tasks={args.tasks}', report
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+# backend/benchmarks/common.py
+"""ベンチマーク共通処理
+
+一時ディレクトリの SQLite ファイルに対して Django を初期化し、
+WSGI / ASGI ハンドラーをサーバーを介さずに直接呼び出す。
+"""
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(database_path=None, **settings_overrides):
+    """Django を初期化してマイグレーションを適用し、データベースのパスを返す"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'task_manager.settings')
+
+    import django
+    from django.conf import settings
+
+    if database_path is None:
+        database_path = os.path.join(tempfile.mkdtemp(prefix='task_manager_bench_'), 'bench.sqlite3')
+    django.setup()
+    settings.DATABASES['default']['NAME'] = database_path
+    for name, value in settings_overrides.items():
+        setattr(settings, name, value)
+    # 4xx のログ出力がベンチマークの計測に入らないようにする
+    import logging
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return database_path
+
+
+def seed(users=1, tasks_per_user=100, password='benchpass123'):
+    """ユーザー・トークン・タスクを作成し、(user, token) のリストを返す"""
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from rest_framework.authtoken.models import Token
+    from tasks.models import Task
+
+    hashed = make_password(password)
+    created = []
+    for i in range(users):
+        user = User.objects.create(username=f'bench{i}', email=f'bench{i}@example.com', password=hashed)
+        token = Token.objects.create(user=user)
+        Task.objects.bulk_create(
+            [
+                Task(user=user, title=f'ベンチマークタスク{j}', priority=('low', 'medium', 'high')[j % 3])
+                for j in range(tasks_per_user)
+            ],
+            batch_size=1000,
+        )
+        created.append((user, token))
+    return created
+
+
+def wsgi_call(handler, method, path, headers=None, body=b''):
+    """WSGI ハンドラーを 1 回呼び出して (ステータス, 本文) を返す"""
+    status, _, content = wsgi_request(handler, method, path, headers, body)
+    return status, content
+
+
+def wsgi_request(handler, method, path, headers=None, body=b''):
+    """WSGI ハンドラーを 1 回呼び出して (ステータス, ヘッダーの dict, 本文) を返す"""
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'HTTP_HOST': 'localhost',
+        'CONTENT_LENGTH': str(len(body)),
+        'CONTENT_TYPE': 'application/json',
+        'wsgi.input': io.BytesIO(body),
+    }
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    setup_testing_defaults(environ)
+    started = []
+    response = handler(environ, lambda s, h, exc_info=None: started.append((s, h)))
+    content = b''.join(response)
+    if hasattr(response, 'close'):
+        response.close()
+    status, response_headers = started[0]
+    return int(status.split()[0]), dict(response_headers), content
+
+
+async def asgi_call(application, method, path, headers=None, body=b''):
+    """ASGI アプリケーションを 1 回呼び出して (ステータス, 本文) を返す"""
+    path, _, query = path.partition('?')
+    header_list = [(b'host', b'localhost'), (b'content-type', b'application/json')]
+    for name, value in (headers or {}).items():
+        header_list.append((name.lower().encode(), value.encode()))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'headers': header_list,
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 50000),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status = []
+    chunks = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await application(scope, receive, send)
+    return status[0], b''.join(chunks)
+
+
+def summarize(latencies, elapsed):
+    """レイテンシー（秒）のリストからスループットとパーセンタイルを計算"""
+    latencies = sorted(latencies)
+    if not latencies:
+        return {'requests': 0}
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000
+
+    return {
+        'requests': len(latencies),
+        'throughput': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'p50_ms': round(percentile(50), 2),
+        'p95_ms': round(percentile(95), 2),
+        'p99_ms': round(percentile(99), 2),
+    }
+
+
+def print_report(title, rows):
+    print(title)
+    print(json.dumps(rows, ensure_ascii=False, indent=2))
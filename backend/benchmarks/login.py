@@ -0,0 +1,80 @@
+# backend/benchmarks/login.py
+"""ログインのスループット: セッションあり（従来）とトークンのみ
+
+WSGIHandler をスレッドプールから同時に呼び出し、ログインモードごとの
+スループット・レイテンシー・クエリ数と、パスワード検証プールがあふれて
+429 になった件数を比較する。
+
+    python -m benchmarks.login --concurrency 16 --requests 200
+"""
+import argparse
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import print_report, seed, setup_django, summarize, wsgi_call
+
+PASSWORD = 'benchpass123'
+
+
+def run(handler, users, session, concurrency, total):
+    from django.db import connection, reset_queries
+
+    statuses = Counter()
+    queries = []
+
+    def request(i):
+        body = json.dumps({
+            'username': users[i % len(users)].username,
+            'password': PASSWORD,
+            'session': session,
+        }).encode()
+        reset_queries()
+        start = time.perf_counter()
+        status, _ = wsgi_call(handler, 'POST', '/api/auth/login/', body=body)
+        elapsed = time.perf_counter() - start
+        statuses[status] += 1
+        queries.append(len(connection.queries))
+        return elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(request, range(total)))
+    report = summarize(latencies, time.perf_counter() - start)
+    report['queries'] = round(sum(queries) / len(queries), 1)
+    report['status'] = dict(statuses)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200, help='Logins per mode')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--database', help='SQLite file to use (default: temporary file)')
+    args = parser.parse_args()
+
+    # クエリ数を数えるため DEBUG を有効にする
+    setup_django(args.database, DEBUG=True)
+    users = [user for user, _ in seed(users=args.users, tasks_per_user=0, password=PASSWORD)]
+
+    from django.core.handlers.wsgi import WSGIHandler
+    from authentication.login import last_login_recorder, password_gate
+
+    handler = WSGIHandler()
+    run(handler, users, True, 1, 2)  # ウォームアップ
+    report = {
+        'session': run(handler, users, True, args.concurrency, args.requests),
+        'token_only': run(handler, users, False, args.concurrency, args.requests),
+    }
+    last_login_recorder.flush()
+    print_report(
+        f'concurrency={args.concurrency} requests={args.requests} '
+        f'password_workers={password_gate.workers}',
+        report
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# backend/benchmarks/sqlite_contention.py
+"""SQLite の読み書き競合: 既定の設定と本番用プロファイル（DATABASE_PROFILE=production）
+
+読み取りスレッド（タスク一覧の取得）と書き込みスレッド（タスクの作成・更新）を
+同時に一定時間動かし、プロファイルごとのスループット・レイテンシー・
+database is locked エラーの件数を比較する。各操作の後に close_old_connections を
+呼び、リクエストごとの接続の扱い（CONN_MAX_AGE）も再現する。
+プロファイルは設定の読み込み時に決まるため、それぞれ別プロセスで実行する。
+
+    python -m benchmarks.sqlite_contention --readers 8 --writers 4 --duration 10
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from .common import print_report, seed, setup_django, summarize
+
+PROFILES = ('development', 'production')
+
+
+def worker(operation, deadline, latencies, errors):
+    from django.db import OperationalError, close_old_connections
+
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            operation()
+        except OperationalError:
+            errors.append(1)
+        else:
+            latencies.append(time.perf_counter() - start)
+        finally:
+            close_old_connections()
+    close_old_connections()
+
+
+def run_profile(args):
+    setup_django()
+    users = [user for user, _ in seed(users=args.users, tasks_per_user=args.tasks)]
+
+    from django.db import connection
+    from tasks.models import Task
+
+    counter = itertools.count()
+
+    def read():
+        user = users[next(counter) % len(users)]
+        list(Task.objects.filter(user=user).order_by('-created_at')[:20])
+
+    def write():
+        i = next(counter)
+        user = users[i % len(users)]
+        task = Task.objects.create(user=user, title=f'競合タスク{i}')
+        task.is_completed = True
+        task.save()
+
+    deadline = time.perf_counter() + args.duration
+    results = {'read': ([], []), 'write': ([], [])}
+    threads = [
+        threading.Thread(target=worker, args=(read, deadline, *results['read']))
+        for _ in range(args.readers)
+    ] + [
+        threading.Thread(target=worker, args=(write, deadline, *results['write']))
+        for _ in range(args.writers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        journal_mode = cursor.fetchone()[0]
+    report = {'journal_mode': journal_mode}
+    for name, (latencies, errors) in results.items():
+        report[name] = {**summarize(latencies, elapsed), 'locked_errors': len(errors)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per profile')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--tasks', type=int, default=200, help='Tasks per user')
+    parser.add_argument('--profile', choices=PROFILES, help='Run one profile in this process')
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(run_profile(args)))
+        return
+
+    report = {}
+    for profile in PROFILES:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.sqlite_contention', *sys.argv[1:], '--profile', profile],
+            env={**os.environ, 'DATABASE_PROFILE': profile},
+            capture_output=True, text=True, check=True,
+        ).stdout
+        report[profile] = json.loads(output.splitlines()[-1])
+    print_report(
+        f'readers={args.readers} writers={args.writers} duration={args.duration}s', report
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,415 @@
+# backend/benchmarks/suite.py
+"""API 全ルートの負荷ベンチマーク
+
+ユーザー数 × タスク数のデータを投入し、tasks/urls.py と authentication/urls.py の
+各ルートを同じ同時実行数で呼び出して、スループット・p50/p95/p99 レイテンシー・
+1 リクエストあたりのクエリ数（Server-Timing ヘッダーの db）を報告する。
+--save で結果を JSON に保存し、--compare で保存済みの結果と比較する
+（p95 が --tolerance % を超えて悪化したかクエリ数が増えたルートがあれば終了コード 1）。
+
+既定ではサーバーを介さずに WSGIHandler を直接呼び出す（一時 SQLite ファイル）。
+--url を指定すると起動中のサーバーに HTTP で送り、データも API で投入する。
+events（Server-Sent Events）は接続を開いたままにするため対象外。
+SQLite の書き込みの競合を避けるには DATABASE_PROFILE=production で実行する。
+
+    python -m benchmarks.suite --users 20 --tasks 500 --save baseline.json
+    python -m benchmarks.suite --users 20 --tasks 500 --compare baseline.json
+    python -m benchmarks.suite --url http://127.0.0.1:8000 --routes task-list,task-detail
+"""
+import argparse
+import http.client
+import json
+import platform
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+
+from .common import print_report, seed, setup_django, summarize, wsgi_request
+
+PASSWORD = 'benchpass123'
+PRIORITIES = ('low', 'medium', 'high')
+# TaskBatchSerializer.MAX_OPERATIONS
+BATCH_SIZE = 1000
+QUERIES_PATTERN = re.compile(r'\bdb;[^,]*desc="(\d+) queries"')
+
+
+class InProcessClient:
+    """WSGIHandler を直接呼び出す"""
+
+    def __init__(self):
+        from django.core.handlers.wsgi import WSGIHandler
+
+        self.name = 'in-process'
+        self.handler = WSGIHandler()
+
+    def request(self, method, path, headers, body):
+        return wsgi_request(self.handler, method, path, headers, body)
+
+
+class HTTPClient:
+    """起動中のサーバーに HTTP/1.1 で送る（スレッドごとに接続を使い回す）"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.name = url
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.prefix = parts.path.rstrip('/')
+        self.local = threading.local()
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            connection = self.local.connection = cls(self.host, self.port, timeout=60)
+        return connection
+
+    def request(self, method, path, headers, body):
+        headers = {'Content-Type': 'application/json', **headers}
+        for attempt in range(2):
+            connection = self.connection()
+            try:
+                connection.request(method, self.prefix + path, body=body or None, headers=headers)
+                response = connection.getresponse()
+                return response.status, dict(response.getheaders()), response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # サーバーが keep-alive の接続を閉じていた場合は 1 回だけ繋ぎ直す
+                connection.close()
+                self.local.connection = None
+                if attempt:
+                    raise
+
+
+def call(client, method, path, token=None, body=None):
+    headers = {'Authorization': f'Token {token}'} if token else {}
+    data = json.dumps(body).encode() if body is not None else b''
+    return client.request(method, path, headers, data)
+
+
+def expect(result, status):
+    if result[0] != status:
+        raise RuntimeError(f'Unexpected status {result[0]}: {result[2][:200]!r}')
+    return json.loads(result[2]) if result[2] else None
+
+
+def create_tasks(client, token, count, prefix='ベンチマークタスク'):
+    """一括操作APIでタスクを作成し ID のリストを返す"""
+    ids = []
+    for start in range(0, count, BATCH_SIZE):
+        operations = [
+            {'op': 'create', 'data': {'title': f'{prefix}{j}', 'priority': PRIORITIES[j % 3]}}
+            for j in range(start, min(count, start + BATCH_SIZE))
+        ]
+        data = expect(call(client, 'POST', '/api/tasks/batch/', token, {'operations': operations}), 200)
+        ids.extend(result['data']['id'] for result in data['results'])
+    return ids
+
+
+def register(client, username):
+    data = expect(call(client, 'POST', '/api/auth/register/', body={
+        'username': username,
+        'email': f'{username}@example.com',
+        'password': PASSWORD,
+        'password_confirm': PASSWORD,
+    }), 201)
+    return data['token']
+
+
+def seed_database(users, tasks):
+    """ORM で直接投入（サーバーを介さない場合）"""
+    from tasks.models import Task
+
+    seeded = []
+    for user, token in seed(users=users, tasks_per_user=tasks, password=PASSWORD):
+        task_ids = list(Task.objects.filter(user=user).order_by('pk').values_list('pk', flat=True))
+        seeded.append({'username': user.username, 'token': token.key, 'task_ids': task_ids})
+    return seeded
+
+
+def seed_api(client, run, users, tasks):
+    """API で投入（--url の場合）"""
+    seeded = []
+    for i in range(users):
+        username = f'bench{run}u{i}'
+        token = register(client, username)
+        seeded.append({
+            'username': username, 'token': token, 'task_ids': create_tasks(client, token, tasks),
+        })
+    return seeded
+
+
+class Context:
+    """ルート間で共有する状態"""
+
+    def __init__(self, client, run, users):
+        self.client = client
+        self.run = run
+        self.users = users
+        self.deletable = {}
+        self.logout_tokens = []
+
+
+class Route:
+    """1 ルート分の負荷
+
+    build(ctx, user, i) は i 件目のリクエストの (パス, 本文, トークン) を返す。
+    prepare(ctx, total) は計測前に必要なデータを用意する。
+    """
+
+    def __init__(self, name, method, build, expected=200, prepare=None, collect=None,
+                 password=False):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.expected = expected
+        self.prepare = prepare
+        # collect(ctx, 本文) は期待どおりのステータスだったレスポンスを受け取る
+        self.collect = collect
+        # パスワードのハッシュ計算を伴う（--password-requests 回だけ実行）
+        self.password = password
+
+
+def task_id(user, i):
+    return user['task_ids'][i % len(user['task_ids'])]
+
+
+def prepare_delete(ctx, total):
+    per_user = -(-total // len(ctx.users))
+    for index, user in enumerate(ctx.users):
+        ctx.deletable[index] = create_tasks(ctx.client, user['token'], per_user, '削除用タスク')
+
+
+def build_delete(ctx, user, i):
+    pk = ctx.deletable[i % len(ctx.users)].pop()
+    return f'/api/tasks/{pk}/', None, user['token']
+
+
+def build_register(ctx, user, i):
+    username = f'bench{ctx.run}r{i}'
+    return '/api/auth/register/', {
+        'username': username,
+        'email': f'{username}@example.com',
+        'password': PASSWORD,
+        'password_confirm': PASSWORD,
+    }, None
+
+
+def prepare_logout(ctx, total):
+    # user-register で登録したユーザーのトークンを使う（足りなければ登録する）
+    for i in range(len(ctx.logout_tokens), total):
+        ctx.logout_tokens.append(register(ctx.client, f'bench{ctx.run}l{i}'))
+
+
+def build_logout(ctx, user, i):
+    return '/api/auth/logout/', None, ctx.logout_tokens[i]
+
+
+def collect_token(ctx, content):
+    ctx.logout_tokens.append(json.loads(content)['token'])
+
+
+ROUTES = [
+    Route('task-list', 'GET', lambda ctx, user, i: ('/api/tasks/', None, user['token'])),
+    Route('task-list-cursor', 'GET', lambda ctx, user, i: (
+        '/api/tasks/?pagination=cursor', None, user['token']
+    )),
+    Route('task-list-search', 'GET', lambda ctx, user, i: (
+        f"/api/tasks/?search={quote('タスク')}{i % 10}", None, user['token']
+    )),
+    Route('task-create', 'POST', lambda ctx, user, i: (
+        '/api/tasks/', {'title': f'作成タスク{i}', 'priority': PRIORITIES[i % 3]}, user['token']
+    ), expected=201),
+    Route('task-batch', 'POST', lambda ctx, user, i: ('/api/tasks/batch/', {'operations': [
+        {'op': 'create', 'data': {'title': f'一括タスク{i}-{j}'}} for j in range(10)
+    ]}, user['token'])),
+    Route('task-detail', 'GET', lambda ctx, user, i: (
+        f'/api/tasks/{task_id(user, i)}/', None, user['token']
+    )),
+    Route('task-update', 'PATCH', lambda ctx, user, i: (
+        f'/api/tasks/{task_id(user, i)}/', {'priority': PRIORITIES[i % 3]}, user['token']
+    )),
+    Route('task-toggle', 'POST', lambda ctx, user, i: (
+        f'/api/tasks/{task_id(user, i)}/toggle/', None, user['token']
+    )),
+    Route('task-delete', 'DELETE', build_delete, expected=204, prepare=prepare_delete),
+    Route('task-statistics', 'GET', lambda ctx, user, i: (
+        '/api/tasks/statistics/', None, user['token']
+    )),
+    Route('task-changes', 'GET', lambda ctx, user, i: (
+        '/api/tasks/changes/?limit=100', None, user['token']
+    )),
+    Route('task-export', 'GET', lambda ctx, user, i: (
+        '/api/tasks/export/?format=ndjson', None, user['token']
+    )),
+    Route('user-register', 'POST', build_register, expected=201, collect=collect_token,
+          password=True),
+    Route('user-login', 'POST', lambda ctx, user, i: ('/api/auth/login/', {
+        'username': user['username'], 'password': PASSWORD, 'session': False,
+    }, None), password=True),
+    Route('user-profile', 'GET', lambda ctx, user, i: ('/api/auth/profile/', None, user['token'])),
+    Route('update-profile', 'PUT', lambda ctx, user, i: (
+        '/api/auth/profile/update/', {'email': f"{user['username']}@example.com"}, user['token']
+    )),
+    Route('user-logout', 'POST', build_logout, prepare=prepare_logout),
+]
+
+
+def header(headers, name):
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def run_route(ctx, route, concurrency, total):
+    statuses = Counter()
+    queries = []
+    lock = threading.Lock()
+
+    def request(i):
+        user = ctx.users[i % len(ctx.users)]
+        path, body, token = route.build(ctx, user, i)
+        start = time.perf_counter()
+        status, headers, content = call(ctx.client, route.method, path, token, body)
+        elapsed = time.perf_counter() - start
+        match = QUERIES_PATTERN.search(header(headers, 'Server-Timing') or '')
+        with lock:
+            statuses[status] += 1
+            if match:
+                queries.append(int(match.group(1)))
+            if route.collect is not None and status == route.expected:
+                route.collect(ctx, content)
+        return elapsed
+
+    if route.prepare is not None:
+        route.prepare(ctx, total)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(request, range(total)))
+    report = summarize(latencies, time.perf_counter() - start)
+    report['queries'] = round(sum(queries) / len(queries), 1) if queries else None
+    report['errors'] = total - statuses[route.expected]
+    report['status'] = {str(status): count for status, count in sorted(statuses.items())}
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """保存済みの結果との差分と、悪化したルートの一覧を返す"""
+    rows = {}
+    regressions = []
+    for name, current in report['routes'].items():
+        previous = baseline['routes'].get(name)
+        if not previous or not previous.get('requests') or not current.get('requests'):
+            continue
+        rows[name] = {
+            'throughput': f"{previous['throughput']} -> {current['throughput']} "
+                          f"({(current['throughput'] / previous['throughput'] - 1) * 100:+.1f}%)",
+            'p95_ms': f"{previous['p95_ms']} -> {current['p95_ms']} "
+                      f"({(current['p95_ms'] / previous['p95_ms'] - 1) * 100:+.1f}%)",
+            'queries': f"{previous['queries']} -> {current['queries']}",
+        }
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance / 100):
+            regressions.append(f'{name}: p95 {previous["p95_ms"]}ms -> {current["p95_ms"]}ms')
+        if None not in (previous['queries'], current['queries']) and \
+                current['queries'] > previous['queries']:
+            regressions.append(f'{name}: queries {previous["queries"]} -> {current["queries"]}')
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--tasks', type=int, default=200, help='Tasks per user')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500, help='Requests per route')
+    parser.add_argument(
+        '--password-requests', type=int, default=50,
+        help='Requests for routes that hash passwords (register, login)'
+    )
+    parser.add_argument('--routes', help='Comma-separated route names (default: all)')
+    parser.add_argument('--url', help='Base URL of a running server (default: in-process WSGI)')
+    parser.add_argument('--database', help='SQLite file to use in-process (default: temporary file)')
+    parser.add_argument('--save', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Compare with results saved by --save')
+    parser.add_argument(
+        '--tolerance', type=float, default=20, help='Allowed p95 slowdown in percent'
+    )
+    args = parser.parse_args()
+    if args.users < 1 or args.tasks < 1:
+        parser.error('--users and --tasks must be at least 1')
+
+    routes = ROUTES
+    if args.routes:
+        names = args.routes.split(',')
+        unknown = set(names) - {route.name for route in ROUTES}
+        if unknown:
+            parser.error(f'unknown routes: {", ".join(sorted(unknown))}')
+        routes = [route for route in ROUTES if route.name in names]
+
+    run = uuid.uuid4().hex[:8]
+    profile = None
+    if args.url:
+        client = HTTPClient(args.url)
+        users = seed_api(client, run, args.users, args.tasks)
+    else:
+        setup_django(args.database)
+        from django.conf import settings
+        profile = settings.DATABASE_PROFILE
+        users = seed_database(args.users, args.tasks)
+        client = InProcessClient()
+    ctx = Context(client, run, users)
+
+    # ウォームアップ（統計カウンター行の作成・トークンキャッシュ）
+    for user in users:
+        expect(call(client, 'GET', '/api/tasks/statistics/', user['token']), 200)
+
+    report = {
+        'meta': {
+            'target': client.name,
+            'database_profile': profile,
+            'users': args.users,
+            'tasks': args.tasks,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'password_requests': args.password_requests,
+            'python': platform.python_version(),
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        },
+        'routes': {},
+    }
+    for route in routes:
+        total = args.password_requests if route.password else args.requests
+        report['routes'][route.name] = run_route(ctx, route, args.concurrency, total)
+
+    meta = report['meta']
+    print_report(
+        f"target={meta['target']} users={args.users} tasks={args.tasks} "
+        f"concurrency={args.concurrency} requests={args.requests}",
+        report['routes']
+    )
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        keys = ('users', 'tasks', 'concurrency', 'requests')
+        if any(baseline['meta'].get(key) != meta[key] for key in keys):
+            print('warning: baseline was run with different volumes or concurrency')
+        rows, regressions = compare(report, baseline, args.tolerance)
+        print_report('compared with ' + args.compare, rows)
+        if regressions:
+            print('regressions:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
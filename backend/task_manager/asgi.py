@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "task_manager.settings")
+# タスクAPIを非同期ビュー（tasks.async_views）で処理する
+os.environ.setdefault("TASK_API_ASYNC", "1")
 
 application = get_asgi_application()
@@ -0,0 +1,13 @@
+# backend/task_manager/asgi_urls.py
+# ASGI 用のルート URL 設定（TASK_API_ASYNC が有効な場合に使用）
+from django.contrib import admin
+from django.urls import path, include
+
+from .metrics import metrics_view
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/auth/', include('authentication.urls')),
+    path('api/tasks/', include('tasks.async_urls')),
+    path('metrics', metrics_view, name='metrics'),
+]
@@ -0,0 +1,67 @@
+# backend/task_manager/backends/sqlite3/base.py
+"""本番用 SQLite バックエンド
+
+django.db.backends.sqlite3 に以下を加える（設定は DATABASES の OPTIONS）。
+
+- PRAGMAS: 接続時に実行する PRAGMA（WAL、synchronous、mmap_size など）
+- TRANSACTION_MODE: atomic() 開始時の BEGIN の種類。IMMEDIATE にすると
+  書き込みロックを最初に取るため、読み取りから書き込みへの昇格時に
+  busy_timeout を待たずに失敗する（SQLITE_BUSY）ことがなくなる
+- BUSY_RETRIES: トランザクション外の文が database is locked で失敗した場合の再試行回数
+"""
+import time
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+CUSTOM_OPTIONS = ('PRAGMAS', 'TRANSACTION_MODE', 'BUSY_RETRIES', 'BUSY_RETRY_DELAY')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = options.get('PRAGMAS', {})
+        self.transaction_mode = options.get('TRANSACTION_MODE')
+        self.busy_retries = options.get('BUSY_RETRIES', 0)
+        self.busy_retry_delay = options.get('BUSY_RETRY_DELAY', 0.05)
+        if self.busy_retries:
+            self.execute_wrappers.append(self.retry_on_busy)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for name in CUSTOM_OPTIONS:
+            params.pop(name, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
+
+    def retry_on_busy(self, execute, sql, params, many, context):
+        """トランザクション外の文をロック待ちのタイムアウト時に再試行する
+
+        トランザクション内では途中の文だけをやり直せないため再試行しない。
+        """
+        attempt = 0
+        while True:
+            try:
+                return execute(sql, params, many, context)
+            except OperationalError as exc:
+                if (
+                    attempt >= self.busy_retries
+                    or self.in_atomic_block
+                    or 'database is locked' not in str(exc)
+                ):
+                    raise
+                time.sleep(self.busy_retry_delay * 2 ** attempt)
+                attempt += 1
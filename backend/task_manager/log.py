@@ -0,0 +1,183 @@
+# backend/task_manager/log.py
+"""非同期・構造化ログ
+
+リクエストを処理するスレッドではレコードを有界キューに積むだけにし、
+整形（JSON）とファイル書き込みはバックグラウンドの QueueListener が行う。
+キューが溢れた場合はレコードを捨て（drop_policy）、捨てた件数を
+次に積めたときに WARNING として出力する。
+settings.LOGGING の handlers で QueueHandler として指定する。
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+DEFAULT_QUEUE_SIZE = 10000
+DROP_NEW = 'new'
+DROP_OLD = 'old'
+
+# リクエストIDは task_manager.middleware.request_logging_middleware が設定する
+request_id_var = ContextVar('request_id', default=None)
+
+# LogRecord の標準属性（これ以外は extra として JSON に含める）
+RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'request_id',
+}
+
+
+class RequestIdFilter(logging.Filter):
+    """レコードに現在のリクエストIDを付ける（呼び出し元のスレッドで実行）"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class ExcludeFilter(logging.Filter):
+    """指定したロガー（とその子）のレコードを除く"""
+
+    def __init__(self, names):
+        super().__init__()
+        self.names = tuple(names)
+
+    def filter(self, record):
+        return not any(
+            record.name == name or record.name.startswith(name + '.') for name in self.names
+        )
+
+
+class JSONFormatter(logging.Formatter):
+    """1 レコードを 1 行の JSON にする"""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec='milliseconds'
+            ),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id is not None:
+            data['request_id'] = request_id
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class Listener(QueueListener):
+    """停止時にキューが満杯でも終了の合図を確実に積むリスナー"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """有界キューに積み、バックグラウンドスレッドで書き込むハンドラー
+
+    filename を指定するとローテーションするファイルに JSON で、
+    console=True なら標準エラーにメッセージだけを出力する
+    （console_exclude のロガーはファイルのみ）。
+    start=False の場合はリスナーを起動しない（テスト用）。
+    """
+
+    def __init__(self, filename=None, max_bytes=10 * 1024 * 1024, backup_count=5,
+                 file_level=logging.INFO, console=False, console_level=logging.DEBUG,
+                 console_exclude=(),
+                 queue_size=DEFAULT_QUEUE_SIZE, drop_policy=DROP_NEW, start=True):
+        if drop_policy not in (DROP_NEW, DROP_OLD):
+            raise ValueError(f'Unknown drop_policy: {drop_policy!r}')
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self.drop_lock = threading.Lock()
+        self.addFilter(RequestIdFilter())
+
+        handlers = []
+        if filename:
+            file_handler = RotatingFileHandler(
+                filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+            )
+            file_handler.setLevel(file_level)
+            file_handler.setFormatter(JSONFormatter())
+            handlers.append(file_handler)
+        if console:
+            console_handler = logging.StreamHandler(sys.stderr)
+            console_handler.setLevel(console_level)
+            if console_exclude:
+                console_handler.addFilter(ExcludeFilter(console_exclude))
+            handlers.append(console_handler)
+        self.listener = Listener(self.queue, *handlers, respect_handler_level=True)
+        if start:
+            self.listener.start()
+            atexit.register(self.close)
+
+    def prepare(self, record):
+        # 整形はリスナー側で行う。引数だけ先に展開して呼び出し元のオブジェクトを手放す
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.dropped:
+            self.report_dropped()
+        if not self.put(record):
+            with self.drop_lock:
+                self.dropped += 1
+
+    def put(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            if self.drop_policy == DROP_NEW:
+                return False
+        # DROP_OLD: 最も古いレコードを捨てて入れ直す
+        try:
+            self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        with self.drop_lock:
+            self.dropped += 1
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+    def report_dropped(self):
+        with self.drop_lock:
+            dropped, self.dropped = self.dropped, 0
+        if not dropped:
+            return
+        record = logging.LogRecord(
+            __name__, logging.WARNING, __file__, 0,
+            'Log queue full: dropped %d records', (dropped,), None
+        )
+        record.dropped = dropped
+        record.request_id = None
+        if not self.put(self.prepare(record)):
+            with self.drop_lock:
+                self.dropped += dropped
+
+    def close(self):
+        # キューに残っているレコードを書き出してから止める
+        if self.listener._thread is not None:
+            self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+        super().close()
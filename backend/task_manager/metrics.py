@@ -0,0 +1,252 @@
+# backend/task_manager/metrics.py
+"""Prometheus 形式のメトリクス
+
+プロセス内のレジストリに URL 名ごとのリクエスト数・エラー数・処理時間と
+SQL の件数のヒストグラム、キャッシュのヒット数を集計し、/metrics で
+テキスト形式（version 0.0.4）で返す。
+
+gunicorn などの複数プロセスで動かす場合は METRICS['DIRECTORY'] を設定する。
+各プロセスは FLUSH_INTERVAL 秒ごとに自分の集計を <DIRECTORY>/<pid>.json に
+書き出し、/metrics はディレクトリ内の全ファイルを合算して返す。
+終了したプロセスの値も残るため、ディレクトリはサーバーの起動時に空にすること。
+
+/metrics は Authorization: Bearer <TOKEN> を送ったリクエストと、
+接続元が ALLOWED_IPS に含まれるリクエストだけに返す（どちらも未設定なら常に 403）。
+"""
+import atexit
+import glob
+import ipaddress
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+DEFAULTS = {
+    'ENABLED': True,
+    # 複数プロセスの集計を共有するディレクトリ（None ならプロセス内のみ）
+    'DIRECTORY': None,
+    'FLUSH_INTERVAL': 5,
+    # /metrics の取得に必要な Bearer トークン
+    'TOKEN': None,
+    # トークン無しで取得できる接続元（IP アドレスまたはネットワーク）
+    'ALLOWED_IPS': (),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+COUNTERS = {
+    'http_requests_total': 'HTTP requests by URL name, method and status.',
+    'http_request_errors_total': 'HTTP 5xx responses by URL name.',
+    'cache_requests_total': 'Cache lookups by cache and result (hit/miss).',
+}
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Request latency by URL name.', LATENCY_BUCKETS),
+    'http_request_db_queries': ('SQL queries per request by URL name.', QUERY_BUCKETS),
+}
+
+
+def get_option(name):
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}[name]
+
+
+class Registry:
+    """プロセス内のメトリクス（ラベルは (名前, 値) のタプル）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        # (名前, ラベル) -> [バケットごとの件数..., 合計, 件数]
+        self.histograms = {}
+        self.flushed_at = 0.0
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, tuple(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, tuple(labels))
+        with self.lock:
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [0] * (len(buckets) + 2)
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [
+                    [name, labels, value] for (name, labels), value in self.counters.items()
+                ],
+                'histograms': [
+                    [name, labels, list(series)]
+                    for (name, labels), series in self.histograms.items()
+                ],
+            }
+
+    def flush(self, directory):
+        """集計をファイルに書き出す（置き換えは原子的）"""
+        data = json.dumps(self.snapshot(), separators=(',', ':'))
+        fd, path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as file:
+            file.write(data)
+        os.replace(path, os.path.join(directory, f'{os.getpid()}.json'))
+        self.flushed_at = time.monotonic()
+
+    def maybe_flush(self):
+        directory = get_option('DIRECTORY')
+        if directory and time.monotonic() - self.flushed_at >= get_option('FLUSH_INTERVAL'):
+            self.flush(directory)
+
+
+registry = Registry()
+# fork したワーカーは親の集計を引き継がない
+os.register_at_fork(after_in_child=registry.reset)
+
+
+@atexit.register
+def flush_at_exit():
+    directory = get_option('DIRECTORY')
+    if directory:
+        registry.flush(directory)
+
+
+def collect():
+    """全プロセス分を合算した {'counters': {...}, 'histograms': {...}}"""
+    directory = get_option('DIRECTORY')
+    if directory:
+        registry.flush(directory)
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                # 書き出し中・削除済みのファイルは次回に回す
+                continue
+    else:
+        snapshots = [registry.snapshot()]
+
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, series in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(series))
+            for index, value in enumerate(series):
+                total[index] += value
+    return {'counters': counters, 'histograms': histograms}
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value):
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def render(data):
+    """Prometheus のテキスト形式にする"""
+    lines = []
+    for name, help_text in COUNTERS.items():
+        series = sorted(
+            (labels, value) for (metric, labels), value in data['counters'].items()
+            if metric == name
+        )
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for labels, value in series:
+            lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        series = sorted(
+            (labels, values) for (metric, labels), values in data['histograms'].items()
+            if metric == name
+        )
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, values in series:
+            for bound, count in zip(buckets, values):
+                bucket_labels = labels + (('le', format_value(float(bound))),)
+                lines.append(f'{name}_bucket{format_labels(bucket_labels)} {count}')
+            inf_labels = labels + (('le', '+Inf'),)
+            lines.append(f'{name}_bucket{format_labels(inf_labels)} {values[-1]}')
+            lines.append(f'{name}_sum{format_labels(labels)} {format_value(values[-2])}')
+            lines.append(f'{name}_count{format_labels(labels)} {values[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def record_request(request, response, duration):
+    """1 リクエスト分を記録（metrics_middleware から呼ばれる）"""
+    match = getattr(request, 'resolver_match', None)
+    view = (match.url_name if match is not None else None) or 'unmatched'
+    registry.inc('http_requests_total', (
+        ('view', view), ('method', request.method), ('status', str(response.status_code)),
+    ))
+    if response.status_code >= 500:
+        registry.inc('http_request_errors_total', (('view', view),))
+    registry.observe('http_request_duration_seconds', (('view', view),), duration)
+    timings = getattr(request, 'timings', None)
+    if timings is not None:
+        registry.observe('http_request_db_queries', (('view', view),), timings.db_count)
+    registry.maybe_flush()
+
+
+def record_cache(cache, hit):
+    registry.inc('cache_requests_total', (('cache', cache), ('result', 'hit' if hit else 'miss')))
+
+
+def is_allowed(request):
+    """トークンか接続元のアドレスで /metrics の取得を許可するか"""
+    token = get_option('TOKEN')
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer ') and constant_time_compare(header[7:], token):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in get_option('ALLOWED_IPS') if network
+    )
+
+
+@require_GET
+def metrics_view(request):
+    """メトリクス（Prometheus のテキスト形式）"""
+    if not get_option('ENABLED'):
+        raise Http404
+    if not is_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
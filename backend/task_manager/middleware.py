@@ -0,0 +1,147 @@
+# backend/task_manager/middleware.py
+import logging
+import re
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.utils.decorators import sync_and_async_middleware
+
+from . import metrics, query_budgets, routers, timing
+from .log import request_id_var
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REQUEST_ID_HEADER = 'X-Request-ID'
+# クライアントから受け取るリクエストIDの形式（それ以外は新しく振り直す）
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+request_logger = logging.getLogger('task_manager.request')
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """リクエストごとにレプリカ振り分けの状態を初期化（書き込みメソッドは default に固定）"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            routers.start_request(primary=request.method not in SAFE_METHODS)
+            return await get_response(request)
+    else:
+        def middleware(request):
+            routers.start_request(primary=request.method not in SAFE_METHODS)
+            return get_response(request)
+    return middleware
+
+
+def start_request_log(request):
+    request_id = request.headers.get(REQUEST_ID_HEADER, '')
+    if not REQUEST_ID_PATTERN.match(request_id):
+        request_id = uuid.uuid4().hex
+    request.request_id = request_id
+    # django.request の 4xx/5xx ログはミドルウェアの外で出るため、
+    # 値は戻さず次のリクエストで上書きする
+    request_id_var.set(request_id)
+    return time.perf_counter()
+
+
+def finish_request_log(request, response, started):
+    latency = time.perf_counter() - started
+    response[REQUEST_ID_HEADER] = request.request_id
+    request_logger.info(
+        '%s %s %s', request.method, request.path, response.status_code,
+        extra={
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'latency_ms': round(latency * 1000, 2),
+            'user_id': routers.get_state().user_id,
+        },
+    )
+    return response
+
+
+@sync_and_async_middleware
+def request_logging_middleware(get_response):
+    """リクエストIDを振り、処理時間をアクセスログとして記録
+
+    リクエストIDは X-Request-ID ヘッダーで受け取り（無ければ生成）、
+    レスポンスの同じヘッダーで返す。処理中のログには自動で付く。
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = start_request_log(request)
+            response = await get_response(request)
+            return finish_request_log(request, response, started)
+    else:
+        def middleware(request):
+            started = start_request_log(request)
+            response = get_response(request)
+            return finish_request_log(request, response, started)
+    return middleware
+
+
+@sync_and_async_middleware
+def server_timing_middleware(get_response):
+    """処理時間の内訳を Server-Timing ヘッダーで返す（task_manager.timing）"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not timing.get_option('ENABLED'):
+                return await get_response(request)
+            request.timings = timings = timing.start()
+            response = await get_response(request)
+            if timing.stop(timings):
+                await sync_to_async(timing.log_slow_query)(request, timings)
+            return timing.finish_response(request, response, timings)
+    else:
+        def middleware(request):
+            if not timing.get_option('ENABLED'):
+                return get_response(request)
+            request.timings = timings = timing.start()
+            response = get_response(request)
+            if timing.stop(timings):
+                timing.log_slow_query(request, timings)
+            return timing.finish_response(request, response, timings)
+    return middleware
+
+
+@sync_and_async_middleware
+def query_budget_middleware(get_response):
+    """@query_budget を宣言したビューの SQL の件数と繰り返しを検査（task_manager.query_budgets）"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not query_budgets.get_option('ENABLED'):
+                return await get_response(request)
+            queries = query_budgets.start()
+            response = await get_response(request)
+            query_budgets.finish(request, queries)
+            return response
+    else:
+        def middleware(request):
+            if not query_budgets.get_option('ENABLED'):
+                return get_response(request)
+            queries = query_budgets.start()
+            response = get_response(request)
+            query_budgets.finish(request, queries)
+            return response
+    return middleware
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """URL 名ごとのリクエスト数・処理時間・SQL の件数を集計（task_manager.metrics）"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not metrics.get_option('ENABLED'):
+                return await get_response(request)
+            started = time.perf_counter()
+            response = await get_response(request)
+            metrics.record_request(request, response, time.perf_counter() - started)
+            return response
+    else:
+        def middleware(request):
+            if not metrics.get_option('ENABLED'):
+                return get_response(request)
+            started = time.perf_counter()
+            response = get_response(request)
+            metrics.record_request(request, response, time.perf_counter() - started)
+            return response
+    return middleware
@@ -0,0 +1,206 @@
+# backend/task_manager/query_budgets.py
+"""ビューごとの SQL の上限（クエリバジェット）
+
+ビューに @query_budget で 1 リクエストあたりの SQL の件数の上限と、
+繰り返しを許す SQL のパターンを宣言する。query_budget_middleware が有効な場合は
+リクエスト中の SQL を記録し、上限を超えたときや同じ SQL（パラメーターだけが
+違うものを含む）が繰り返されたとき（N+1）に、発行元のスタックトレース付きで
+WARNING を記録する。RAISE=True なら QueryBudgetExceeded を送出する。
+テストでは enforce_query_budgets() をデコレーターとして使う。
+
+トランザクション制御（BEGIN / SAVEPOINT など）は数えない。
+認証や統計行の再集計など、ビューに依らない・初回だけの SQL は unbudgeted() で
+除外し、上限には通常のリクエストの件数を指定する。
+StreamingHttpResponse の本体を返す間の SQL はミドルウェアの外で実行されるため対象外。
+"""
+import logging
+import os
+import re
+import traceback
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULTS = {
+    'ENABLED': False,
+    # True なら違反をログではなく QueryBudgetExceeded にする（テスト用）
+    'RAISE': False,
+    # 違反 1 件あたりに出力するスタックのフレーム数
+    'STACK_LIMIT': 8,
+}
+
+logger = logging.getLogger('task_manager.query_budgets')
+
+_current = ContextVar('query_budget_queries', default=None)
+_unbudgeted = ContextVar('query_budget_unbudgeted', default=False)
+
+TRANSACTION_SQL = re.compile(
+    r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE\s+SAVEPOINT)\b', re.IGNORECASE
+)
+# IN 句や VALUES の (%s, %s, ...) は件数に関わらず同じ SQL とみなす
+PLACEHOLDERS = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+
+Query = namedtuple('Query', ['alias', 'sql', 'stack'])
+
+# スタックトレースから除くファイル（このモジュールとミドルウェア）
+IGNORED_FILES = {__file__, os.path.join(os.path.dirname(__file__), 'middleware.py')}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """SQL の件数が上限を超えた、または繰り返しが見つかった"""
+
+
+def get_option(name):
+    return {**DEFAULTS, **getattr(settings, 'QUERY_BUDGET', {})}[name]
+
+
+def normalize(sql):
+    return PLACEHOLDERS.sub('(...)', sql)
+
+
+class QueryBudget:
+    """1 リクエストあたりの SQL の上限"""
+
+    def __init__(self, max_queries=None, allow_duplicates=(), methods=None):
+        self.max_queries = max_queries
+        self.methods = {method.upper(): limit for method, limit in (methods or {}).items()}
+        self.allow_duplicates = [re.compile(pattern, re.IGNORECASE) for pattern in allow_duplicates]
+
+    def limit(self, method):
+        return self.methods.get(method, self.max_queries)
+
+    def check(self, method, queries):
+        """違反の (説明, スタックを示す Query) の一覧"""
+        violations = []
+        limit = self.limit(method)
+        if limit is not None and len(queries) > limit:
+            violations.append((f'{len(queries)} queries (budget {limit})', queries[limit]))
+
+        repeated = {}
+        for query in queries:
+            repeated.setdefault((query.alias, normalize(query.sql)), []).append(query)
+        for (alias, sql), group in repeated.items():
+            if len(group) > 1 and not any(pattern.search(sql) for pattern in self.allow_duplicates):
+                violations.append((f'repeated {len(group)} times on {alias}: {sql}', group[1]))
+        return violations
+
+
+def query_budget(max_queries=None, *, allow_duplicates=(), **methods):
+    """ビューに SQL の上限を宣言するデコレーター
+
+    関数ビューは @api_view より外側に、クラスビューはクラスに付ける。
+    methods で HTTP メソッドごとの上限を指定できる（例: GET=3, POST=6）。
+    allow_duplicates には繰り返してよい SQL の正規表現を指定する。
+    """
+    budget = QueryBudget(max_queries, allow_duplicates, methods)
+
+    def decorator(view):
+        view.query_budget = budget
+        return view
+    return decorator
+
+
+def get_budget(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    budget = getattr(match.func, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(match.func, 'view_class', None), 'query_budget', None)
+    return budget
+
+
+@contextmanager
+def unbudgeted():
+    """ブロック内の SQL を上限と繰り返しの検査から除く"""
+    token = _unbudgeted.set(True)
+    try:
+        yield
+    finally:
+        _unbudgeted.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    queries = _current.get()
+    if queries is not None and not _unbudgeted.get() and not TRANSACTION_SQL.match(sql):
+        # 行の読み込みは違反を報告するときまで遅らせる
+        stack = traceback.StackSummary.extract(traceback.walk_stack(None), lookup_lines=False)
+        queries.append(Query(context['connection'].alias, sql, stack))
+    return execute(sql, params, many, context)
+
+
+def install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def install_on_connect(sender, connection, **kwargs):
+    install(connection)
+
+
+def start():
+    for connection in connections.all(initialized_only=True):
+        install(connection)
+    queries = []
+    _current.set(queries)
+    return queries
+
+
+def format_stack(stack):
+    """プロジェクト内のフレームだけを呼び出し順に整形"""
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in stack
+        if frame.filename.startswith(base) and 'site-packages' not in frame.filename
+        and frame.filename not in IGNORED_FILES
+    ] or list(stack)
+    frames = frames[:get_option('STACK_LIMIT')]
+    return ''.join(traceback.format_list(reversed(frames)))
+
+
+def finish(request, queries):
+    """SQL の記録を止め、ビューの上限と照合する"""
+    _current.set(None)
+    budget = get_budget(request)
+    if budget is None:
+        return
+    violations = budget.check(request.method, queries)
+    if not violations:
+        return
+
+    view = request.resolver_match.view_name
+    lines = [f'Query budget exceeded in {request.method} {request.path} ({view}):']
+    for description, query in violations:
+        lines.append(f'- {description}')
+        lines.append(format_stack(query.stack).rstrip())
+    lines.append('Queries:')
+    lines.extend(
+        f'{index}. [{query.alias}] {query.sql}' for index, query in enumerate(queries, 1)
+    )
+    message = '\n'.join(lines)
+    if get_option('RAISE'):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message, extra={
+        'view': view,
+        'method': request.method,
+        'queries': len(queries),
+        'budget': budget.limit(request.method),
+    })
+
+
+def enforce_query_budgets():
+    """テスト用: 検査を有効にして違反を QueryBudgetExceeded にする
+
+    テストクラス・テストメソッドのデコレーター、または with 文で使う。
+    """
+    from django.test.utils import override_settings
+
+    return override_settings(QUERY_BUDGET={
+        **getattr(settings, 'QUERY_BUDGET', {}), 'ENABLED': True, 'RAISE': True,
+    })
@@ -0,0 +1,112 @@
+# backend/task_manager/routers.py
+"""リードレプリカへの読み取りの振り分け
+
+settings.DATABASE_REPLICAS に並べたエイリアスへ、tasks・auth・authtoken の
+読み取りを振り分ける（書き込みは常に default）。以下の場合は default から読む。
+
+- 書き込みを伴うメソッド（POST など）のリクエスト、および同じリクエスト内で書き込んだ後
+- default でトランザクション中
+- 同じユーザーが REPLICA_STICKY_SECONDS 秒以内に書き込んだ後（read-your-writes）
+
+ユーザーはトークン認証・セッション認証（authentication.authentication）と
+非同期ビューの認証で set_user される。固定の記録は default のキャッシュに置くため、
+複数プロセスではプロセス間で共有されるキャッシュが必要。
+リクエストごとの状態は ReplicaRoutingMiddleware が初期化する。
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICATED_APPS = {'tasks', 'auth', 'authtoken'}
+STICKY_KEY = 'replica:sticky:{}'
+DEFAULT_STICKY_SECONDS = 5
+
+
+class RoutingState:
+    """リクエスト（コンテキスト）ごとの振り分け状態"""
+
+    def __init__(self, primary=False):
+        self.primary = primary
+        self.user_id = None
+        self.sticky = None
+        self.marked = False
+
+
+_state = contextvars.ContextVar('replica_routing_state', default=None)
+
+
+def get_state():
+    state = _state.get()
+    if state is None:
+        state = RoutingState()
+        _state.set(state)
+    return state
+
+
+def start_request(primary=False):
+    _state.set(RoutingState(primary))
+
+
+def set_user(user_id):
+    state = get_state()
+    if state.user_id != user_id:
+        state.user_id = user_id
+        state.sticky = None
+        state.marked = False
+
+
+@contextmanager
+def use_primary():
+    """ブロック内の読み取りを default に固定"""
+    state = get_state()
+    previous = state.primary
+    state.primary = True
+    try:
+        yield
+    finally:
+        state.primary = previous
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas or model._meta.app_label not in REPLICATED_APPS:
+            return None
+        state = get_state()
+        if state.primary or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.user_id is not None:
+            if state.sticky is None:
+                state.sticky = cache.get(STICKY_KEY.format(state.user_id)) is not None
+            if state.sticky:
+                return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if not get_replicas() or model._meta.app_label not in REPLICATED_APPS:
+            return None
+        # レプリカから読んだインスタンスも default に保存する
+        state = get_state()
+        state.primary = True
+        if state.user_id is not None and not state.marked:
+            cache.set(
+                STICKY_KEY.format(state.user_id), True,
+                getattr(settings, 'REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+            )
+            state.marked = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
@@ -128,6 +128,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 # backend/task_manager/settings.py
 import os
+import sys
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -152,6 +153,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'task_manager.middleware.request_logging_middleware',
+    'task_manager.middleware.metrics_middleware',
+    'task_manager.middleware.server_timing_middleware',
+    'task_manager.middleware.query_budget_middleware',
+    'task_manager.middleware.replica_routing_middleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -162,7 +168,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'task_manager.urls'
+# ASGI（asgi.py）で起動した場合はタスクAPIを非同期ビューで処理する
+TASK_API_ASYNC = os.environ.get('TASK_API_ASYNC', '0') == '1'
+
+ROOT_URLCONF = 'task_manager.asgi_urls' if TASK_API_ASYNC else 'task_manager.urls'
 
 TEMPLATES = [
     {
@@ -182,6 +191,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'task_manager.wsgi.application'
 
+# タスクのデータベースは SQLite のみ対応（差分同期の同期トークンが
+# 書き込みの直列化を前提にしているため。tasks.checks を参照）
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -189,6 +200,62 @@ DATABASES = {
     }
 }
 
+# 本番用 SQLite プロファイル（DATABASE_PROFILE=production で有効）
+# WAL で読み取りと書き込みを並行させ、接続を使い回す（task_manager.backends.sqlite3）
+SQLITE_PRODUCTION_PROFILE = {
+    'ENGINE': 'task_manager.backends.sqlite3',
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        # ロック待ちの上限（秒）。sqlite3 モジュールが busy_timeout として設定する
+        'timeout': 5,
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024,  # KiB 単位（負の値）
+            'temp_store': 'MEMORY',
+        },
+        'TRANSACTION_MODE': 'IMMEDIATE',
+        'BUSY_RETRIES': 3,
+    },
+}
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'development')
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update(SQLITE_PRODUCTION_PROFILE)
+
+# リードレプリカ（task_manager.routers.ReplicaRouter が読み取りを振り分けるエイリアス）
+# ローカルでは DATABASE_REPLICA=<SQLite ファイル> で 2 つ目の SQLite ファイルを
+# レプリカの代わりに使える（db.sqlite3 をコピーしたものなど。複製はされない）
+DATABASE_REPLICAS = []
+if os.environ.get('DATABASE_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DATABASE_REPLICA'],
+    }
+    DATABASE_REPLICAS.append('replica')
+
+# タスクのシャーディング（tasks.sharding.TaskShardRouter がユーザー ID のハッシュで振り分ける）
+# ローカルでは TASK_SHARD_COUNT=<N> で tasks_shard0.sqlite3 以降の SQLite ファイルを使う
+# シャードを増減した後は rebalance_task_shards でユーザーを移動する
+TASK_SHARDS = []
+for index in range(int(os.environ.get('TASK_SHARD_COUNT', '0'))):
+    DATABASES[f'shard{index}'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'tasks_shard{index}.sqlite3',
+    }
+    TASK_SHARDS.append(f'shard{index}')
+
+DATABASE_ROUTERS = [
+    'tasks.sharding.TaskShardRouter',
+    'task_manager.routers.ReplicaRouter',
+]
+# 書き込んだユーザーの読み取りを default に固定する秒数（レプリケーション遅延より長くする）
+# 固定の記録は default のキャッシュに置く。複数プロセスで動かす場合、別のプロセスでも
+# 固定させるには共有のキャッシュ（Redis など）を指定する（LocMemCache はプロセスごと）
+REPLICA_STICKY_SECONDS = 5
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -223,8 +290,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework設定
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
+        'authentication.authentication.CachedTokenAuthentication',
+        'authentication.authentication.RoutedSessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -237,7 +304,7 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'task_manager.timing.TimedJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -247,6 +314,69 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
 }
 
+# トークン認証キャッシュ（authentication.token_cache）
+# LOCAL_* はプロセス内 LRU、TIMEOUT は CACHE_ALIAS のキャッシュの有効期間（秒）
+# LRU のエントリーは CACHE_ALIAS のバージョンキーと照合してから使う。複数プロセスで
+# 動かす場合、ログアウトを全プロセスに反映させるには共有のキャッシュ（Redis など）を指定する
+TOKEN_AUTH_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_TIMEOUT': 30,
+    'LOCAL_MAX_ENTRIES': 10000,
+}
+
+# ログイン（authentication.login）
+# SESSION: False にするとトークンのみのログインを既定にする
+# PASSWORD_*: パスワードのハッシュ計算を同時に行う数と、順番を待てる数（あふれたら 429）
+# LAST_LOGIN_*: トークンのみのログインで last_login をまとめて書き込む間隔（秒）と件数
+LOGIN_OPTIONS = {
+    'SESSION': True,
+    'PASSWORD_WORKERS': 4,
+    'PASSWORD_QUEUE_SIZE': 32,
+    'LAST_LOGIN_FLUSH_INTERVAL': 30,
+    'LAST_LOGIN_MAX_PENDING': 1000,
+}
+
+# 処理時間の計測（task_manager.timing、Server-Timing ヘッダー）
+# LOG: 計測結果をログに記録する
+# EXPLAIN_THRESHOLD_MS: 最も遅い SELECT がこれを超えたら実行計画を記録（None で無効）
+SERVER_TIMING = {
+    'ENABLED': True,
+    'LOG': False,
+    'EXPLAIN_THRESHOLD_MS': 200,
+}
+
+# メトリクス（task_manager.metrics、/metrics）
+# 複数プロセスで動かす場合は METRICS_DIR に共有ディレクトリを指定する
+# （各プロセスが FLUSH_INTERVAL 秒ごとに書き出し、/metrics で合算する）
+# /metrics は METRICS_TOKEN の Bearer トークンか、METRICS_ALLOWED_IPS（カンマ区切り）の
+# 接続元からのみ取得できる。リバースプロキシの背後では接続元がプロキシになるため、
+# アドレスではなくトークンで保護すること（開発時はローカルホストを許可する）
+METRICS = {
+    'ENABLED': True,
+    'DIRECTORY': os.environ.get('METRICS_DIR') or None,
+    'FLUSH_INTERVAL': 5,
+    'TOKEN': os.environ.get('METRICS_TOKEN') or None,
+    'ALLOWED_IPS': os.environ.get(
+        'METRICS_ALLOWED_IPS', '127.0.0.1,::1' if DEBUG else ''
+    ).split(','),
+}
+
+# ビューごとの SQL の上限（task_manager.query_budgets、@query_budget で宣言）
+# QUERY_BUDGET=1 で有効にすると、超過や同じ SQL の繰り返し（N+1）を
+# スタックトレース付きで task_manager.query_budgets に WARNING で記録する
+QUERY_BUDGET = {
+    'ENABLED': os.environ.get('QUERY_BUDGET', '0') == '1',
+    'RAISE': False,
+    'STACK_LIMIT': 8,
+}
+
+# タスク変更イベントの配信（Server-Sent Events）
+# 複数プロセスで動かす場合は Redis などを使う Broker 実装に差し替える
+TASK_EVENT_BROKER = 'tasks.events.InMemoryBroker'
+TASK_EVENT_QUEUE_SIZE = 100
+TASK_EVENT_HEARTBEAT = 15
+
 # CORS設定（開発環境用）
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -280,33 +410,53 @@ SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
 # ログ設定
+# リクエストのスレッドは有界キューに積むだけで、整形と書き込みは
+# バックグラウンドのスレッドが行う（task_manager.log.BoundedQueueHandler）。
+# ファイルには 1 行 1 レコードの JSON を出力し、サイズでローテーションする。
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+# テスト実行中はファイルに書き込まない（LOG_FILE を指定した場合はそのパスに書き込む）
+LOG_FILE = os.environ.get('LOG_FILE') or (
+    None if sys.argv[1:2] == ['test'] else os.path.join(BASE_DIR, 'django.log')
+)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
-        'file': {
-            'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'django.log'),
-        },
-        'console': {
+        'queue': {
             'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
+            'class': 'task_manager.log.BoundedQueueHandler',
+            'filename': LOG_FILE,
+            'max_bytes': 10 * 1024 * 1024,
+            'backup_count': 5,
+            'file_level': 'INFO',
+            'console': DEBUG,
+            'console_level': 'DEBUG',
+            # アクセスログはファイルのみ（runserver は django.server が出力する）
+            'console_exclude': ['task_manager.request'],
+            'queue_size': LOG_QUEUE_SIZE,
+            # キューが満杯のときは新しいレコードを捨てる（'old' なら古いものを捨てる）
+            'drop_policy': 'new',
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': True,
+        },
+        'task_manager': {
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
         'tasks': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'DEBUG',
             'propagate': True,
         },
         'authentication': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'DEBUG',
             'propagate': True,
         },
@@ -0,0 +1,187 @@
+# backend/task_manager/timing.py
+"""リクエストごとの処理時間の計測
+
+server_timing_middleware がリクエストの間だけ RequestTimings を有効にし、
+全体・SQL（件数と合計時間）・認証・シリアライズ（to_representation と
+JSON 変換）の時間を
+Server-Timing ヘッダーで返す。SQL は各接続の execute_wrapper で計測する。
+最も遅い SELECT が EXPLAIN_THRESHOLD_MS を超えた場合は
+実行計画（EXPLAIN）と合わせて WARNING で記録する。
+"""
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+
+DEFAULTS = {
+    'ENABLED': True,
+    # True にすると計測結果を task_manager.timing に INFO で記録する
+    'LOG': False,
+    # 最も遅い SELECT がこの時間（ミリ秒）を超えたら EXPLAIN を記録（None で無効）
+    'EXPLAIN_THRESHOLD_MS': 200,
+}
+
+logger = logging.getLogger('task_manager.timing')
+
+_current = ContextVar('request_timings', default=None)
+
+
+def get_option(name):
+    return {**DEFAULTS, **getattr(settings, 'SERVER_TIMING', {})}[name]
+
+
+class RequestTimings:
+    """1 リクエスト分の計測結果（秒）"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = None
+        self.phases = defaultdict(float)
+        self.active = set()
+        self.db_count = 0
+        self.db_time = 0.0
+        # (秒, エイリアス, SQL, パラメーター)
+        self.slowest = None
+
+    def add_query(self, alias, sql, params, many, duration):
+        self.db_count += 1
+        self.db_time += duration
+        if not many and (self.slowest is None or duration > self.slowest[0]):
+            self.slowest = (duration, alias, sql, params)
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def metrics(self):
+        """Server-Timing の (名前, ミリ秒, 説明) の一覧"""
+        metrics = [('total', self.total, None)]
+        metrics.append(('db', self.db_time, f'{self.db_count} queries'))
+        for name, duration in self.phases.items():
+            metrics.append((name, duration, None))
+        return [(name, duration * 1000, desc) for name, duration, desc in metrics]
+
+    def header(self):
+        values = []
+        for name, duration, desc in self.metrics():
+            value = f'{name};dur={duration:.2f}'
+            if desc:
+                value += f';desc="{desc}"'
+            values.append(value)
+        return ', '.join(values)
+
+
+@contextmanager
+def phase(name):
+    """ブロックの実行時間を現在のリクエストの name に加算（入れ子は外側だけ数える）"""
+    timings = _current.get()
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[name] += time.perf_counter() - started
+        timings.active.discard(name)
+
+
+def time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(
+            context['connection'].alias, sql, params, many, time.perf_counter() - started
+        )
+
+
+def install(connection):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+@receiver(connection_created)
+def install_on_connect(sender, connection, **kwargs):
+    install(connection)
+
+
+def start():
+    # このモジュールの読み込み前に作られた接続にも入れる
+    for connection in connections.all(initialized_only=True):
+        install(connection)
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def stop(timings):
+    timings.finish()
+    _current.set(None)
+    threshold = get_option('EXPLAIN_THRESHOLD_MS')
+    slowest = timings.slowest
+    return (
+        threshold is not None
+        and slowest is not None
+        and slowest[0] * 1000 >= threshold
+        and slowest[2].lstrip()[:6].upper() == 'SELECT'
+    )
+
+
+def explain(alias, sql, params):
+    """SQL の実行計画を文字列で返す"""
+    connection = connections[alias]
+    prefix = connection.ops.explain_query_prefix()
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def log_slow_query(request, timings):
+    duration, alias, sql, params = timings.slowest
+    try:
+        plan = explain(alias, sql, params)
+    except DatabaseError as exc:
+        plan = f'EXPLAIN failed: {exc}'
+    logger.warning(
+        'Slow query (%.1f ms) in %s %s', duration * 1000, request.method, request.path,
+        extra={'alias': alias, 'sql': sql, 'duration_ms': round(duration * 1000, 2),
+               'plan': plan},
+    )
+
+
+def finish_response(request, response, timings):
+    response['Server-Timing'] = timings.header()
+    if get_option('LOG'):
+        logger.info(
+            'Timing %s %s', request.method, request.path,
+            extra={f'{name}_ms': round(duration, 2) for name, duration, _ in timings.metrics()}
+            | {'db_count': timings.db_count},
+        )
+    return response
+
+
+class TimedSerializerMixin:
+    """to_representation の時間を serialize として計測するシリアライザーのミックスイン"""
+
+    def to_representation(self, instance):
+        with phase('serialize'):
+            return super().to_representation(instance)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSON 変換の時間を serialize として計測する JSONRenderer"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with phase('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
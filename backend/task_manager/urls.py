@@ -19,8 +19,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('authentication.urls')),
     path('api/tasks/', include('tasks.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,16 @@
+# backend/tasks/async_urls.py
+# ASGI で動かす場合の URL 設定（一覧・詳細・切り替え・統計を非同期ビューで処理）
+from django.urls import path
+from . import async_views, views
+
+urlpatterns = [
+    path('', async_views.task_list_create, name='task-list-create'),
+    path('batch/', views.TaskBatchView.as_view(), name='task-batch'),
+    path('export/', views.TaskExportView.as_view(), name='task-export'),
+    path('import/', views.TaskImportView.as_view(), name='task-import'),
+    path('<int:pk>/', async_views.task_detail, name='task-detail'),
+    path('<int:pk>/toggle/', async_views.toggle_task_completion, name='task-toggle'),
+    path('statistics/', async_views.task_statistics, name='task-statistics'),
+    path('changes/', views.task_changes, name='task-changes'),
+    path('events/', async_views.task_events, name='task-events'),
+]
@@ -0,0 +1,290 @@
+# backend/tasks/async_views.py
+"""タスクAPIの非同期実装（ASGI 用）
+
+tasks.views と同じパーミッション（IsAuthenticated）・シリアライザー・
+フィルター・ページネーションを使い、データベースアクセスは Django の
+非同期 ORM で行う。トランザクションや raw クエリなど非同期 ORM が
+対応していない処理だけを sync_to_async で実行する。
+認証は同期ビューと同じ順で、Authorization: Token <key> ヘッダー
+（CachedTokenAuthentication と同じトークンキャッシュを使う）、無ければセッションで行う。
+セッションの場合は SessionAuthentication と同じく安全でないメソッドで CSRF を検証する。
+クエリパラメーターのトークン（?token=）はヘッダーを送れない EventSource 用に
+task_events だけで受け付ける。
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import InvalidPage, Page
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import exceptions, status
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+
+from authentication.token_cache import token_cache
+from task_manager import query_budgets, routers, timing
+from task_manager.query_budgets import query_budget
+from task_manager.timing import TimedJSONRenderer
+
+from . import conditional, events, statistics
+from .models import Task
+from .pagination import TaskKeysetPagination
+from .search import TaskSearchFilter, get_search_backend, is_search_backend_loaded
+from .serializers import TaskCreateSerializer, TaskSerializer, TaskUpdateSerializer
+from .views import TaskListCreateView, toggle_task
+
+PARSER_CLASSES = [JSONParser, FormParser, MultiPartParser]
+
+
+async def authenticate(request, allow_query_token=False):
+    """トークン（allow_query_token なら ?token= も可）、無ければセッションでユーザーを取得"""
+    with timing.phase('auth'), query_budgets.unbudgeted():
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Token '):
+            key = header[len('Token '):]
+        elif allow_query_token:
+            key = request.GET.get('token')
+        else:
+            key = None
+        if key:
+            return await authenticate_token(key)
+        return await authenticate_session(request)
+
+
+async def authenticate_token(key):
+    user = token_cache.get(key)
+    if user is None:
+        token = await Token.objects.select_related('user').filter(key=key).afirst()
+        if token is None and routers.get_replicas():
+            # 発行直後のトークンがレプリカにまだ無い場合
+            token = await Token.objects.using(DEFAULT_DB_ALIAS).select_related('user').filter(
+                key=key
+            ).afirst()
+        if token is None or not token.user.is_active:
+            return None
+        user = token.user
+        token_cache.set(key, user)
+    routers.set_user(user.pk)
+    return user
+
+
+async def authenticate_session(request):
+    if not hasattr(request, 'session'):
+        return None
+    user = await sync_to_async(get_user)(request)
+    if not user.is_active:
+        return None
+    if request.method not in SAFE_METHODS:
+        SessionAuthentication().enforce_csrf(request)
+    routers.set_user(user.pk)
+    return user
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(
+        TimedJSONRenderer().render(data),
+        content_type='application/json',
+        status=status_code
+    )
+
+
+def error(exception):
+    response = render({'detail': exception.detail}, exception.status_code)
+    if isinstance(exception, exceptions.NotAuthenticated):
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+def api_request(request, user):
+    """DRF のパーサー・クエリパラメーターを使うための Request"""
+    api = Request(request, parsers=[parser() for parser in PARSER_CLASSES])
+    api.user = user
+    return api
+
+
+def async_api_view(methods):
+    """認証・許可メソッドの確認を行う非同期ビューのデコレーター"""
+    def decorator(func):
+        async def view(request, *args, **kwargs):
+            if request.method not in methods:
+                return error(exceptions.MethodNotAllowed(request.method))
+            try:
+                user = await authenticate(request)
+                if user is None:
+                    raise exceptions.NotAuthenticated()
+                return await func(api_request(request, user), *args, **kwargs)
+            except exceptions.APIException as exception:
+                return error(exception)
+        view.__name__ = func.__name__
+        view.__doc__ = func.__doc__
+        # CSRF はセッション認証の場合だけ authenticate_session で検証する
+        # （Django 4.2 の csrf_exempt は非同期ビュー非対応）
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+async def paginate(view, queryset, request):
+    """TaskListCreateView と同じページネーションで 1 ページ分を取得"""
+    paginator = view.paginator
+    if isinstance(paginator, TaskKeysetPagination):
+        page_queryset = paginator.page_queryset(queryset, request, view)
+        paginator.paginate_results([task async for task in page_queryset])
+        return paginator, paginator.page
+
+    # PageNumberPagination: 件数だけ先に非同期で取得し、Django の Paginator に渡す
+    page_size = paginator.get_page_size(request)
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    try:
+        number = django_paginator.validate_number(page_number)
+    except InvalidPage as exc:
+        raise exceptions.NotFound(
+            paginator.invalid_page_message.format(page_number=page_number, message=str(exc))
+        )
+    offset = (number - 1) * page_size
+    results = [task async for task in queryset[offset:offset + page_size]]
+    paginator.page = Page(results, number, django_paginator)
+    paginator.request = request
+    return paginator, results
+
+
+# SQL の上限は tasks.views の同じ API と同じ
+@query_budget(GET=3, POST=3)
+@async_api_view(['GET', 'POST'])
+async def task_list_create(request):
+    """タスク一覧取得・作成API"""
+    if request.method == 'POST':
+        serializer = TaskCreateSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        task = await Task.objects.acreate(user=request.user, **serializer.validated_data)
+        return render(TaskCreateSerializer(task).data, status.HTTP_201_CREATED)
+
+    etag = conditional.task_validators(
+        request.user, await statistics.aload_statistics(request.user)
+    )
+    response = conditional.not_modified(request, etag)
+    if response is not None:
+        return conditional.set_validators(response, etag)
+
+    view = TaskListCreateView(request=request, args=(), kwargs={}, format_kwarg=None)
+    if TaskSearchFilter().get_search_terms(request) and not is_search_backend_loaded(Task.objects.db):
+        await sync_to_async(get_search_backend)(Task.objects.db)
+    queryset = view.filter_queryset(view.get_queryset())
+
+    paginator, page = await paginate(view, queryset, request)
+    data = TaskSerializer(page, many=True, context={'request': request}).data
+    response = render(paginator.get_paginated_response(data).data)
+    return conditional.set_validators(response, etag)
+
+
+@query_budget(4, GET=2)
+@async_api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
+async def task_detail(request, pk):
+    """タスク詳細取得・更新・削除API"""
+    if request.method == 'GET':
+        etag = conditional.task_validators(
+            request.user, await statistics.aload_statistics(request.user), pk
+        )
+        response = conditional.not_modified(request, etag)
+        if response is not None:
+            return conditional.set_validators(response, etag)
+
+    task = await Task.objects.filter(user=request.user, pk=pk).afirst()
+    if task is None:
+        raise exceptions.NotFound()
+
+    if request.method == 'GET':
+        response = render(TaskSerializer(task, context={'request': request}).data)
+        return conditional.set_validators(response, etag)
+
+    if request.method == 'DELETE':
+        await task.adelete()
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+    serializer = TaskUpdateSerializer(
+        task, data=request.data, partial=request.method == 'PATCH',
+        context={'request': request}
+    )
+    if not serializer.is_valid():
+        return render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    for field, value in serializer.validated_data.items():
+        setattr(task, field, value)
+    await task.asave()
+    return render(serializer.data)
+
+
+@query_budget(3)
+@async_api_view(['POST'])
+async def toggle_task_completion(request, pk):
+    """タスクの完了状態を切り替え"""
+    # 条件付き UPDATE とカウンター更新を 1 トランザクションで行うため同期実行
+    task = await sync_to_async(toggle_task)(request.user, pk)
+    if task is None:
+        return render({'error': 'タスクが見つかりません。'}, status.HTTP_404_NOT_FOUND)
+    return render(TaskSerializer(task, context={'request': request}).data)
+
+
+@query_budget(1)
+@async_api_view(['GET'])
+async def task_statistics(request):
+    """タスク統計API"""
+    row = await statistics.aload_statistics(request.user)
+    etag = conditional.statistics_validators(row)
+    response = conditional.not_modified(request, etag)
+    if response is None:
+        response = render(statistics.statistics_data(row))
+    return conditional.set_validators(response, etag)
+
+
+async def event_stream(subscription, heartbeat):
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            event = await subscription.get(timeout=heartbeat)
+            if event is None:
+                yield ': keep-alive\n\n'
+                continue
+            data = json.dumps(event['data'], ensure_ascii=False)
+            yield f"event: {event['type']}\ndata: {data}\n\n"
+    finally:
+        subscription.close()
+
+
+@query_budget(0)
+async def task_events(request):
+    """タスク変更イベントの配信API（Server-Sent Events、ASGI で使用）
+
+    tasks.changed イベントで変更されたタスクの ID を通知する。
+    resync イベントを受け取った場合は差分同期APIで取り直すこと。
+    WSGI では Django が非同期の本体を最後まで読んでから返すため（終わらない）、501 を返す。
+    """
+    if not isinstance(request, ASGIRequest):
+        return render(
+            {'detail': 'イベントの配信は ASGI サーバーでのみ利用できます。'},
+            status.HTTP_501_NOT_IMPLEMENTED
+        )
+    if request.method != 'GET':
+        return error(exceptions.MethodNotAllowed(request.method))
+
+    # EventSource はヘッダーを送れないため ?token= でも認証する（GET のみのため CSRF は不要）
+    user = await authenticate(request, allow_query_token=True)
+    if user is None:
+        return error(exceptions.NotAuthenticated())
+
+    subscription = events.get_broker().subscribe(user.pk)
+    heartbeat = getattr(settings, 'TASK_EVENT_HEARTBEAT', 15)
+    response = StreamingHttpResponse(
+        event_stream(subscription, heartbeat), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
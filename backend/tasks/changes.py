@@ -0,0 +1,57 @@
+# backend/tasks/changes.py
+"""差分同期用の変更履歴（TaskChange）の記録と変更イベントの発行
+
+TaskChange.id を同期トークンにするため、id の順にコミットされる必要がある。
+SQLite は書き込みが 1 つずつのためこれを満たすが、PostgreSQL などでは満たさない
+（tasks.checks が警告する）。
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import router
+
+from . import events
+from .models import TaskChange
+
+_local = threading.local()
+
+
+def record(user_id, task_ids):
+    """タスクの変更を記録（batched() 内ではまとめて 1 回の INSERT）"""
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.extend((user_id, task_id) for task_id in task_ids)
+        return
+    TaskChange.objects.db_manager(hints={'user_id': user_id}).bulk_create(
+        [TaskChange(user_id=user_id, task_id=task_id) for task_id in task_ids]
+    )
+    events.publish_task_changes(user_id, task_ids)
+
+
+@contextmanager
+def batched():
+    """ブロック内の変更記録をまとめ、終了時に bulk_create で反映"""
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+    _local.pending = []
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    by_user = defaultdict(list)
+    for user_id, task_id in pending:
+        by_user[user_id].append(task_id)
+    # シャーディング時はユーザーごとに書き込み先が異なるため、データベースごとにまとめる
+    by_database = defaultdict(list)
+    for user_id, task_ids in by_user.items():
+        using = router.db_for_write(TaskChange, user_id=user_id)
+        by_database[using].extend(
+            TaskChange(user_id=user_id, task_id=task_id) for task_id in task_ids
+        )
+    for using, entries in by_database.items():
+        TaskChange.objects.using(using).bulk_create(entries, batch_size=500)
+    for user_id, task_ids in by_user.items():
+        events.publish_task_changes(user_id, task_ids)
@@ -0,0 +1,28 @@
+# backend/tasks/checks.py
+"""tasks アプリのシステムチェック"""
+from django.core import checks
+from django.db import connections, router
+
+from .models import TaskChange
+
+
+@checks.register()
+def check_change_log_backend(app_configs, **kwargs):
+    """差分同期の同期トークン（TaskChange.id）が SQLite 以外で使われていないか
+
+    同期トークンは「その id 以下の変更はすべて見えている」ことを前提にしている。
+    SQLite は書き込みが 1 つずつのため id の順にコミットされるが、PostgreSQL などでは
+    id の採番とコミットの順が入れ替わり、クライアントが変更を取りこぼしうる。
+    """
+    return [
+        checks.Warning(
+            f"Database '{alias}' stores TaskChange on {connections[alias].vendor}; "
+            'sync tokens assume changes commit in id order, which only SQLite guarantees.',
+            hint='Keep the task databases on SQLite, or hold back tokens newer than the '
+                 'oldest in-flight transaction before using another backend.',
+            obj=TaskChange,
+            id='tasks.W001',
+        )
+        for alias in connections
+        if connections[alias].vendor != 'sqlite' and router.allow_migrate_model(alias, TaskChange)
+    ]
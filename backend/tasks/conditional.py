@@ -0,0 +1,46 @@
+# backend/tasks/conditional.py
+"""タスク API の条件付き GET（ETag / 304）
+
+検証子はユーザーごとの TaskStatistics.version（タスク書き込みのたびに増加）と
+期限切れ件数から作る。期限切れ件数を含めるのは、書き込みが無くても
+時間経過で is_overdue / overdue_tasks が変わるため（未完了タスクは
+期限切れにしかならないので、件数が同じなら期限切れの集合も同じ）。
+Last-Modified は返さない。期限切れ件数やユーザー名・メールアドレスの変更には
+日時が無く、If-Modified-Since だけのクライアントに古い内容の 304 を返してしまうため。
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def task_validators(user, statistics, *extra):
+    """タスク一覧・詳細の検証子（埋め込まれるユーザー情報も含める）"""
+    return make_etag(
+        'tasks', user.pk, user.username, user.email,
+        statistics.version, statistics.overdue, *extra
+    )
+
+
+def statistics_validators(statistics):
+    """統計 API の検証子"""
+    return make_etag('statistics', statistics.user_id, statistics.version, statistics.overdue)
+
+
+def not_modified(request, etag):
+    """検証子が一致すれば 304 レスポンス、それ以外は None"""
+    return get_conditional_response(request, etag=etag)
+
+
+def set_validators(response, etag):
+    """レスポンスに検証子を付与（ユーザーごとに異なるため private）"""
+    if response.status_code not in (200, 304):
+        return response
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
@@ -0,0 +1,142 @@
+# backend/tasks/events.py
+"""タスク変更イベントの配信
+
+Task の書き込み（tasks.changes.record）をトランザクション確定後に
+ブローカーへ publish し、購読中の接続（Server-Sent Events）へ配信する。
+ブローカーは settings.TASK_EVENT_BROKER で差し替えられる。既定の
+InMemoryBroker は同一プロセス内のみで配信するため、複数プロセスで
+動かす場合は Redis などを使う Broker 実装に切り替えること。
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils.module_loading import import_string
+
+from .models import TaskChange
+
+DEFAULT_BROKER = 'tasks.events.InMemoryBroker'
+DEFAULT_QUEUE_SIZE = 100
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    """1 接続分の購読（イベントループ上の有界キュー）
+
+    キューが溢れた場合は以降のイベントを捨て、次の取得時に
+    resync イベントを返してクライアントに差分同期をやり直させる。
+    """
+
+    def __init__(self, broker, user_id, maxsize, loop):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+        self.closed = False
+
+    def deliver(self, event):
+        """イベントループのスレッドから呼ばれる"""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def deliver_threadsafe(self, event):
+        self.loop.call_soon_threadsafe(self.deliver, event)
+
+    async def get(self, timeout=None):
+        """次のイベントを返す（timeout 秒以内に無ければ None）"""
+        if self.overflowed:
+            self.overflowed = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return {'type': 'resync', 'data': {}}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broker.unsubscribe(self)
+
+
+class Broker:
+    """配信ブローカーのインターフェース"""
+
+    def publish(self, user_id, event):
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """現在のイベントループ上で購読を開始し Subscription を返す"""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class InMemoryBroker(Broker):
+    """プロセス内で購読者へファンアウトするブローカー"""
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or getattr(
+            settings, 'TASK_EVENT_QUEUE_SIZE', DEFAULT_QUEUE_SIZE
+        )
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def publish(self, user_id, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.deliver_threadsafe(event)
+            except RuntimeError:
+                # イベントループが既に閉じている
+                self.unsubscribe(subscription)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(
+            self, user_id, self.queue_size, asyncio.get_running_loop()
+        )
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.user_id]
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'TASK_EVENT_BROKER', DEFAULT_BROKER)
+                _broker = import_string(path)()
+    return _broker
+
+
+def reset_broker():
+    global _broker
+    _broker = None
+
+
+def publish_task_changes(user_id, task_ids):
+    """トランザクション確定後に tasks.changed イベントを publish"""
+    event = {'type': 'tasks.changed', 'data': {'task_ids': list(task_ids)}}
+    using = router.db_for_write(TaskChange, user_id=user_id)
+    transaction.on_commit(lambda: get_broker().publish(user_id, event), using=using)
@@ -0,0 +1,180 @@
+# backend/tasks/export.py
+"""タスクのエクスポート（NDJSON / CSV のストリーミング）
+
+一覧と同じ絞り込みを適用したクエリセットを .iterator(chunk_size) で少しずつ読み、
+1 行ずつ変換して StreamingHttpResponse で返す。全件をメモリに載せないため、
+件数に関わらず使用メモリは一定。ASGI では非同期のイテレーターを返す
+（同期イテレーターは Django が全件読み込んでから返すため）。
+"""
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import TaskSerializer
+
+EXPORT_FIELDS = [
+    'id', 'title', 'description', 'is_completed', 'priority',
+    'due_date', 'created_at', 'updated_at',
+]
+CSV_HEADER = EXPORT_FIELDS + ['is_overdue']
+
+# データベースから 1 回に読む行数
+CHUNK_SIZE = 2000
+# 1 回の書き出しにまとめる行数
+ROWS_PER_WRITE = 500
+
+
+class Echo:
+    """csv.writer の出力をそのまま返すバッファ"""
+
+    def write(self, value):
+        return value
+
+
+class ExportRenderer(BaseRenderer):
+    """エクスポート形式のレンダラー
+
+    タスクの行は stream_tasks が lines() で生成する。render() はエラーなど
+    通常の Response のデータを同じ形式で返すために使われる。
+    """
+
+    charset = 'utf-8'
+    extension = None
+
+    def header(self):
+        return ''
+
+    def lines(self, rows):
+        raise NotImplementedError
+
+
+class NDJSONRenderer(ExportRenderer):
+    """1 行 1 タスクの JSON"""
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    extension = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return ''.join(self.lines([data])).encode(self.charset)
+
+    def lines(self, rows):
+        for row in rows:
+            yield json.dumps(row, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class CSVRenderer(ExportRenderer):
+    """CSV（Excel で文字化けしないよう BOM 付き。真偽値は true / false、None は空）"""
+
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        writer = csv.writer(Echo())
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        return (writer.writerow(list(data)) + writer.writerow(
+            [format_csv_value(value) for value in data.values()]
+        )).encode(self.charset)
+
+    def header(self):
+        return '\ufeff' + csv.writer(Echo()).writerow(CSV_HEADER)
+
+    def lines(self, rows):
+        writer = csv.writer(Echo())
+        for row in rows:
+            yield writer.writerow([format_csv_value(row[name]) for name in CSV_HEADER])
+
+
+def format_csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+def field_converter(field):
+    """シリアライザーのフィールドの to_representation
+
+    ISO 8601 の DateTimeField はタイムゾーンの解決を最初の 1 回だけにした同じ変換を使う
+    （行ごとに解決すると、エクスポートの処理時間の大半を占めるため）。
+    """
+    if not isinstance(field, serializers.DateTimeField):
+        return field.to_representation
+    tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if tz is None or getattr(field, 'format', api_settings.DATETIME_FORMAT) != ISO_8601:
+        return field.to_representation
+
+    def convert(value):
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def row_formatter():
+    """values_list の 1 行を API と同じ表現の dict にする関数"""
+    fields = TaskSerializer().fields
+    converters = [field_converter(fields[name]) for name in EXPORT_FIELDS]
+    indexes = {name: index for index, name in enumerate(EXPORT_FIELDS)}
+    due_date, is_completed = indexes['due_date'], indexes['is_completed']
+    now = timezone.now()
+
+    def format_row(values):
+        row = {
+            name: None if value is None else convert(value)
+            for name, convert, value in zip(EXPORT_FIELDS, converters, values)
+        }
+        row['is_overdue'] = (
+            values[due_date] is not None and not values[is_completed] and values[due_date] < now
+        )
+        return row
+    return format_row
+
+
+def export_queryset(queryset):
+    """エクスポートする列のクエリセット
+
+    ルーティング（シャード・レプリカ）は応答を返す前に確定させるため、
+    ビューの中で呼ぶこと（本体はビューを抜けた後に読まれる）。
+    """
+    return queryset.using(queryset.db).values_list(*EXPORT_FIELDS)
+
+
+def stream_tasks(queryset, renderer):
+    """export_queryset の結果を ROWS_PER_WRITE 行ずつまとめて返すイテレーター"""
+    format_row = row_formatter()
+    header = renderer.header()
+    if header:
+        yield header
+    rows = []
+    for values in queryset.iterator(chunk_size=CHUNK_SIZE):
+        rows.append(format_row(values))
+        if len(rows) >= ROWS_PER_WRITE:
+            yield ''.join(renderer.lines(rows))
+            rows = []
+    if rows:
+        yield ''.join(renderer.lines(rows))
+
+
+async def astream_tasks(queryset, renderer):
+    """stream_tasks の非同期版（ASGI 用）
+
+    Django 4.2 の aiterator() は values_list のクエリを非同期のコンテキストで
+    実行してしまうため、同期版を sync_to_async で 1 回分ずつ進める。
+    """
+    chunks = stream_tasks(queryset, renderer)
+    while True:
+        chunk = await sync_to_async(next)(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
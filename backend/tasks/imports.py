@@ -0,0 +1,166 @@
+# backend/tasks/imports.py
+"""タスクのインポート（NDJSON / CSV）
+
+ファイルを 1 行ずつ読み、各レコードを TaskImportSerializer（作成 API と同じ
+タイトル・優先度の検証）で検証して、有効な行を batch_size 件ずつ bulk_create で
+登録する。統計カウンターと変更履歴はバッチごとにまとめて更新する。
+ファイル全体をメモリに載せず、エラーも先頭の max_errors 件だけを保持する
+（全件は on_error で 1 件ずつ受け取れる）。
+
+エクスポート（tasks.export）の出力はそのまま読み込める。id や作成日時などの
+入力に無い項目は無視する。
+"""
+import csv
+import json
+import os
+
+from django.db import router, transaction
+from rest_framework.exceptions import ValidationError
+
+from . import changes, statistics
+from .models import Task
+from .serializers import TaskImportSerializer
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+}
+EXTENSIONS = {'.ndjson': 'ndjson', '.jsonl': 'ndjson', '.csv': 'csv'}
+
+# 1 回の bulk_create とトランザクションで登録する行数
+BATCH_SIZE = 1000
+# 結果に含めるエラーの件数
+MAX_ERRORS = 100
+
+BOM = b'\xef\xbb\xbf'
+INVALID_JSON = {'non_field_errors': ['JSON の形式が正しくありません。']}
+INVALID_CSV = {'non_field_errors': ['CSV の形式が正しくありません。']}
+INVALID_ENCODING = {'non_field_errors': ['UTF-8 として読み込めない文字が含まれています。']}
+
+
+def detect_format(content_type=None, filename=None):
+    """Content-Type かファイル名の拡張子から形式を判定（不明なら None）"""
+    if content_type:
+        fmt = CONTENT_TYPES.get(content_type.split(';')[0].strip().lower())
+        if fmt:
+            return fmt
+    if filename:
+        return EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+    return None
+
+
+def read_ndjson(lines):
+    """バイト列の行から (行番号, データ, エラー) を順に返す（空行は読み飛ばす）"""
+    for number, line in enumerate(lines, 1):
+        if number == 1:
+            line = line.removeprefix(BOM)
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield number, None, INVALID_JSON
+            continue
+        yield number, data, None
+
+
+def read_csv(lines):
+    """バイト列の行から (行番号, データ, エラー) を順に返す
+
+    1 行目は項目名。空のセルは未指定として扱う（既定値が使われる）。
+    行番号は複数行にわたるレコードの場合は最後の行。
+    """
+    def decode(lines):
+        for number, line in enumerate(lines, 1):
+            if number == 1:
+                line = line.removeprefix(BOM)
+            yield line.decode('utf-8', errors='replace')
+
+    reader = csv.DictReader(decode(lines))
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            yield reader.line_num, None, INVALID_CSV
+            continue
+        data = {
+            key: value for key, value in row.items()
+            if key is not None and value not in ('', None)
+        }
+        if any('\ufffd' in value for value in data.values()):
+            yield reader.line_num, None, INVALID_ENCODING
+            continue
+        yield reader.line_num, data, None
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+def read_records(lines, fmt):
+    return READERS[fmt](lines)
+
+
+class TaskImporter:
+    """1 ユーザー分のレコードを検証し、バッチごとに登録する"""
+
+    def __init__(self, user, batch_size=None, dry_run=False, max_errors=MAX_ERRORS,
+                 on_error=None):
+        self.user = user
+        self.batch_size = batch_size or BATCH_SIZE
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+        self.on_error = on_error
+        self.using = router.db_for_write(Task, user_id=user.pk)
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, records):
+        # フィールドの組み立てを 1 回で済ませるため、同じシリアライザーで検証する
+        serializer = TaskImportSerializer()
+        batch = []
+        for line, data, errors in records:
+            if errors is None:
+                try:
+                    batch.append(Task(user=self.user, **serializer.run_validation(data)))
+                except ValidationError as exc:
+                    errors = exc.detail
+            if errors is not None:
+                self.add_error(line, errors)
+            elif len(batch) >= self.batch_size:
+                self.save(batch)
+                batch = []
+        if batch:
+            self.save(batch)
+        return self.result()
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        error = {'line': line, 'errors': errors}
+        if len(self.errors) < self.max_errors:
+            self.errors.append(error)
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def save(self, tasks):
+        if not self.dry_run:
+            with transaction.atomic(using=self.using), statistics.batched(), changes.batched():
+                Task.objects.using(self.using).bulk_create(tasks)
+                for task in tasks:
+                    statistics.task_created(task)
+                changes.record(self.user.pk, [task.pk for task in tasks])
+        self.created += len(tasks)
+
+    def result(self):
+        """dry_run の場合の created は登録できる件数"""
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'dry_run': self.dry_run,
+        }
@@ -1,13 +1,212 @@
-# backend/tasks/management/commands/create_sample_data.py
-from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
-from tasks.models import Task
-from datetime import datetime, timedelta
+import multiprocessing
 import random
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import sql
+from django.utils import timezone
+from tasks.models import Task, TaskChange, TaskStatistics
+from tasks.sharding import shard_for
+from tasks.statistics import COUNTER_FIELDS, counter_values
+
+PASSWORD = 'testpass123'
+
+SAMPLE_TASKS = [
+    ('プロジェクトの計画書作成', 'プロジェクトの詳細な計画書を作成する'),
+    ('データベース設計', 'アプリケーションのデータベース設計を行う'),
+    ('UI/UXデザイン', 'ユーザーインターフェースの設計'),
+    ('テストケース作成', '単体テストと結合テストのケース作成'),
+    ('ドキュメント作成', 'API仕様書とユーザーマニュアルの作成'),
+    ('セキュリティ監査', 'アプリケーションのセキュリティチェック'),
+    ('パフォーマンステスト', 'アプリケーションの性能測定'),
+    ('デプロイメント準備', '本番環境へのデプロイ準備'),
+    ('コードレビュー', 'チームメンバーのコードレビュー'),
+    ('定期メンテナンス', 'システムの定期メンテナンス作業'),
+]
+
+PRIORITIES = ['low', 'medium', 'high']
+PRIORITY_WEIGHTS = [3, 5, 2]
+
+# 1 つのワーカーに渡すタスク数の目安（ユーザー単位で分割する）
+CHUNK_TASKS = 100000
+# IN 句に並べるユーザー ID の数
+ID_BATCH_SIZE = 500
+
+
+def task_counts(user_ids, total, skew, rng):
+    """ユーザーごとのタスク数（skew > 0 ならパレート分布で一部のユーザーに偏らせる）"""
+    if not user_ids:
+        return {}
+    if skew > 0:
+        weights = [rng.paretovariate(skew) for _ in user_ids]
+    else:
+        weights = [1.0] * len(user_ids)
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    # 端数を重みの大きい順に配って合計を total に合わせる
+    order = sorted(range(len(user_ids)), key=lambda index: -weights[index])
+    for index in order[:total - sum(counts)]:
+        counts[index] += 1
+    return dict(zip(user_ids, counts))
+
+
+def generate_tasks(user_id, count, options, now):
+    """ユーザー 1 人分のタスクを作成日時順に生成（--seed とユーザー ID で決まる）"""
+    rng = random.Random(f"{options['seed']}:{user_id}")
+    days = options['days']
+    offsets = sorted((rng.random() * days for _ in range(count)), reverse=True)
+    for index, offset in enumerate(offsets):
+        title, description = rng.choice(SAMPLE_TASKS)
+        created_at = now - timedelta(days=offset)
+        is_completed = rng.random() < options['completed_ratio']
+        due_date = None
+        if not is_completed and rng.random() < options['overdue_ratio']:
+            # 期限切れ: 作成後、現在より前の期限
+            due_date = created_at + (now - created_at) * rng.random()
+        elif rng.random() < options['due_date_ratio']:
+            # 期限までの日数は対数正規分布（中央値 7 日、長い裾）。未完了なら未来の期限
+            base = created_at if is_completed else now
+            due_date = base + timedelta(days=min(rng.lognormvariate(1.95, 1.0), 365))
+        yield Task(
+            user_id=user_id,
+            title=f'{title} ({index + 1})',
+            description=description if rng.random() < 0.7 else '',
+            priority=rng.choices(PRIORITIES, PRIORITY_WEIGHTS)[0],
+            is_completed=is_completed,
+            due_date=due_date,
+            created_at=created_at,
+            updated_at=min(now, created_at + timedelta(hours=rng.expovariate(1 / 48))),
+        )
+
+
+def batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@contextmanager
+def explicit_timestamps():
+    """bulk_create で created_at / updated_at を上書きしないようにする"""
+    fields = [Task._meta.get_field('created_at'), Task._meta.get_field('updated_at')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def generate_rows(users, options, now):
+    """チャンクのユーザーのタスクを順に生成し、ユーザーごとに最後に統計を生成する"""
+    for user_id, count, version in users:
+        counters = Counter({field: 0 for field in COUNTER_FIELDS})
+        for task in generate_tasks(user_id, count, options, now):
+            counters.update(counter_values(task.is_completed, task.priority))
+            yield task
+        yield TaskStatistics(user_id=user_id, version=version, **counters)
+
+
+def prepare_task_insert(tasks, using):
+    """タスクの INSERT 文（SQL とパラメーター）を bulk_create と同じ方法で組み立てる
+
+    値の変換と SQL の組み立ては書き込みロックの外で行う（処理時間の大半を占めるため）。
+    主キーは RETURNING で受け取る。使えないデータベースでは None を返す。
+    """
+    connection = connections[using]
+    if not connection.features.can_return_rows_from_bulk_insert:
+        return None
+    fields = [field for field in Task._meta.concrete_fields if not field.primary_key]
+    size = connection.ops.bulk_batch_size(fields, tasks) or len(tasks)
+    statements = []
+    for start in range(0, len(tasks), size):
+        batch = tasks[start:start + size]
+        query = sql.InsertQuery(Task)
+        query.insert_values(fields, batch)
+        compiler = query.get_compiler(using=using)
+        compiler.returning_fields = [Task._meta.pk]
+        [(statement, params)] = compiler.as_sql()
+        statements.append((batch, statement, params))
+    return statements
+
+
+def execute_task_insert(statements, using):
+    """prepare_task_insert の INSERT を実行し、タスクに主キーを設定"""
+    with connections[using].cursor() as cursor:
+        for batch, statement, params in statements:
+            cursor.execute(statement, params)
+            for task, (pk,) in zip(batch, cursor.fetchall()):
+                task.pk = pk
+                task._state.adding = False
+                task._state.db = using
+
+
+def insert_changes(tasks, using):
+    """作成したタスクの変更履歴を INSERT（整数と 1 つの日時だけのため直接組み立てる）"""
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    changed_at = TaskChange._meta.get_field('changed_at').get_db_prep_save(
+        timezone.now(), connection
+    )
+    fields = [TaskChange._meta.get_field(name) for name in ('user', 'task_id', 'changed_at')]
+    size = connection.ops.bulk_batch_size(fields, tasks) or len(tasks)
+    with connection.cursor() as cursor:
+        for start in range(0, len(tasks), size):
+            batch = tasks[start:start + size]
+            cursor.execute(
+                f'INSERT INTO {qn(TaskChange._meta.db_table)} '
+                f'({", ".join(qn(field.column) for field in fields)}) VALUES '
+                + ', '.join(['(%s, %s, %s)'] * len(batch)),
+                [value for task in batch for value in (task.user_id, task.pk, changed_at)]
+            )
+
+
+# ワーカープロセスでの SQLite データベースごとの書き込みロック
+_write_locks = {}
+
+
+def init_worker(write_locks):
+    _write_locks.update(write_locks)
+
+
+def create_chunk(chunk):
+    """ワーカー: 同じデータベースのユーザー群のタスク・変更履歴・統計を作成"""
+    using, users, options, now = chunk
+    # SQLite は書き込みが 1 つずつのため、ワーカー間でロックを取って順に書き込む
+    # （生成と INSERT 文の組み立ては並列、トランザクション同士のロック競合による失敗を避ける）
+    lock = _write_locks.get(using) or nullcontext()
+    created = 0
+    with explicit_timestamps():
+        for batch in batches(generate_rows(users, options, now), options['batch_size']):
+            tasks = [row for row in batch if isinstance(row, Task)]
+            statistics = [row for row in batch if isinstance(row, TaskStatistics)]
+            statements = prepare_task_insert(tasks, using) if tasks else []
+            with lock, transaction.atomic(using=using):
+                # FTS インデックスはテーブルのトリガーで更新される
+                if statements is None:
+                    Task.objects.using(using).bulk_create(tasks)
+                else:
+                    execute_task_insert(statements, using)
+                insert_changes(tasks, using)
+                TaskStatistics.objects.using(using).bulk_create(statistics)
+            created += len(tasks)
+    return created
 
 
 class Command(BaseCommand):
-    help = 'Create sample data for testing'
+    help = 'Create sample data for testing (bulk inserts, reproducible with --seed)'
     
     def add_arguments(self, parser):
         parser.add_argument(
@@ -20,83 +219,188 @@ class Command(BaseCommand):
             '--tasks-per-user',
             type=int,
             default=5,
-            help='Number of tasks per user'
+            help='Number of tasks per user (the average when --skew is set)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed; the same seed generates the same tasks (relative to now)'
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=0,
+            help='Pareto shape for tasks per user (0 for the same count; 1.16 is roughly 80/20)'
+        )
+        parser.add_argument(
+            '--completed-ratio',
+            type=float,
+            default=0.4,
+            help='Fraction of completed tasks'
+        )
+        parser.add_argument(
+            '--overdue-ratio',
+            type=float,
+            default=0.15,
+            help='Fraction of pending tasks whose due date has passed'
+        )
+        parser.add_argument(
+            '--due-date-ratio',
+            type=float,
+            default=0.6,
+            help='Fraction of the remaining tasks that have a due date'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Spread creation dates over this many past days'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per bulk insert and transaction'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes generating tasks (SQLite serializes the writes)'
         )
     
     def handle(self, *args, **options):
         users_count = options['users']
         tasks_per_user = options['tasks_per_user']
-        
-        self.stdout.write('Creating sample data...')
-        
-        # サンプルユーザー作成
-        users = []
-        for i in range(users_count):
-            username = f'user{i+1}'
-            email = f'user{i+1}@example.com'
-            password = 'testpass123'
-            
-            user, created = User.objects.get_or_create(
-                username=username,
-                defaults={
-                    'email': email,
-                    'first_name': f'テスト{i+1}',
-                    'last_name': 'ユーザー',
-                }
+        if min(users_count, tasks_per_user) < 0 or min(options['batch_size'], options['workers']) < 1:
+            raise CommandError('--users, --tasks-per-user, --batch-size and --workers must be positive')
+        if options['seed'] is None:
+            options['seed'] = random.randrange(2 ** 32)
+
+        self.stdout.write(f"Creating sample data (seed {options['seed']})...")
+        user_ids = self.create_users(users_count)
+        versions = self.clear_tasks(user_ids)
+
+        rng = random.Random(options['seed'])
+        counts = task_counts(user_ids, users_count * tasks_per_user, options['skew'], rng)
+        now = timezone.now()
+        generation = {
+            key: options[key] for key in (
+                'seed', 'completed_ratio', 'overdue_ratio', 'due_date_ratio', 'days', 'batch_size'
             )
-            if created:
-                user.set_password(password)
-                user.save()
-                self.stdout.write(f'Created user: {username}')
-            else:
-                self.stdout.write(f'User already exists: {username}')
-            
-            users.append(user)
-        
-        # サンプルタスク作成
-        sample_tasks = [
-            ('プロジェクトの計画書作成', 'プロジェクトの詳細な計画書を作成する'),
-            ('データベース設計', 'アプリケーションのデータベース設計を行う'),
-            ('UI/UXデザイン', 'ユーザーインターフェースの設計'),
-            ('テストケース作成', '単体テストと結合テストのケース作成'),
-            ('ドキュメント作成', 'API仕様書とユーザーマニュアルの作成'),
-            ('セキュリティ監査', 'アプリケーションのセキュリティチェック'),
-            ('パフォーマンステスト', 'アプリケーションの性能測定'),
-            ('デプロイメント準備', '本番環境へのデプロイ準備'),
-            ('コードレビュー', 'チームメンバーのコードレビュー'),
-            ('定期メンテナンス', 'システムの定期メンテナンス作業'),
-        ]
-        
-        priorities = ['low', 'medium', 'high']
-        
-        for user in users:
-            # 既存のタスクを削除（デモ用）
-            Task.objects.filter(user=user).delete()
-            
-            for i in range(tasks_per_user):
-                task_data = random.choice(sample_tasks)
-                title = task_data[0]
-                description = task_data[1]
-                
-                # ランダムな期限日を設定
-                due_date = None
-                if random.choice([True, False]):  # 50%の確率で期限を設定
-                    days_ahead = random.randint(1, 30)
-                    due_date = datetime.now() + timedelta(days=days_ahead)
-                
-                task = Task.objects.create(
-                    user=user,
-                    title=f'{title} ({i+1})',
-                    description=description,
-                    priority=random.choice(priorities),
-                    due_date=due_date,
-                    is_completed=random.choice([True, False]) if i > 0 else False
-                )
-                
-                self.stdout.write(f'Created task: {task.title} for {user.username}')
-        
+        }
+        chunks = self.chunks(counts, versions, generation, now)
+
+        total = sum(counts.values())
+        created = 0
+        if options['workers'] > 1 and len(chunks) > 1:
+            # ワーカーは設定済みの Django を fork で引き継ぐ（接続は引き継がない）
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            write_locks = {
+                using: context.Lock() for using in {chunk[0] for chunk in chunks}
+                if connections[using].vendor == 'sqlite'
+            }
+            with context.Pool(options['workers'], init_worker, (write_locks,)) as pool:
+                for count in pool.imap_unordered(create_chunk, chunks):
+                    created += count
+                    self.stdout.write(f'Created {created}/{total} tasks')
+        else:
+            for chunk in chunks:
+                created += create_chunk(chunk)
+                self.stdout.write(f'Created {created}/{total} tasks')
+
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully created {users_count} users with {tasks_per_user} tasks each'
+                f'Successfully created {users_count} users with {total} tasks'
             )
-        )
\ No newline at end of file
+        )
+    
+    def create_users(self, count):
+        """user1..userN を作成（既存のユーザーはそのまま）し、ID を返す"""
+        usernames = [f'user{i + 1}' for i in range(count)]
+        existing = {}
+        for start in range(0, count, ID_BATCH_SIZE):
+            existing.update(
+                User.objects.filter(username__in=usernames[start:start + ID_BATCH_SIZE])
+                .values_list('username', 'pk')
+            )
+        # パスワードのハッシュ計算は 1 回だけ行い全員で共有する
+        password = make_password(PASSWORD)
+        new_users = [
+            User(
+                username=username,
+                email=f'{username}@example.com',
+                first_name=f'テスト{i + 1}',
+                last_name='ユーザー',
+                password=password,
+            )
+            for i, username in enumerate(usernames) if username not in existing
+        ]
+        with transaction.atomic():
+            User.objects.bulk_create(new_users, batch_size=1000)
+        self.stdout.write(f'Created {len(new_users)} users ({len(existing)} already existed)')
+
+        for start in range(0, count, ID_BATCH_SIZE):
+            existing.update(
+                User.objects.filter(username__in=usernames[start:start + ID_BATCH_SIZE])
+                .values_list('username', 'pk')
+            )
+        return [existing[username] for username in usernames]
+    
+    def clear_tasks(self, user_ids):
+        """既存のタスクを削除し、統計のバージョンを返す
+
+        削除したタスクは変更履歴に記録し、差分同期中のクライアントにも伝わるようにする。
+        """
+        versions = {}
+        by_shard = {}
+        for user_id in user_ids:
+            by_shard.setdefault(shard_for(user_id), []).append(user_id)
+        for using, shard_user_ids in by_shard.items():
+            connection = connections[using]
+            qn = connection.ops.quote_name
+            task_table = qn(Task._meta.db_table)
+            now = Task._meta.get_field('updated_at').get_db_prep_save(timezone.now(), connection)
+            for start in range(0, len(shard_user_ids), ID_BATCH_SIZE):
+                batch = shard_user_ids[start:start + ID_BATCH_SIZE]
+                versions.update(
+                    TaskStatistics.objects.using(using).filter(user_id__in=batch)
+                    .values_list('user_id', 'version')
+                )
+                placeholders = ', '.join(['%s'] * len(batch))
+                with transaction.atomic(using=using), connection.cursor() as cursor:
+                    cursor.execute(
+                        f'INSERT INTO {qn(TaskChange._meta.db_table)} '
+                        f'({qn("user_id")}, {qn("task_id")}, {qn("changed_at")}) '
+                        f'SELECT {qn("user_id")}, {qn("id")}, %s FROM {task_table} '
+                        f'WHERE {qn("user_id")} IN ({placeholders})',
+                        [now, *batch]
+                    )
+                    # シグナルを通さずに削除（統計は作り直す）
+                    cursor.execute(
+                        f'DELETE FROM {task_table} WHERE {qn("user_id")} IN ({placeholders})', batch
+                    )
+                    cursor.execute(
+                        f'DELETE FROM {qn(TaskStatistics._meta.db_table)} '
+                        f'WHERE {qn("user_id")} IN ({placeholders})', batch
+                    )
+        # 統計 API の ETag が以前と同じにならないようにバージョンを進める
+        return {user_id: versions.get(user_id, 0) + 1 for user_id in user_ids}
+    
+    def chunks(self, counts, versions, options, now):
+        """データベースごとに、タスク数が CHUNK_TASKS 程度になるようユーザーをまとめる"""
+        chunks = []
+        pending = {}
+        sizes = Counter()
+        for user_id, count in counts.items():
+            using = shard_for(user_id)
+            users = pending.setdefault(using, [])
+            users.append((user_id, count, versions[user_id]))
+            sizes[using] += count
+            if sizes[using] >= CHUNK_TASKS:
+                chunks.append((using, users, options, now))
+                pending[using] = []
+                sizes[using] = 0
+        chunks.extend((using, users, options, now) for using, users in pending.items() if users)
+        return chunks
@@ -0,0 +1,83 @@
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from tasks import imports
+
+
+class Command(BaseCommand):
+    help = 'Import tasks for a user from an NDJSON or CSV file (e.g. the output of the export API)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'username',
+            help='Owner of the imported tasks'
+        )
+        parser.add_argument(
+            'path',
+            help="NDJSON or CSV file ('-' for standard input)"
+        )
+        parser.add_argument(
+            '--format',
+            choices=imports.FORMATS,
+            help='File format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=imports.BATCH_SIZE,
+            help='Rows per bulk insert and transaction'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only validate the file'
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist")
+        path = options['path']
+        fmt = options['format'] or imports.detect_format(filename=path)
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; use --format')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        
+        # エラーは保持せずに 1 件ずつ出力する
+        importer = imports.TaskImporter(
+            user,
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            max_errors=0,
+            on_error=self.write_error,
+        )
+        started = time.perf_counter()
+        if path == '-':
+            result = importer.run(imports.read_records(sys.stdin.buffer, fmt))
+        else:
+            try:
+                file = open(path, 'rb')
+            except OSError as exc:
+                raise CommandError(f'Cannot open {path!r}: {exc.strerror}')
+            with file:
+                result = importer.run(imports.read_records(file, fmt))
+        elapsed = time.perf_counter() - started
+        
+        action = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{action} {result['created']} tasks for {user.username} "
+                f"({result['failed']} invalid lines) in {elapsed:.1f}s"
+            )
+        )
+    
+    def write_error(self, error):
+        messages = '; '.join(
+            f"{field}: {' '.join(str(message) for message in field_messages)}"
+            for field, field_messages in error['errors'].items()
+        )
+        self.stderr.write(f"line {error['line']}: {messages}")
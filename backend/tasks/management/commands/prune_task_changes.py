@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Exists, OuterRef
+from tasks.models import TaskChange
+from tasks.sharding import get_shards
+
+
+class Command(BaseCommand):
+    help = 'Delete task change-log entries superseded by a newer entry for the same task'
+    
+    def handle(self, *args, **options):
+        # 同じタスクのより新しい変更がある行は、どの同期トークンから見ても不要
+        newer = TaskChange.objects.filter(task_id=OuterRef('task_id'), id__gt=OuterRef('id'))
+        deleted = 0
+        for using in get_shards() or [DEFAULT_DB_ALIAS]:
+            count, _ = TaskChange.objects.using(using).filter(Exists(newer)).delete()
+            deleted += count
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Pruned {deleted} superseded change entries')
+        )
@@ -0,0 +1,110 @@
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from tasks.models import Task, TaskChange, TaskStatistics
+from tasks.sharding import get_shards, shard_for
+
+
+class Command(BaseCommand):
+    help = 'Move each user\'s tasks, statistics and change log to the shard TASK_SHARDS assigns'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report which users would move'
+        )
+    
+    def handle(self, *args, **options):
+        shards = get_shards()
+        if not shards:
+            self.stdout.write('TASK_SHARDS is not configured; nothing to rebalance')
+            return
+        
+        moved = skipped = 0
+        # シャーディング導入前のデータは default にある
+        for source in dict.fromkeys([DEFAULT_DB_ALIAS, *shards]):
+            for user_id in self.user_ids(source):
+                target = shard_for(user_id, shards)
+                if target == source:
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(f'user {user_id}: {source} -> {target}')
+                    moved += 1
+                elif self.move_user(user_id, source, target):
+                    moved += 1
+                else:
+                    skipped += 1
+        
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(
+            self.style.SUCCESS(f'{verb} {moved} users' + (f', skipped {skipped}' if skipped else ''))
+        )
+    
+    def user_ids(self, using):
+        user_ids = set()
+        for model in (TaskStatistics, Task, TaskChange):
+            user_ids.update(
+                model.objects.using(using).order_by().values_list('user_id', flat=True).distinct()
+            )
+        return sorted(user_ids)
+    
+    def move_user(self, user_id, source, target):
+        """ID を保ったまま移動する（同期トークン・タスク ID がクライアント側で変わらない）"""
+        tasks = list(Task.objects.using(source).filter(user_id=user_id))
+        entries = list(TaskChange.objects.using(source).filter(user_id=user_id).order_by('id'))
+        statistics = TaskStatistics.objects.using(source).filter(user_id=user_id).first()
+        
+        if (
+            Task.objects.using(target).filter(pk__in=[task.pk for task in tasks]).exists()
+            or TaskChange.objects.using(target).filter(pk__in=[entry.pk for entry in entries]).exists()
+        ):
+            self.stderr.write(f'user {user_id}: ID collision on {target}, skipped')
+            return False
+        
+        with transaction.atomic(using=target), transaction.atomic(using=source):
+            # シグナルと auto_now を通さずに行をそのまま複製する
+            # （ORM の保存では変更履歴の二重記録や日時の上書きが起きる）
+            self.copy_rows(target, Task, tasks)
+            self.copy_rows(target, TaskChange, entries)
+            if statistics is not None:
+                # 統計 API の ETag を無効化
+                statistics.version += 1
+                self.copy_rows(target, TaskStatistics, [statistics])
+            self.reset_sequences(target)
+            
+            with connections[source].cursor() as cursor:
+                qn = connections[source].ops.quote_name
+                for model in (TaskStatistics, TaskChange, Task):
+                    cursor.execute(
+                        f'DELETE FROM {qn(model._meta.db_table)} WHERE {qn("user_id")} = %s',
+                        [user_id]
+                    )
+        
+        self.stdout.write(f'user {user_id}: {source} -> {target} ({len(tasks)} tasks)')
+        return True
+    
+    def copy_rows(self, using, model, instances, batch_size=1000):
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        fields = model._meta.concrete_fields
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            qn(model._meta.db_table),
+            ', '.join(qn(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+        rows = [
+            [field.get_db_prep_save(getattr(instance, field.attname), connection) for field in fields]
+            for instance in instances
+        ]
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(sql, rows[start:start + batch_size])
+    
+    def reset_sequences(self, using):
+        """ID 付きで挿入した後、以降の採番が移動した行より後ろになるようにする（SQLite は不要）"""
+        connection = connections[using]
+        statements = connection.ops.sequence_reset_sql(no_style(), [Task, TaskChange])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
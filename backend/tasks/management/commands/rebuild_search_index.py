@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from tasks.search import clear_search_backend_cache, get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for tasks'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database alias to rebuild'
+        )
+    
+    def handle(self, *args, **options):
+        using = options['database']
+        clear_search_backend_cache()
+        backend = get_search_backend(using)
+        if backend is None:
+            raise CommandError(
+                f'Full-text search index is not available on database "{using}"'
+            )
+        
+        backend.rebuild(connections[using])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt search index on database "{using}"')
+        )
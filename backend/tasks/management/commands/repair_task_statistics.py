@@ -0,0 +1,73 @@
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from tasks.models import Task, TaskStatistics
+from tasks.sharding import shard_for
+from tasks.statistics import COUNTER_FIELDS, counter_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recount per-user task statistics and fix counters that have drifted'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Only repair the given username (can be repeated)'
+        )
+    
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        user_ids = list(users.values_list('pk', flat=True))
+        
+        # シャーディング時はユーザーのシャードごとに集計する
+        by_shard = defaultdict(list)
+        for user_id in user_ids:
+            by_shard[shard_for(user_id)].append(user_id)
+        
+        created = repaired = 0
+        for using, shard_user_ids in by_shard.items():
+            to_create, to_update = self.repair(using, shard_user_ids)
+            created += len(to_create)
+            repaired += len(to_update)
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Checked {len(user_ids)} users: '
+                f'created {created}, repaired {repaired}'
+            )
+        )
+    
+    def repair(self, using, user_ids):
+        # 1 回の GROUP BY で正しい値を集計
+        actual = {
+            row.pop('user'): row
+            for row in Task.objects.using(using).filter(user_id__in=user_ids)
+            .order_by().values('user').annotate(**counter_aggregates())
+        }
+        stored = TaskStatistics.objects.using(using).in_bulk(user_ids)
+        empty = {field: 0 for field in COUNTER_FIELDS}
+        
+        to_create = []
+        to_update = []
+        for user_id in user_ids:
+            values = actual.get(user_id, empty)
+            statistics = stored.get(user_id)
+            if statistics is None:
+                to_create.append(TaskStatistics(user_id=user_id, **values))
+            elif any(getattr(statistics, field) != values[field] for field in COUNTER_FIELDS):
+                for field in COUNTER_FIELDS:
+                    setattr(statistics, field, values[field])
+                # 統計 API の ETag を無効化
+                statistics.version += 1
+                to_update.append(statistics)
+        
+        TaskStatistics.objects.using(using).bulk_create(to_create, batch_size=1000)
+        TaskStatistics.objects.using(using).bulk_update(
+            to_update, [*COUNTER_FIELDS, 'version'], batch_size=1000
+        )
+        return to_create, to_update
@@ -0,0 +1,26 @@
+import json
+
+from django.core.management.base import BaseCommand
+from tasks.sharding import aggregate_statistics
+
+
+class Command(BaseCommand):
+    help = 'Show task statistics aggregated across all shards'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the result as JSON')
+    
+    def handle(self, *args, **options):
+        result = aggregate_statistics()
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        
+        header = f'{"shard":<12}{"users":>8}{"total":>10}{"completed":>11}{"low":>8}{"medium":>8}{"high":>8}'
+        self.stdout.write(header)
+        rows = [*result['shards'].items(), ('(all)', result['total'])]
+        for alias, values in rows:
+            self.stdout.write(
+                f'{alias:<12}{values["users"]:>8}{values["total"]:>10}{values["completed"]:>11}'
+                f'{values["low"]:>8}{values["medium"]:>8}{values["high"]:>8}'
+            )
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:43
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def populate_statistics(apps, schema_editor):
+    """既存タスクからカウンターを初期化"""
+    Task = apps.get_model('tasks', 'Task')
+    TaskStatistics = apps.get_model('tasks', 'TaskStatistics')
+    db_alias = schema_editor.connection.alias
+    rows = Task.objects.using(db_alias).order_by().values('user').annotate(
+        total=Count('pk'),
+        completed=Count('pk', filter=Q(is_completed=True)),
+        low=Count('pk', filter=Q(priority='low')),
+        medium=Count('pk', filter=Q(priority='medium')),
+        high=Count('pk', filter=Q(priority='high')),
+    )
+    TaskStatistics.objects.using(db_alias).bulk_create(
+        [TaskStatistics(user_id=row.pop('user'), **row) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0003_task_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStatistics',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_statistics', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+                ('total', models.IntegerField(default=0, verbose_name='総数')),
+                ('completed', models.IntegerField(default=0, verbose_name='完了数')),
+                ('low', models.IntegerField(default=0, verbose_name='優先度（低）')),
+                ('medium', models.IntegerField(default=0, verbose_name='優先度（中）')),
+                ('high', models.IntegerField(default=0, verbose_name='優先度（高）')),
+            ],
+            options={
+                'verbose_name': 'タスク統計',
+                'verbose_name_plural': 'タスク統計',
+            },
+        ),
+        migrations.RunPython(populate_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskstatistics',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='更新日時'),
+        ),
+        migrations.AddField(
+            model_name='taskstatistics',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='バージョン'),
+        ),
+    ]
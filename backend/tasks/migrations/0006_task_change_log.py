@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def seed_changes(apps, schema_editor):
+    """既存タスクを初回同期で返せるよう変更履歴に登録"""
+    Task = apps.get_model('tasks', 'Task')
+    TaskChange = apps.get_model('tasks', 'TaskChange')
+    db_alias = schema_editor.connection.alias
+    tasks = Task.objects.using(db_alias).order_by('updated_at', 'pk').values_list('pk', 'user_id')
+    batch = []
+    for task_id, user_id in tasks.iterator(chunk_size=2000):
+        batch.append(TaskChange(user_id=user_id, task_id=task_id))
+        if len(batch) >= 2000:
+            TaskChange.objects.using(db_alias).bulk_create(batch)
+            batch = []
+    TaskChange.objects.using(db_alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0005_task_statistics_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField(verbose_name='タスクID')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, verbose_name='変更日時')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='task_changes', to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+            ],
+            options={
+                'verbose_name': 'タスク変更履歴',
+                'verbose_name_plural': 'タスク変更履歴',
+                'indexes': [models.Index(fields=['user', 'id'], name='task_change_user_seq_idx'), models.Index(fields=['task_id', 'id'], name='task_change_task_seq_idx')],
+            },
+        ),
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
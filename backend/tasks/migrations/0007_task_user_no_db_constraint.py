@@ -0,0 +1,86 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:14
+
+from importlib import import_module
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+search_index = import_module('tasks.migrations.0003_task_search_index')
+
+# tasks.sharding.SHARD_ID_SPACING と同じ値
+SHARD_ID_SPACING = 10 ** 12
+
+
+def restore_search_triggers(apps, schema_editor):
+    """SQLite ではテーブルの作り直しで FTS 同期用のトリガーが消えるため作り直す"""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_task_fts'"
+        )
+        if cursor.fetchone() is None:
+            return
+        for sql in search_index.SQLITE_BACKWARD[:3]:
+            cursor.execute(sql)
+        for sql in search_index.SQLITE_FORWARD[1:]:
+            cursor.execute(sql)
+
+
+def offset_shard_ids(apps, schema_editor):
+    """シャードごとに ID の開始位置をずらし、シャード間でユーザーを移動しても衝突しにくくする"""
+    connection = schema_editor.connection
+    shards = list(getattr(settings, 'TASK_SHARDS', []))
+    if connection.alias not in shards:
+        return
+    start = shards.index(connection.alias) * SHARD_ID_SPACING
+    if not start:
+        return
+    with connection.cursor() as cursor:
+        for table in ('tasks_task', 'tasks_taskchange'):
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    'UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s',
+                    [start, table, start]
+                )
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                    'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                    [table, start, table]
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    f'SELECT setval(pg_get_serial_sequence(%s, %s), %s, false) '
+                    f'WHERE NOT EXISTS (SELECT 1 FROM {table})',
+                    [table, 'id', start + 1]
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0006_task_change_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to=settings.AUTH_USER_MODEL, verbose_name='ユーザー'),
+        ),
+        migrations.AlterField(
+            model_name='taskchange',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='task_changes', to=settings.AUTH_USER_MODEL, verbose_name='ユーザー'),
+        ),
+        migrations.AlterField(
+            model_name='taskstatistics',
+            name='user',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_statistics', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='ユーザー'),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(offset_shard_ids, migrations.RunPython.noop),
+    ]
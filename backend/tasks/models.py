@@ -13,10 +13,12 @@ class Task(models.Model):
         ('high', '高'),
     ]
     
+    # シャーディング時はユーザー（default）と別のデータベースに置くため制約を張らない
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='tasks',
+        db_constraint=False,
         verbose_name='ユーザー'
     )
     
@@ -64,14 +66,108 @@ class Task(models.Model):
         ordering = ['-created_at']
         verbose_name = 'タスク'
         verbose_name_plural = 'タスク'
+        # TaskListCreateView の filterset_fields / ordering_fields と
+        # task_statistics の集計に合わせた複合インデックス
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='task_user_created_idx'),
+            models.Index(fields=['user', 'updated_at'], name='task_user_updated_idx'),
+            models.Index(fields=['user', 'due_date'], name='task_user_due_idx'),
+            models.Index(fields=['user', 'priority', '-created_at'], name='task_user_priority_idx'),
+            # 期限切れ集計用（未完了タスクのみの部分インデックス）
+            models.Index(
+                fields=['user', 'due_date'],
+                condition=models.Q(is_completed=False),
+                name='task_user_pending_due_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """統計カウンターの差分計算用に読み込み時の値を保持"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in ('is_completed', 'priority')
+        }
+        return instance
+    
     @property
     def is_overdue(self):
         """期限切れかどうかを判定"""
         if self.due_date and not self.is_completed:
             from django.utils import timezone
             return timezone.now() > self.due_date
-        return False
\ No newline at end of file
+        return False
+
+
+class TaskStatistics(models.Model):
+    """ユーザーごとのタスク集計カウンター
+
+    Task の作成・更新・削除に合わせて差分で更新される（tasks.statistics）。
+    version / modified_at はユーザーのタスク集合の変更検出に使う。
+    ずれが生じた場合は repair_task_statistics コマンドで再集計する。
+    """
+    
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='task_statistics',
+        db_constraint=False,
+        verbose_name='ユーザー'
+    )
+    
+    total = models.IntegerField(default=0, verbose_name='総数')
+    completed = models.IntegerField(default=0, verbose_name='完了数')
+    low = models.IntegerField(default=0, verbose_name='優先度（低）')
+    medium = models.IntegerField(default=0, verbose_name='優先度（中）')
+    high = models.IntegerField(default=0, verbose_name='優先度（高）')
+    
+    # タスクが書き込まれるたびに増えるバージョン（条件付き GET の検証子に使う）
+    version = models.PositiveBigIntegerField(default=0, verbose_name='バージョン')
+    modified_at = models.DateTimeField(auto_now=True, verbose_name='更新日時')
+    
+    class Meta:
+        verbose_name = 'タスク統計'
+        verbose_name_plural = 'タスク統計'
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.completed}/{self.total}"
+
+
+class TaskChange(models.Model):
+    """タスクの変更履歴（差分同期用）
+
+    タスクの作成・更新・削除のたびに 1 行追加され、id が同期トークンになる。
+    削除後もトゥームストーンとして参照できるよう task_id は外部キーにしない。
+    """
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='task_changes',
+        db_index=False,
+        db_constraint=False,
+        verbose_name='ユーザー'
+    )
+    
+    task_id = models.BigIntegerField(verbose_name='タスクID')
+    
+    changed_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='変更日時'
+    )
+    
+    class Meta:
+        verbose_name = 'タスク変更履歴'
+        verbose_name_plural = 'タスク変更履歴'
+        indexes = [
+            models.Index(fields=['user', 'id'], name='task_change_user_seq_idx'),
+            models.Index(fields=['task_id', 'id'], name='task_change_task_seq_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.task_id} ({self.pk})"
@@ -0,0 +1,160 @@
+# backend/tasks/pagination.py
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class TaskKeysetPagination(BasePagination):
+    """キーセット（カーソル）ページネーション
+
+    OrderingFilter で決まった並び順の先頭フィールドに id を
+    タイブレーカーとして加え、(値, id) を起点に次ページを取得する。
+    OFFSET と COUNT(*) を使わないため、深いページでも 1 ページ目と同じコストになる。
+    NULL は最小値として扱う（昇順で先頭、降順で末尾）。
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = '不正なカーソルです。'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_results(list(self.page_queryset(queryset, request, view)))
+
+    def page_queryset(self, queryset, request, view=None):
+        """ページ取得用のクエリセット（page_size + 1 件）を返す
+
+        非同期ビューでは結果を async for で取得して paginate_results に渡す。
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(queryset, view)
+        self.field_name = self.ordering.lstrip('-')
+        self.field = queryset.model._meta.get_field(self.field_name)
+        self.ascending = not self.ordering.startswith('-')
+        self.nullable = self.field.null
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor['r']
+        ascending = self.ascending != self.reverse
+
+        queryset = queryset.order_by(*self.order_by(ascending))
+        if self.cursor is not None:
+            queryset = queryset.filter(self.after(self.cursor['v'], self.cursor['id'], ascending))
+
+        # 1 件余分に取得して次（逆方向なら前）のページの有無を判定
+        return queryset[:self.page_size + 1]
+
+    def paginate_results(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_ordering(self, queryset, view):
+        """クエリセットに適用済みの並び順から先頭フィールドを取り出す"""
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        allowed = getattr(view, 'ordering_fields', None) or []
+        for field in ordering:
+            if isinstance(field, str) and field.lstrip('-') in allowed:
+                return field
+        return (getattr(view, 'ordering', None) or ['-created_at'])[0]
+
+    def order_by(self, ascending):
+        field = F(self.field_name)
+        pk = F('pk')
+        if ascending:
+            if self.nullable:
+                return [field.asc(nulls_first=True), pk.asc()]
+            return [field.asc(), pk.asc()]
+        if self.nullable:
+            return [field.desc(nulls_last=True), pk.desc()]
+        return [field.desc(), pk.desc()]
+
+    def after(self, value, pk, ascending):
+        """(value, pk) より後ろにある行の条件"""
+        name = self.field_name
+        if ascending:
+            if value is None:
+                return Q(**{f'{name}__isnull': True, 'pk__gt': pk}) | Q(**{f'{name}__isnull': False})
+            return Q(**{f'{name}__gt': value}) | Q(**{name: value, 'pk__gt': pk})
+        if value is None:
+            return Q(**{f'{name}__isnull': True, 'pk__lt': pk})
+        condition = Q(**{f'{name}__lt': value}) | Q(**{name: value, 'pk__lt': pk})
+        if self.nullable:
+            condition |= Q(**{f'{name}__isnull': True})
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            if cursor['o'] != self.ordering:
+                raise ValueError('ordering mismatch')
+            value = cursor['v']
+            return {
+                'v': None if value is None else self.field.to_python(value),
+                'id': int(cursor['id']),
+                'r': bool(cursor['r']),
+            }
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        value = getattr(instance, self.field_name)
+        if value is not None:
+            value = self.field.value_to_string(instance)
+        payload = json.dumps(
+            {'o': self.ordering, 'v': value, 'id': instance.pk, 'r': int(reverse)},
+            separators=(',', ':'),
+        )
+        encoded = urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
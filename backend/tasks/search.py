@@ -0,0 +1,177 @@
+# backend/tasks/search.py
+"""タスクの全文検索
+
+SQLite では FTS5 の外部コンテンツテーブル（tasks_task_fts）、
+PostgreSQL では tsvector の生成列（search_vector）を使う。
+どちらもマイグレーション 0003 で作成され、Task の書き込みに合わせて
+データベース側（トリガー / 生成列）で同期される。
+
+SQLite の trigram インデックスは 3 文字未満の語（「会議」などの 1〜2 文字の日本語）を
+検索できない。そのような語は icontains（LIKE '%語%'）で絞り込む。3 文字以上の語と
+一緒に指定された場合はインデックスで絞り込んだ行だけを調べるが、短い語だけの検索は
+そのユーザーのタスクをすべて走査する（user_id のインデックスで対象はそのユーザーに限られる）。
+"""
+import operator
+from functools import reduce
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from task_manager import query_budgets
+
+from .models import Task
+
+FTS_TABLE = 'tasks_task_fts'
+SEARCH_VECTOR_COLUMN = 'search_vector'
+SEARCH_INDEX = 'tasks_task_search_idx'
+
+# 使用可能なバックエンドを (エイリアス, データベース名) ごとにキャッシュ
+_backends = {}
+
+
+class SQLiteFTSBackend:
+    """SQLite FTS5 による全文検索
+
+    trigram トークナイザーが使える場合は部分一致（分かち書きのない日本語にも対応）、
+    使えない場合は unicode61 トークナイザーで前方一致検索を行う。
+    """
+
+    # trigram トークナイザーは 3 文字未満の語を検索できない
+    trigram_min_length = 3
+
+    def __init__(self, trigram):
+        self.trigram = trigram
+
+    def supports(self, terms):
+        if self.trigram:
+            return all(len(term) >= self.trigram_min_length for term in terms)
+        return True
+
+    def build_query(self, terms):
+        """検索語を FTS5 の MATCH 式に変換（語同士は AND）"""
+        phrases = []
+        for term in terms:
+            phrase = '"%s"' % term.replace('"', '""')
+            phrases.append(phrase if self.trigram else phrase + '*')
+        return ' '.join(phrases)
+
+    def search(self, queryset, terms):
+        table = Task._meta.db_table
+        return queryset.extra(
+            select={'search_rank': f'{FTS_TABLE}.rank'},
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[self.build_query(terms)],
+        )
+
+    def rebuild(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+class PostgresSearchBackend:
+    """PostgreSQL の tsvector による全文検索（前方一致）"""
+
+    def supports(self, terms):
+        return True
+
+    def build_query(self, terms):
+        """検索語を to_tsquery の式に変換（語同士は AND）"""
+        lexemes = []
+        for term in terms:
+            escaped = term.replace('\\', '\\\\').replace("'", "''")
+            lexemes.append(f"'{escaped}':*")
+        return ' & '.join(lexemes)
+
+    def search(self, queryset, terms):
+        query = self.build_query(terms)
+        return queryset.extra(
+            # ts_rank は大きいほど関連度が高いので、符号を反転して昇順で並べる
+            select={'search_rank': f"-ts_rank({SEARCH_VECTOR_COLUMN}, to_tsquery('simple', %s))"},
+            select_params=[query],
+            where=[f"{SEARCH_VECTOR_COLUMN} @@ to_tsquery('simple', %s)"],
+            params=[query],
+        )
+
+    def rebuild(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f'REINDEX INDEX {SEARCH_INDEX}')
+
+
+def get_search_backend(using='default'):
+    """接続で使用できる全文検索バックエンドを返す（使えない場合は None）"""
+    connection = connections[using]
+    key = (using, str(connection.settings_dict['NAME']))
+    if key not in _backends:
+        # データベースごとに 1 回だけの判定は SQL の上限に含めない
+        with query_budgets.unbudgeted():
+            backend = None
+            if connection.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s",
+                        [FTS_TABLE]
+                    )
+                    row = cursor.fetchone()
+                if row is not None:
+                    backend = SQLiteFTSBackend(trigram='trigram' in row[0])
+            elif connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    columns = connection.introspection.get_table_description(
+                        cursor, Task._meta.db_table
+                    )
+                if any(column.name == SEARCH_VECTOR_COLUMN for column in columns):
+                    backend = PostgresSearchBackend()
+        _backends[key] = backend
+    return _backends[key]
+
+
+def is_search_backend_loaded(using='default'):
+    """get_search_backend がデータベースに問い合わせずに返せるか"""
+    connection = connections[using]
+    return (using, str(connection.settings_dict['NAME'])) in _backends
+
+
+def clear_search_backend_cache():
+    _backends.clear()
+
+
+class TaskSearchFilter(filters.SearchFilter):
+    """全文検索インデックスを使う SearchFilter
+
+    インデックスが使えない場合や、すべての検索語が短すぎる場合は
+    従来の icontains 検索にフォールバックする。一部の語だけが短い場合は、
+    残りの語でインデックス検索した結果を短い語の icontains で絞り込む。
+    ?ordering が指定されていなければ関連度順に並べるため、
+    OrderingFilter より後ろに置くこと。
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        backend = get_search_backend(queryset.db)
+        indexed = [term for term in terms if backend is not None and backend.supports([term])]
+        if not indexed:
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = backend.search(queryset, indexed)
+        short = [term for term in terms if term not in indexed]
+        if short:
+            queryset = queryset.filter(self.contains_all(view, request, short))
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('search_rank', *getattr(view, 'ordering', []))
+        return queryset
+
+    def contains_all(self, view, request, terms):
+        """すべての語がいずれかの search_fields に含まれる条件（SearchFilter と同じ）"""
+        lookups = [
+            self.construct_search(str(field)) for field in self.get_search_fields(view, request)
+        ]
+        return reduce(operator.and_, [
+            reduce(operator.or_, [Q(**{lookup: term}) for lookup in lookups]) for term in terms
+        ])
@@ -1,6 +1,7 @@
 # backend/tasks/serializers.py
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from task_manager.timing import TimedSerializerMixin
 from .models import Task
 
 
@@ -12,10 +13,32 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email']
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskOwnerSerializer(UserSerializer):
+    """タスク所有者シリアライザー
+
+    タスクは常にリクエストユーザーのものなので、所有者が一致する場合は
+    task.user を参照せず request.user を使う（行ごとのユーザー取得を避ける）。
+    """
+    
+    def get_attribute(self, instance):
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and instance.user_id == user.pk:
+            return user
+        return super().get_attribute(instance)
+    
+    def to_representation(self, instance):
+        # 同じユーザーの表現は 1 リクエスト内で 1 回だけ作る
+        cache = self.context.setdefault('_owner_representations', {})
+        if instance.pk not in cache:
+            cache[instance.pk] = super().to_representation(instance)
+        return cache[instance.pk]
+
+
+class TaskSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """タスクシリアライザー"""
     
-    user = UserSerializer(read_only=True)
+    user = TaskOwnerSerializer(read_only=True)
     is_overdue = serializers.ReadOnlyField()
     
     class Meta:
@@ -37,7 +60,7 @@ class TaskSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class TaskCreateSerializer(serializers.ModelSerializer):
+class TaskCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """タスク作成専用シリアライザー"""
     
     class Meta:
@@ -50,7 +73,14 @@ class TaskCreateSerializer(serializers.ModelSerializer):
         return value.strip()
 
 
-class TaskUpdateSerializer(serializers.ModelSerializer):
+class TaskImportSerializer(TaskCreateSerializer):
+    """タスクインポート用シリアライザー（作成と同じ検証に完了状態を加える）"""
+    
+    class Meta(TaskCreateSerializer.Meta):
+        fields = TaskCreateSerializer.Meta.fields + ['is_completed']
+
+
+class TaskUpdateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """タスク更新専用シリアライザー"""
     
     class Meta:
@@ -60,4 +90,31 @@ class TaskUpdateSerializer(serializers.ModelSerializer):
     def validate_title(self, value):
         if not value.strip():
             raise serializers.ValidationError("タイトルは必須です。")
-        return value.strip()
\ No newline at end of file
+        return value.strip()
+
+
+class TaskBatchOperationSerializer(serializers.Serializer):
+    """一括操作 1 件分のシリアライザー"""
+    
+    OPERATION_CHOICES = ['create', 'update', 'delete', 'toggle']
+    
+    op = serializers.ChoiceField(choices=OPERATION_CHOICES)
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False, default=dict)
+    
+    def validate(self, attrs):
+        if attrs['op'] != 'create' and 'id' not in attrs:
+            raise serializers.ValidationError({'id': 'この操作には id が必要です。'})
+        return attrs
+
+
+class TaskBatchSerializer(serializers.Serializer):
+    """タスク一括操作シリアライザー"""
+    
+    MAX_OPERATIONS = 1000
+    
+    operations = TaskBatchOperationSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=MAX_OPERATIONS
+    )
@@ -0,0 +1,93 @@
+# backend/tasks/sharding.py
+"""ユーザー単位のシャーディング
+
+settings.TASK_SHARDS にエイリアスを並べると、tasks アプリのテーブル
+（Task / TaskStatistics / TaskChange）をユーザー ID のハッシュで各シャードに振り分ける。
+ユーザーは次の順で決まる。
+
+1. クエリのヒント user_id（db_manager(hints={'user_id': ...})）
+2. 保存・削除するインスタンスの user_id
+3. リクエストのユーザー（トークン認証で task_manager.routers.set_user される）
+
+ユーザーが決まらないクエリは default に向かうため、管理コマンドなど
+リクエスト外で全ユーザーを扱う場合は get_shards() の各エイリアスに using() する。
+ユーザー削除時のカスケードが default を参照するため、tasks のテーブルは
+シャード以外（default）にも作成する（空のまま）。
+シャードを追加・削除した後は rebalance_task_shards でユーザーを移動する。
+"""
+import zlib
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Sum
+
+from task_manager import routers
+
+# シャードごとの ID の開始位置の間隔（マイグレーション 0007 で設定）
+SHARD_ID_SPACING = 10 ** 12
+
+
+def get_shards():
+    return list(getattr(settings, 'TASK_SHARDS', []))
+
+
+def shard_for(user_id, shards=None):
+    """ユーザーのタスクを置くエイリアス"""
+    shards = get_shards() if shards is None else shards
+    if not shards:
+        return DEFAULT_DB_ALIAS
+    return shards[zlib.crc32(str(user_id).encode()) % len(shards)]
+
+
+def aggregate_statistics():
+    """全シャードの TaskStatistics を合計（シャードごとの内訳付き）"""
+    from .models import TaskStatistics
+    from .statistics import COUNTER_FIELDS
+
+    aliases = get_shards() or [DEFAULT_DB_ALIAS]
+    shards = {}
+    for alias in aliases:
+        totals = TaskStatistics.objects.using(alias).aggregate(
+            **{field: Sum(field) for field in COUNTER_FIELDS}
+        )
+        totals = {field: value or 0 for field, value in totals.items()}
+        totals['users'] = TaskStatistics.objects.using(alias).count()
+        shards[alias] = totals
+    overall = {
+        field: sum(totals[field] for totals in shards.values())
+        for field in ['users', *COUNTER_FIELDS]
+    }
+    return {'shards': shards, 'total': overall}
+
+
+class TaskShardRouter:
+    """tasks アプリのモデルをユーザーのシャードへ振り分けるルーター"""
+
+    app_label = 'tasks'
+
+    def route(self, model, hints):
+        if model._meta.app_label != self.app_label:
+            return None
+        shards = get_shards()
+        if not shards:
+            return None
+        user_id = hints.get('user_id')
+        if user_id is None:
+            user_id = getattr(hints.get('instance'), 'user_id', None)
+        if user_id is None:
+            user_id = routers.get_state().user_id
+        if user_id is None:
+            return None
+        return shard_for(user_id, shards)
+
+    def db_for_read(self, model, **hints):
+        return self.route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self.route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # ユーザー（default）とシャード上のタスクの関連を許可
+        if self.app_label in (obj1._meta.app_label, obj2._meta.app_label) and get_shards():
+            return True
+        return None
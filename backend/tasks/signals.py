@@ -0,0 +1,51 @@
+# backend/tasks/signals.py
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import changes, sharding, statistics
+from .models import Task, TaskChange, TaskStatistics
+
+
+def snapshot(task):
+    return {'is_completed': task.is_completed, 'priority': task.priority}
+
+
+@receiver(post_save, sender=Task)
+def update_statistics_on_save(sender, instance, created, raw=False, **kwargs):
+    """タスク保存時に統計カウンターを更新"""
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_values', None)
+    if created:
+        statistics.task_created(instance)
+    elif previous is not None and len(previous) == 2:
+        statistics.task_changed(instance, previous)
+    else:
+        # 変更前の値が分からない場合は再集計
+        statistics.rebuild_statistics(instance.user_id)
+    instance._loaded_values = snapshot(instance)
+    changes.record(instance.user_id, [instance.pk])
+
+
+@receiver(post_delete, sender=Task)
+def update_statistics_on_delete(sender, instance, origin=None, **kwargs):
+    """タスク削除時に統計カウンターを更新"""
+    # ユーザー削除に伴うカスケードでは統計・履歴も一緒に消える
+    if isinstance(origin, User) or getattr(origin, 'model', None) is User:
+        return
+    statistics.task_deleted(instance)
+    changes.record(instance.user_id, [instance.pk])
+
+
+@receiver(pre_delete, sender=User)
+def delete_sharded_tasks(sender, instance, using, **kwargs):
+    """シャーディング時はユーザーと別のデータベースにあるタスク・統計・履歴を削除"""
+    shard = sharding.shard_for(instance.pk)
+    if not sharding.get_shards() or shard == using:
+        return
+    with transaction.atomic(using=shard):
+        TaskStatistics.objects.using(shard).filter(user_id=instance.pk).delete()
+        Task.objects.using(shard).filter(user_id=instance.pk).delete()
+        TaskChange.objects.using(shard).filter(user_id=instance.pk).delete()
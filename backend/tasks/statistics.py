@@ -0,0 +1,155 @@
+# backend/tasks/statistics.py
+"""ユーザーごとのタスク統計カウンター
+
+TaskStatistics の各カウンターは Task の書き込みに合わせて F() 式で差分更新する。
+カウンター行が無い場合は更新をスキップし、次回の読み込み時に再集計する。
+"""
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from task_manager import query_budgets
+
+from .models import Task, TaskStatistics
+
+PRIORITIES = [priority for priority, _ in Task.PRIORITY_CHOICES]
+COUNTER_FIELDS = ['total', 'completed', *PRIORITIES]
+
+_local = threading.local()
+
+
+def counter_aggregates():
+    """Task のクエリセットからカウンター値を集計する式"""
+    aggregates = {
+        'total': Count('pk'),
+        'completed': Count('pk', filter=Q(is_completed=True)),
+    }
+    for priority in PRIORITIES:
+        aggregates[priority] = Count('pk', filter=Q(priority=priority))
+    return aggregates
+
+
+def counter_values(is_completed, priority, sign=1):
+    """1 件のタスクが各カウンターに与える寄与"""
+    values = {'total': sign, 'completed': sign if is_completed else 0}
+    for choice in PRIORITIES:
+        values[choice] = sign if choice == priority else 0
+    return values
+
+
+def apply_delta(user_id, delta):
+    """カウンターに差分を加算し、バージョンを進める（1 回の UPDATE）"""
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending[user_id].update(delta)
+        return
+    changes = {field: F(field) + value for field, value in delta.items() if value}
+    TaskStatistics.objects.db_manager(hints={'user_id': user_id}).filter(user_id=user_id).update(
+        version=F('version') + 1,
+        modified_at=timezone.now(),
+        **changes
+    )
+
+
+@contextmanager
+def batched():
+    """ブロック内のカウンター更新をまとめ、終了時にユーザーごと 1 回の UPDATE で反映"""
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+    _local.pending = defaultdict(Counter)
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    for user_id, delta in pending.items():
+        apply_delta(user_id, delta)
+
+
+def task_created(task):
+    apply_delta(task.user_id, counter_values(task.is_completed, task.priority))
+
+
+def task_deleted(task):
+    apply_delta(task.user_id, counter_values(task.is_completed, task.priority, sign=-1))
+
+
+def task_changed(task, previous):
+    """previous（is_completed / priority の変更前の値）との差分を反映"""
+    before = counter_values(previous['is_completed'], previous['priority'], sign=-1)
+    after = counter_values(task.is_completed, task.priority)
+    apply_delta(task.user_id, {field: before[field] + after[field] for field in COUNTER_FIELDS})
+
+
+def rebuild_statistics(user_id):
+    """Task テーブルから再集計してカウンターを作り直す"""
+    # レプリカの遅延を避けるため書き込み先のデータベースで集計する
+    using = router.db_for_write(TaskStatistics, user_id=user_id)
+    values = Task.objects.using(using).filter(user_id=user_id).aggregate(**counter_aggregates())
+    try:
+        with transaction.atomic(using=using):
+            statistics, _ = TaskStatistics.objects.using(using).update_or_create(
+                user_id=user_id, defaults=values
+            )
+    except IntegrityError:
+        # 同時に作成された場合は値を上書きする
+        TaskStatistics.objects.using(using).filter(user_id=user_id).update(**values)
+        statistics = TaskStatistics.objects.using(using).get(user_id=user_id)
+    return statistics
+
+
+def statistics_queryset(now=None):
+    """期限切れ件数（未完了タスクの部分インデックスを使う集計）を付与したクエリセット"""
+    overdue = Task.objects.filter(
+        user=OuterRef('user'),
+        is_completed=False,
+        due_date__lt=now or timezone.now(),
+    ).order_by().values('user').annotate(count=Count('pk')).values('count')
+    return TaskStatistics.objects.annotate(overdue=Coalesce(Subquery(overdue), 0))
+
+
+def user_statistics(user_id):
+    """ユーザーのカウンター行のクエリセット（ユーザーのシャード / レプリカから読む）"""
+    using = router.db_for_read(TaskStatistics, user_id=user_id)
+    return statistics_queryset().using(using).filter(user_id=user_id)
+
+
+def load_statistics(user):
+    """期限切れ件数付きのカウンター行を 1 クエリで取得（無ければ再集計して作成）"""
+    statistics = user_statistics(user.pk).first()
+    if statistics is None:
+        # 初回だけの再集計は SQL の上限に含めない
+        with query_budgets.unbudgeted():
+            rebuild_statistics(user.pk)
+            statistics = user_statistics(user.pk).get()
+    return statistics
+
+
+async def aload_statistics(user):
+    """load_statistics の非同期版"""
+    statistics = await user_statistics(user.pk).afirst()
+    if statistics is None:
+        with query_budgets.unbudgeted():
+            await sync_to_async(rebuild_statistics)(user.pk)
+            statistics = await user_statistics(user.pk).aget()
+    return statistics
+
+
+def statistics_data(statistics):
+    """統計 API のレスポンス"""
+    return {
+        'total_tasks': statistics.total,
+        'completed_tasks': statistics.completed,
+        'pending_tasks': statistics.total - statistics.completed,
+        'overdue_tasks': statistics.overdue,
+        'priority_stats': {
+            priority: getattr(statistics, priority) for priority in PRIORITIES
+        },
+    }
@@ -1,11 +1,53 @@
 # backend/tasks/tests.py
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from collections import Counter
+from unittest import mock
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (
+    AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from django.db import connection, connections
+from django.db.utils import load_backend
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from rest_framework.authtoken.models import Token
-from .models import Task
+from authentication.token_cache import token_cache
+from task_manager import metrics, routers
+from task_manager.log import BoundedQueueHandler, JSONFormatter, request_id_var
+from task_manager.middleware import replica_routing_middleware, request_logging_middleware
+from task_manager.query_budgets import (
+    Query, QueryBudget, QueryBudgetExceeded, enforce_query_budgets
+)
+from task_manager.routers import ReplicaRouter
+from . import events, export, imports, sharding
+from .checks import check_change_log_backend
+from .models import Task, TaskChange, TaskStatistics
+from .search import get_search_backend
+from .sharding import TaskShardRouter
+from .views import TaskListCreateView
 
 
 class TaskModelTest(TestCase):
@@ -49,6 +91,7 @@ class TaskModelTest(TestCase):
         self.assertEqual(tasks[1], task1)
 
 
+@enforce_query_budgets()
 class TaskAPITest(APITestCase):
     """TaskAPI の結合テスト"""
     
@@ -121,6 +164,35 @@ class TaskAPITest(APITestCase):
         task.refresh_from_db()
         self.assertTrue(task.is_completed)
     
+    def test_toggle_single_update(self):
+        """切り替えは UPDATE 1 回（と統計カウンターの更新）のみ"""
+        task = Task.objects.create(user=self.user, title='切り替えタスク')
+        url = reverse('task-toggle', kwargs={'pk': task.id})
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_completed'])
+        self.assertEqual(response.data['title'], '切り替えタスク')
+        task_queries = [q['sql'] for q in context.captured_queries if '"tasks_task"' in q['sql']]
+        self.assertEqual(len(task_queries), 1)
+        self.assertTrue(task_queries[0].startswith('UPDATE'))
+        
+        response = self.client.post(url)
+        self.assertFalse(response.data['is_completed'])
+    
+    def test_toggle_other_users_task(self):
+        """他のユーザーのタスクは切り替えられない"""
+        other_user = User.objects.create_user(username='otheruser', password='testpass123')
+        task = Task.objects.create(user=other_user, title='他のユーザーのタスク')
+        
+        response = self.client.post(reverse('task-toggle', kwargs={'pk': task.id}))
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        task.refresh_from_db()
+        self.assertFalse(task.is_completed)
+    
     def test_unauthorized_access(self):
         """認証なしアクセステスト"""
         self.client.credentials()  # 認証情報をクリア
@@ -143,4 +215,1539 @@ class TaskAPITest(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
-        self.assertEqual(response.data['results'][0]['title'], '自分のタスク')
\ No newline at end of file
+        self.assertEqual(response.data['results'][0]['title'], '自分のタスク')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite の実行計画を検証するテスト')
+class TaskQueryPlanTest(TestCase):
+    """一覧・統計クエリが複合インデックスを使うことの検証"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.user_tasks = Task.objects.filter(user=self.user)
+    
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index_name}', plan)
+        self.assertNotIn('USE TEMP B-TREE', plan)
+    
+    def test_default_ordering(self):
+        """既定の並び順（-created_at）"""
+        self.assertUsesIndex(self.user_tasks, 'task_user_created_idx')
+        self.assertUsesIndex(
+            self.user_tasks.filter(is_completed=True),
+            'task_user_created_idx'
+        )
+    
+    def test_ordering_fields(self):
+        """ordering_fields による並び替え"""
+        self.assertUsesIndex(self.user_tasks.order_by('updated_at'), 'task_user_updated_idx')
+        self.assertUsesIndex(self.user_tasks.order_by('-due_date'), 'task_user_due_idx')
+        self.assertUsesIndex(self.user_tasks.order_by('priority'), 'task_user_priority_idx')
+    
+    def test_priority_filter(self):
+        """優先度での絞り込み"""
+        self.assertUsesIndex(
+            self.user_tasks.filter(priority='high'),
+            'task_user_priority_idx'
+        )
+    
+    def test_overdue_count(self):
+        """期限切れタスクの集計"""
+        overdue = self.user_tasks.filter(
+            due_date__lt=timezone.now(),
+            is_completed=False
+        ).order_by()
+        self.assertUsesIndex(overdue, 'task_user_pending_due_idx')
+
+
+@enforce_query_budgets()
+class TaskKeysetPaginationTest(APITestCase):
+    """キーセットページネーションのテスト"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        
+        now = timezone.now()
+        priorities = ['low', 'medium', 'high']
+        for i in range(45):
+            Task.objects.create(
+                user=self.user,
+                title=f'タスク{i}',
+                priority=priorities[i % 3],
+                # 同じ期限・期限なしを混在させてタイブレーカーを検証
+                due_date=None if i % 4 == 0 else now + timedelta(days=i % 5),
+            )
+    
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(task['id'] for task in response.data['results'])
+            url = response.data['next']
+        return ids
+    
+    def test_walks_every_ordering_field(self):
+        """全ての ordering_fields で重複・欠落なく全件を辿れる"""
+        url = reverse('task-list-create')
+        for ordering in ['created_at', '-created_at', 'updated_at', '-updated_at',
+                         'due_date', '-due_date', 'priority', '-priority']:
+            ids = self.collect(f'{url}?pagination=cursor&ordering={ordering}')
+            self.assertEqual(len(ids), 45, ordering)
+            self.assertEqual(len(set(ids)), 45, ordering)
+    
+    def test_previous_link(self):
+        """previous カーソルで直前のページに戻れる"""
+        url = reverse('task-list-create') + '?pagination=cursor&ordering=due_date'
+        first = self.client.get(url).data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        
+        self.assertIsNone(first['previous'])
+        self.assertEqual(
+            [task['id'] for task in back['results']],
+            [task['id'] for task in first['results']]
+        )
+    
+    def test_no_count_query(self):
+        """COUNT クエリも OFFSET も発行しない"""
+        url = reverse('task-list-create') + '?pagination=cursor'
+        next_url = self.client.get(url).data['next']
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(next_url)
+        sql = ' '.join(query['sql'] for query in context.captured_queries)
+        self.assertNotIn('__count', sql)
+        self.assertNotIn('OFFSET', sql)
+    
+    def test_invalid_cursor(self):
+        """不正なカーソルは 404"""
+        url = reverse('task-list-create') + '?cursor=invalid'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite FTS5 の全文検索テスト')
+@enforce_query_budgets()
+class TaskFullTextSearchTest(APITestCase):
+    """全文検索のテスト"""
+    
+    def setUp(self):
+        if get_search_backend() is None:
+            self.skipTest('FTS5 が使えない SQLite')
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('task-list-create')
+    
+    def search(self, term):
+        response = self.client.get(self.url, {'search': term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [task['title'] for task in response.data['results']]
+    
+    def test_search_english_and_japanese(self):
+        """英語の前方一致と日本語の部分一致"""
+        Task.objects.create(user=self.user, title='Deployment checklist')
+        Task.objects.create(user=self.user, title='データベース設計', description='テーブル定義を作成する')
+        Task.objects.create(user=self.user, title='買い物')
+        
+        self.assertEqual(self.search('deploy'), ['Deployment checklist'])
+        self.assertEqual(self.search('ベース'), ['データベース設計'])
+        self.assertEqual(self.search('テーブル定義'), ['データベース設計'])
+    
+    def test_ranked_results(self):
+        """関連度の高い順に並ぶ"""
+        Task.objects.create(user=self.user, title='コードレビュー')
+        Task.objects.create(
+            user=self.user,
+            title='週次作業',
+            description='資料作成、会議準備、日程調整、経費精算、最後にレビュー'
+        )
+        
+        # 作成日時順なら「週次作業」が先になる
+        self.assertEqual(self.search('レビュー'), ['コードレビュー', '週次作業'])
+    
+    def test_index_follows_task_writes(self):
+        """更新・削除がインデックスに反映される"""
+        task = Task.objects.create(user=self.user, title='古いタイトル')
+        task.title = '新しいタイトル'
+        task.save()
+        self.assertEqual(self.search('新しい'), ['新しいタイトル'])
+        self.assertEqual(self.search('古いタ'), [])
+        
+        task.delete()
+        self.assertEqual(self.search('新しい'), [])
+    
+    def test_user_isolation_and_short_terms(self):
+        """他ユーザーのタスクは対象外、短い語は従来検索にフォールバック"""
+        other_user = User.objects.create_user(username='otheruser', password='testpass123')
+        Task.objects.create(user=other_user, title='他人の会議メモ')
+        Task.objects.create(user=self.user, title='会議メモ')
+        
+        self.assertEqual(self.search('会議メモ'), ['会議メモ'])
+        self.assertEqual(self.search('会議'), ['会議メモ'])
+    
+    def test_short_terms(self):
+        """3 文字未満の語はインデックスを使えない（他の語があればインデックスで絞り込む）"""
+        Task.objects.create(user=self.user, title='週次の会議', description='資料を準備する')
+        Task.objects.create(user=self.user, title='週次の会議', description='議事録を書く')
+        Task.objects.create(user=self.user, title='買い物', description='資料を印刷する')
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.search('資料'), ['買い物', '週次の会議'])
+        self.assertNotIn('MATCH', queries.captured_queries[-1]['sql'])
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.search('週次の会議 資料'), ['週次の会議'])
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('MATCH', sql)
+        self.assertIn('LIKE', sql)
+    
+    def test_rebuild_command(self):
+        """rebuild_search_index コマンド"""
+        Task.objects.create(user=self.user, title='インデックス再構築')
+        call_command('rebuild_search_index', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.search('再構築'), ['インデックス再構築'])
+
+
+@enforce_query_budgets()
+class TaskStatisticsTest(APITestCase):
+    """統計カウンターのテスト"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('task-statistics')
+    
+    def test_counters_follow_api_writes(self):
+        """作成・更新・切り替え・削除がカウンターに反映される"""
+        create_url = reverse('task-list-create')
+        self.client.post(create_url, {'title': 'A', 'priority': 'high'})
+        self.client.post(create_url, {'title': 'B', 'priority': 'low'})
+        task = Task.objects.get(title='B')
+        Task.objects.create(
+            user=self.user,
+            title='期限切れ',
+            due_date=timezone.now() - timedelta(days=1)
+        )
+        
+        self.client.patch(reverse('task-detail', kwargs={'pk': task.id}), {'priority': 'medium'})
+        self.client.post(reverse('task-toggle', kwargs={'pk': task.id}))
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, {
+            'total_tasks': 3,
+            'completed_tasks': 1,
+            'pending_tasks': 2,
+            'overdue_tasks': 1,
+            'priority_stats': {'low': 0, 'medium': 2, 'high': 1},
+        })
+        
+        self.client.delete(reverse('task-detail', kwargs={'pk': task.id}))
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['total_tasks'], 2)
+        self.assertEqual(response.data['completed_tasks'], 0)
+        self.assertEqual(response.data['priority_stats']['medium'], 1)
+    
+    def test_single_query(self):
+        """統計 API は 1 クエリ（認証はトークンキャッシュから）"""
+        Task.objects.create(user=self.user, title='タスク')
+        self.client.get(self.url)  # カウンター行が無ければここで作成
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['total_tasks'], 1)
+    
+    def test_repair_command(self):
+        """repair_task_statistics でずれを修正"""
+        Task.objects.create(user=self.user, title='タスク', priority='high')
+        self.client.get(self.url)
+        TaskStatistics.objects.filter(user=self.user).update(total=10, high=0)
+        
+        call_command('repair_task_statistics', stdout=open(os.devnull, 'w'))
+        
+        statistics = TaskStatistics.objects.get(user=self.user)
+        self.assertEqual(statistics.total, 1)
+        self.assertEqual(statistics.high, 1)
+    
+    def test_delete_user_with_tasks(self):
+        """ユーザー削除時のカスケードでカウンターが再作成されない"""
+        Task.objects.create(user=self.user, title='タスク')
+        self.client.get(self.url)
+        self.user.delete()
+        self.assertFalse(TaskStatistics.objects.exists())
+
+
+class CreateSampleDataTest(TestCase):
+    """create_sample_data コマンドのテスト"""
+    
+    def create(self, **options):
+        options = {'users': 5, 'tasks_per_user': 20, 'seed': 42, **options}
+        call_command('create_sample_data', stdout=open(os.devnull, 'w'), **options)
+    
+    def snapshot(self):
+        return sorted(Task.objects.values_list(
+            'user__username', 'title', 'priority', 'is_completed', 'description'
+        ))
+    
+    def test_bulk_create(self):
+        """タスク・統計・変更履歴がまとめて作成され、統計はタスクと一致する"""
+        self.create(batch_size=7)
+        
+        self.assertEqual(User.objects.filter(username__startswith='user').count(), 5)
+        self.assertEqual(Task.objects.count(), 100)
+        self.assertEqual(
+            set(TaskChange.objects.values_list('task_id', flat=True)),
+            set(Task.objects.values_list('pk', flat=True))
+        )
+        self.assertEqual(TaskStatistics.objects.count(), 5)
+        for statistics in TaskStatistics.objects.all():
+            tasks = Task.objects.filter(user_id=statistics.user_id)
+            self.assertEqual(statistics.total, tasks.count())
+            self.assertEqual(statistics.completed, tasks.filter(is_completed=True).count())
+            self.assertEqual(statistics.high, tasks.filter(priority='high').count())
+        self.assertTrue(Task.objects.filter(
+            is_completed=False, due_date__lt=timezone.now()
+        ).exists())
+    
+    def test_same_seed_same_data(self):
+        """同じ --seed なら同じデータ、再実行時は古いタスクを削除履歴に残す"""
+        self.create()
+        first = self.snapshot()
+        old_ids = set(Task.objects.values_list('pk', flat=True))
+        
+        self.create()
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(
+            set(TaskChange.objects.filter(task_id__in=old_ids).values_list('task_id', flat=True)),
+            old_ids
+        )
+        self.assertEqual(
+            set(TaskStatistics.objects.values_list('version', flat=True)), {2}
+        )
+        
+        self.create(seed=7)
+        self.assertNotEqual(self.snapshot(), first)
+    
+    def test_skew(self):
+        """既定ではユーザーごとに同じ件数、--skew を指定すると偏らせる（合計は同じ）"""
+        self.create()
+        counts = Counter(Task.objects.values_list('user_id', flat=True))
+        self.assertEqual(set(counts.values()), {20})
+        
+        self.create(skew=1.16)
+        counts = Counter(Task.objects.values_list('user_id', flat=True))
+        self.assertEqual(sum(counts.values()), 100)
+        self.assertGreater(len(set(counts.values())), 1)
+
+
+@enforce_query_budgets()
+class TaskListQueryCountTest(APITestCase):
+    """一覧 API のクエリ数がページサイズに依存しないことのテスト"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('task-list-create')
+    
+    def create_tasks(self, count):
+        Task.objects.bulk_create([
+            Task(user=self.user, title=f'タスク{i}') for i in range(count)
+        ])
+    
+    def test_constant_queries_page_number(self):
+        """統計バージョン・件数・一覧の 3 クエリ（認証はトークンキャッシュから）"""
+        self.create_tasks(1)
+        self.client.get(self.url)  # 統計カウンター行を作成
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+        
+        self.create_tasks(30)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(response.data['results'][0]['user'], {
+            'id': self.user.id,
+            'username': 'testuser',
+            'email': 'test@example.com',
+        })
+    
+    def test_constant_queries_cursor(self):
+        """キーセットページネーションでは統計バージョン・一覧の 2 クエリ"""
+        self.create_tasks(30)
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {'pagination': 'cursor'})
+    
+    def test_detail(self):
+        """詳細取得でもユーザーを再取得しない"""
+        self.create_tasks(1)
+        task = Task.objects.get()
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('task-detail', kwargs={'pk': task.id}))
+
+
+@enforce_query_budgets()
+class TaskBatchAPITest(APITestCase):
+    """一括操作APIのテスト"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('task-batch')
+    
+    def test_mixed_operations(self):
+        """作成・更新・削除・切り替えをまとめて適用"""
+        update_task = Task.objects.create(user=self.user, title='更新前')
+        delete_task = Task.objects.create(user=self.user, title='削除')
+        toggle_task = Task.objects.create(user=self.user, title='切り替え')
+        self.client.get(reverse('task-statistics'))
+        
+        response = self.client.post(self.url, {'operations': [
+            {'op': 'create', 'data': {'title': ' 新規 ', 'priority': 'high'}},
+            {'op': 'update', 'id': update_task.id, 'data': {'title': '更新後', 'priority': 'low'}},
+            {'op': 'delete', 'id': delete_task.id},
+            {'op': 'toggle', 'id': toggle_task.id},
+        ]}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            [201, 200, 204, 200]
+        )
+        self.assertEqual(response.data['results'][0]['data']['title'], '新規')
+        self.assertTrue(response.data['results'][3]['data']['is_completed'])
+        
+        update_task.refresh_from_db()
+        toggle_task.refresh_from_db()
+        self.assertEqual(update_task.title, '更新後')
+        self.assertTrue(toggle_task.is_completed)
+        self.assertFalse(Task.objects.filter(pk=delete_task.id).exists())
+        
+        statistics = self.client.get(reverse('task-statistics')).data
+        self.assertEqual(statistics['total_tasks'], 3)
+        self.assertEqual(statistics['completed_tasks'], 1)
+        self.assertEqual(statistics['priority_stats'], {'low': 1, 'medium': 1, 'high': 1})
+    
+    def test_invalid_operation_rolls_back(self):
+        """1 件でも不正なら何も適用しない"""
+        other_task = Task.objects.create(
+            user=User.objects.create_user(username='otheruser', password='testpass123'),
+            title='他のユーザーのタスク'
+        )
+        response = self.client.post(self.url, {'operations': [
+            {'op': 'create', 'data': {'title': 'タスク'}},
+            {'op': 'create', 'data': {'title': '   '}},
+            {'op': 'toggle', 'id': other_task.id},
+        ]}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [(error['index'], error['status']) for error in response.data['errors']],
+            [(1, 400), (2, 404)]
+        )
+        self.assertFalse(Task.objects.filter(user=self.user).exists())
+    
+    def test_bulk_toggle_query_count(self):
+        """件数に関わらず一定のクエリ数"""
+        tasks = Task.objects.bulk_create([
+            Task(user=self.user, title=f'タスク{i}') for i in range(50)
+        ])
+        operations = [{'op': 'toggle', 'id': task.id} for task in tasks]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        updates = [q for q in context.captured_queries if q['sql'].startswith('UPDATE "tasks_task"')]
+        self.assertEqual(len(updates), 1)
+        self.assertLess(len(context.captured_queries), 10)
+        self.assertEqual(Task.objects.filter(user=self.user, is_completed=True).count(), 50)
+
+
+@enforce_query_budgets()
+class TaskExportTest(APITestCase):
+    """エクスポートAPIのテスト"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('task-export')
+        self.overdue = Task.objects.create(
+            user=self.user, title='期限切れ', priority='high',
+            due_date=timezone.now() - timedelta(days=1)
+        )
+        self.done = Task.objects.create(
+            user=self.user, title='完了, "引用"', description='改行\nあり',
+            priority='high', is_completed=True
+        )
+        Task.objects.create(user=self.user, title='低', priority='low')
+        other = User.objects.create_user(username='otheruser', password='testpass123')
+        Task.objects.create(user=other, title='他のユーザーのタスク', priority='high')
+    
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+    
+    def test_ndjson_matches_api(self):
+        """NDJSON は一覧と同じ絞り込み・並び替えで、値は API と同じ表現"""
+        response = self.client.get(self.url, {'format': 'ndjson', 'priority': 'high',
+                                              'ordering': 'created_at'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertIn('tasks.ndjson', response['Content-Disposition'])
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        
+        detail = self.client.get(reverse('task-detail', kwargs={'pk': self.overdue.pk}))
+        expected = {key: value for key, value in detail.json().items() if key != 'user'}
+        self.assertEqual(rows[0], expected)
+        self.assertTrue(rows[0]['is_overdue'])
+        self.assertEqual([row['id'] for row in rows], [self.overdue.pk, self.done.pk])
+    
+    def test_csv(self):
+        """CSV は BOM と項目名の行付き、検索も一覧と同じ"""
+        response = self.client.get(self.url, {'search': '引用'}, HTTP_ACCEPT='text/csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        content = self.read(response)
+        self.assertTrue(content.startswith('\ufeffid,title,'))
+        rows = list(csv.DictReader(io.StringIO(content.lstrip('\ufeff'))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], '完了, "引用"')
+        self.assertEqual(rows[0]['description'], '改行\nあり')
+        self.assertEqual(rows[0]['is_completed'], 'true')
+        self.assertEqual(rows[0]['due_date'], '')
+    
+    def test_streams_in_chunks(self):
+        """全件を読み込まずに少しずつ書き出す"""
+        with mock.patch.object(export, 'ROWS_PER_WRITE', 1), \
+                mock.patch.object(export, 'CHUNK_SIZE', 2):
+            response = self.client.get(self.url)
+            chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 3)
+    
+    def test_errors(self):
+        """認証エラーや不正な絞り込みも指定した形式で返す"""
+        response = self.client.get(self.url, {'format': 'csv', 'priority': 'unknown'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.content.decode().startswith('priority\r\n'))
+        
+        self.client.credentials()
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('detail', json.loads(response.content))
+
+
+@enforce_query_budgets()
+class TaskImportTest(APITestCase):
+    """インポートAPI・コマンドのテスト"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('task-import')
+    
+    def test_ndjson_in_batches(self):
+        """有効な行をバッチで登録し、不正な行は行番号とエラーを返す"""
+        body = '\n'.join([
+            json.dumps({'title': ' タスク1 ', 'priority': 'high', 'is_completed': True}),
+            json.dumps({'title': '  '}),
+            '',
+            '{壊れた JSON',
+            json.dumps({'title': 'タスク2', 'priority': 'urgent'}),
+            json.dumps({'title': 'タスク3', 'due_date': '2030-01-01T00:00:00Z', 'id': 999}),
+            json.dumps({'title': 'タスク4'}),
+        ])
+        with mock.patch.object(imports, 'BATCH_SIZE', 2):
+            response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['failed'], 3)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 4, 5])
+        self.assertIn('title', response.data['errors'][0]['errors'])
+        self.assertIn('priority', response.data['errors'][2]['errors'])
+        
+        task = Task.objects.get(title='タスク1')
+        self.assertTrue(task.is_completed)
+        self.assertNotEqual(Task.objects.get(title='タスク3').pk, 999)
+        self.assertEqual(TaskChange.objects.filter(user=self.user).count(), 3)
+        statistics = self.client.get(reverse('task-statistics')).data
+        self.assertEqual(statistics['total_tasks'], 3)
+        self.assertEqual(statistics['completed_tasks'], 1)
+        self.assertEqual(statistics['priority_stats']['high'], 1)
+    
+    def test_csv_export_round_trip(self):
+        """エクスポートした CSV をファイルとしてアップロードできる"""
+        Task.objects.create(user=self.user, title='完了, "引用"', description='改行\nあり',
+                            priority='low', is_completed=True)
+        Task.objects.create(user=self.user, title='期限付き', due_date=timezone.now())
+        content = b''.join(self.client.get(reverse('task-export'), {'format': 'csv'})
+                           .streaming_content)
+        
+        other = User.objects.create_user(username='otheruser', password='testpass123')
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=other).key
+        )
+        upload = SimpleUploadedFile('tasks.csv', content, content_type='text/csv')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 0)
+        
+        fields = ('title', 'description', 'priority', 'is_completed', 'due_date')
+        self.assertEqual(
+            set(Task.objects.filter(user=other).values_list(*fields)),
+            set(Task.objects.filter(user=self.user).values_list(*fields))
+        )
+    
+    def test_dry_run_and_unsupported_type(self):
+        """dry_run は検証のみ、形式が分からなければ 415"""
+        response = self.client.post(
+            self.url + '?dry_run=true', 'title,priority\nA,low\nB,unknown\n',
+            content_type='text/csv'
+        )
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['line'], 3)
+        self.assertFalse(Task.objects.exists())
+        
+        response = self.client.post(self.url, {'title': 'A'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    
+    def test_command(self):
+        """import_tasks コマンドは不正な行を 1 件ずつ出力する"""
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as file:
+            file.write('{"title": "A"}\n{"title": ""}\n{"title": "B"}\n')
+        self.addCleanup(os.unlink, file.name)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_tasks', 'testuser', file.name, stdout=stdout, stderr=stderr)
+        
+        self.assertIn('Imported 2 tasks', stdout.getvalue())
+        self.assertTrue(stderr.getvalue().startswith('line 2: title: '))
+        self.assertEqual(
+            sorted(Task.objects.filter(user=self.user).values_list('title', flat=True)), ['A', 'B']
+        )
+
+
+@enforce_query_budgets()
+class TaskConditionalGetTest(APITestCase):
+    """条件付き GET（ETag / 304）のテスト"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.task = Task.objects.create(user=self.user, title='タスク')
+    
+    def assertRevalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertIn('Authorization', response['Vary'])
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        
+        # 期限切れ件数などは日時で判定できないため、If-Modified-Since では 304 にしない
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return etag
+    
+    def test_list_detail_statistics(self):
+        """変更が無ければ 304、書き込み後は 200"""
+        urls = [
+            reverse('task-list-create'),
+            reverse('task-detail', kwargs={'pk': self.task.id}),
+            reverse('task-statistics'),
+        ]
+        etags = [self.assertRevalidates(url) for url in urls]
+        
+        self.client.patch(
+            reverse('task-detail', kwargs={'pk': self.task.id}), {'title': '変更後'}
+        )
+        
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+    
+    def test_delete_changes_etag(self):
+        """削除でも ETag が変わる"""
+        url = reverse('task-list-create')
+        etag = self.assertRevalidates(url)
+        self.client.delete(reverse('task-detail', kwargs={'pk': self.task.id}))
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+    
+    def test_overdue_changes_etag(self):
+        """時間経過で期限切れになった場合も ETag が変わる"""
+        url = reverse('task-statistics')
+        self.task.due_date = timezone.now() + timedelta(hours=1)
+        self.task.save()
+        etag = self.assertRevalidates(url)
+        
+        # 書き込みを伴わずに期限切れになった状態を再現
+        Task.objects.filter(pk=self.task.pk).update(due_date=timezone.now() - timedelta(hours=1))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['overdue_tasks'], 1)
+
+
+@enforce_query_budgets()
+class TaskChangesAPITest(APITestCase):
+    """差分同期APIのテスト"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('task-changes')
+    
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+    
+    def test_changes_since_token(self):
+        """トークン以降の作成・更新・削除のみ返す"""
+        kept = Task.objects.create(user=self.user, title='残るタスク')
+        removed = Task.objects.create(user=self.user, title='削除するタスク')
+        initial = self.sync()
+        self.assertEqual(len(initial['changes']), 2)
+        
+        token = initial['next_token']
+        self.assertEqual(self.sync(token)['changes'], [])
+        
+        kept.title = '更新後'
+        kept.save()
+        self.client.post(reverse('task-toggle', kwargs={'pk': kept.id}))
+        self.client.delete(reverse('task-detail', kwargs={'pk': removed.id}))
+        created = self.client.post(reverse('task-list-create'), {'title': '新規'}).data
+        
+        delta = self.sync(token)
+        self.assertEqual(
+            [(task['title'], task['is_completed']) for task in delta['changes']],
+            [('更新後', True), ('新規', False)]
+        )
+        self.assertEqual(delta['deleted'], [removed.id])
+        self.assertFalse(delta['has_more'])
+        self.assertEqual(self.sync(delta['next_token'])['changes'], [])
+        self.assertTrue(Task.objects.filter(title=created['title']).exists())
+    
+    def test_bounded_pages(self):
+        """limit 件ずつ辿れる"""
+        Task.objects.bulk_create([Task(user=self.user, title=f'タスク{i}') for i in range(5)])
+        self.client.post(reverse('task-batch'), {'operations': [
+            {'op': 'create', 'data': {'title': f'一括{i}'}} for i in range(5)
+        ]}, format='json')
+        
+        seen = []
+        token = None
+        while True:
+            page = self.sync(token, limit=2)
+            self.assertLessEqual(len(page['changes']), 2)
+            seen.extend(task['title'] for task in page['changes'])
+            token = page['next_token']
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, [f'一括{i}' for i in range(5)])
+    
+    def test_user_isolation_and_prune(self):
+        """他ユーザーの変更は返さない、古い履歴は削除できる"""
+        other_user = User.objects.create_user(username='otheruser', password='testpass123')
+        Task.objects.create(user=other_user, title='他のユーザーのタスク')
+        task = Task.objects.create(user=self.user, title='タスク')
+        task.save()
+        task.save()
+        
+        call_command('prune_task_changes', stdout=open(os.devnull, 'w'))
+        
+        self.assertEqual(TaskChange.objects.filter(task_id=task.id).count(), 1)
+        self.assertEqual([t['title'] for t in self.sync()['changes']], ['タスク'])
+    
+    def test_invalid_token(self):
+        """不正なトークンは 400"""
+        response = self.client.get(self.url, {'since': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_backend_check(self):
+        """変更履歴を SQLite 以外に置く設定はシステムチェックで警告する"""
+        self.assertEqual(check_change_log_backend(None), [])
+        with mock.patch.object(type(connections['default']), 'vendor', 'postgresql'):
+            warnings = check_change_log_backend(None)
+        self.assertEqual([warning.id for warning in warnings], ['tasks.W001'])
+
+
+class TaskEventsTest(TestCase):
+    """タスク変更イベント配信のテスト（InMemoryBroker）"""
+    
+    def setUp(self):
+        events.reset_broker()
+    
+    async def test_broker_fanout(self):
+        """別スレッドからの publish が対象ユーザーの購読者だけに届く"""
+        broker = events.InMemoryBroker()
+        subscription = broker.subscribe(1)
+        other = broker.subscribe(2)
+        
+        event = {'type': 'tasks.changed', 'data': {'task_ids': [10]}}
+        await asyncio.to_thread(broker.publish, 1, event)
+        
+        self.assertEqual(await subscription.get(timeout=1), event)
+        self.assertIsNone(await other.get(timeout=0.01))
+        
+        subscription.close()
+        other.close()
+        self.assertEqual(dict(broker.subscriptions), {})
+    
+    async def test_backpressure(self):
+        """キューが溢れたら resync を通知する"""
+        broker = events.InMemoryBroker(queue_size=2)
+        subscription = broker.subscribe(1)
+        for task_id in range(5):
+            broker.publish(1, {'type': 'tasks.changed', 'data': {'task_ids': [task_id]}})
+        await asyncio.sleep(0)
+        
+        self.assertEqual((await subscription.get(timeout=1))['type'], 'resync')
+        self.assertIsNone(await subscription.get(timeout=0.01))
+    
+    async def test_event_stream(self):
+        """SSE でタスクの変更が届く"""
+        user = await sync_to_async(User.objects.create_user)(
+            username='testuser', password='testpass123'
+        )
+        token = await Token.objects.acreate(user=user)
+        
+        response = await self.async_client.get(
+            reverse('task-events'), headers={'Authorization': 'Token ' + token.key}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        
+        def create_task():
+            with self.captureOnCommitCallbacks(execute=True):
+                return Task.objects.create(user=user, title='タスク')
+        task = await sync_to_async(create_task)()
+        
+        chunk = await asyncio.wait_for(anext(stream), timeout=1)
+        self.assertEqual(
+            chunk.decode(),
+            f'event: tasks.changed\ndata: {{"task_ids": [{task.id}]}}\n\n'
+        )
+        await stream.aclose()
+    
+    async def test_event_stream_requires_token(self):
+        """トークンが無ければ 401、EventSource 用に ?token= は受け付ける"""
+        response = await self.async_client.get(reverse('task-events'))
+        self.assertEqual(response.status_code, 401)
+        
+        user = await sync_to_async(User.objects.create_user)(username='testuser')
+        token = await Token.objects.acreate(user=user)
+        response = await self.async_client.get(reverse('task-events'), {'token': token.key})
+        self.assertEqual(response.status_code, 200)
+        await response.streaming_content.aclose()
+    
+    def test_event_stream_requires_asgi(self):
+        """WSGI では本体を返し終わらないため 501"""
+        user = User.objects.create_user(username='testuser')
+        token = Token.objects.create(user=user)
+        response = self.client.get(reverse('task-events'), {'token': token.key})
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        self.assertFalse(response.streaming)
+
+
+@enforce_query_budgets()
+@override_settings(ROOT_URLCONF='task_manager.asgi_urls')
+class AsyncTaskAPITest(TestCase):
+    """非同期ビュー（ASGI 用）の結合テスト"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {'Authorization': 'Token ' + self.token.key}
+    
+    async def request(self, method, url, data=None):
+        return await getattr(self.async_client, method)(
+            url, data, content_type='application/json', headers=self.headers
+        ) if data is not None else await getattr(self.async_client, method)(
+            url, headers=self.headers
+        )
+    
+    async def test_create_and_list(self):
+        """作成・一覧取得（ページ番号・カーソル）"""
+        url = reverse('task-list-create')
+        response = await self.request('post', url, {'title': ' 非同期タスク ', 'priority': 'high'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['title'], '非同期タスク')
+        
+        await Task.objects.acreate(user=self.user, title='タスク2', priority='low')
+        other = await sync_to_async(User.objects.create_user)(username='otheruser')
+        await Task.objects.acreate(user=other, title='他のユーザーのタスク')
+        
+        body = (await self.request('get', url)).json()
+        self.assertEqual(body['count'], 2)
+        self.assertEqual([t['title'] for t in body['results']], ['タスク2', '非同期タスク'])
+        self.assertEqual(body['results'][0]['user']['username'], 'testuser')
+        
+        body = (await self.request('get', url + '?priority=high&pagination=cursor')).json()
+        self.assertEqual([t['title'] for t in body['results']], ['非同期タスク'])
+        self.assertNotIn('count', body)
+        
+        response = await self.request('get', url + '?page=5')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        # 非同期 ORM の SQL も Server-Timing に数える
+        response = await self.request('get', url)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('auth;dur=', response['Server-Timing'])
+    
+    async def test_detail_update_delete(self):
+        """詳細取得・更新・削除"""
+        task = await Task.objects.acreate(user=self.user, title='元のタスク')
+        url = reverse('task-detail', kwargs={'pk': task.id})
+        
+        self.assertEqual((await self.request('get', url)).json()['title'], '元のタスク')
+        
+        response = await self.request('put', url, {'title': '更新されたタスク', 'is_completed': True})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        await task.arefresh_from_db()
+        self.assertTrue(task.is_completed)
+        
+        response = await self.request('patch', url, {'title': ''})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        response = await self.request('delete', url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(await Task.objects.filter(pk=task.id).aexists())
+        self.assertEqual((await self.request('get', url)).status_code, status.HTTP_404_NOT_FOUND)
+    
+    async def test_toggle_and_statistics(self):
+        """切り替えと統計、条件付き GET"""
+        task = await Task.objects.acreate(user=self.user, title='切り替えタスク')
+        response = await self.request('post', reverse('task-toggle', kwargs={'pk': task.id}))
+        self.assertTrue(response.json()['is_completed'])
+        
+        response = await self.request('get', reverse('task-statistics'))
+        self.assertEqual(response.json()['completed_tasks'], 1)
+        
+        response = await self.async_client.get(
+            reverse('task-statistics'),
+            headers={**self.headers, 'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    async def test_export(self):
+        """ASGI では非同期イテレーターでエクスポートする"""
+        await Task.objects.acreate(user=self.user, title='タスク1')
+        await Task.objects.acreate(user=self.user, title='タスク2')
+        response = await self.request('get', reverse('task-export') + '?format=ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        titles = [json.loads(line)['title'] for line in content.decode().splitlines()]
+        self.assertEqual(titles, ['タスク2', 'タスク1'])
+    
+    async def test_unauthorized_access(self):
+        """認証なし・許可されないメソッド"""
+        response = await self.async_client.get(reverse('task-list-create'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        response = await self.request('post', reverse('task-statistics'))
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        
+        # ?token= は task_events 以外では受け付けない
+        response = await self.async_client.get(
+            reverse('task-list-create'), {'token': self.token.key}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    async def test_session_authentication(self):
+        """同期ビューと同じくセッションでも認証し、書き込みでは CSRF を検証する"""
+        client = AsyncClient(enforce_csrf_checks=True)
+        await sync_to_async(client.force_login)(self.user)
+        url = reverse('task-list-create')
+        
+        response = await client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        response = await client.post(url, {'title': 'タスク'}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIn('CSRF', response.json()['detail'])
+        
+        csrf_token = 'a' * 32
+        client.cookies[settings.CSRF_COOKIE_NAME] = csrf_token
+        response = await client.post(
+            url, {'title': 'タスク'}, content_type='application/json',
+            headers={'X-CSRFToken': csrf_token}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class SQLiteProductionProfileTest(SimpleTestCase):
+    """本番用 SQLite バックエンド（task_manager.backends.sqlite3）のテスト"""
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'production.sqlite3')
+    
+    def connect(self, **options):
+        settings_dict = {
+            **connection.settings_dict,
+            **settings.SQLITE_PRODUCTION_PROFILE,
+            'NAME': self.path,
+        }
+        settings_dict['OPTIONS'] = {**settings_dict['OPTIONS'], **options}
+        wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'production')
+        self.addCleanup(wrapper.close)
+        return wrapper
+    
+    def test_pragmas(self):
+        """接続時に WAL などの PRAGMA を設定する"""
+        with self.connect().cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+    
+    def test_immediate_transaction(self):
+        """atomic() は BEGIN IMMEDIATE で開始する"""
+        wrapper = self.connect()
+        with CaptureQueriesContext(wrapper) as queries:
+            # atomic() がトランザクション開始時に呼ぶメソッド
+            wrapper._start_transaction_under_autocommit()
+            wrapper.cursor().execute('ROLLBACK')
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+    
+    def test_retry_on_busy(self):
+        """ロックが解放されるまでトランザクション外の文を再試行する"""
+        writer = self.connect(timeout=0.01, BUSY_RETRY_DELAY=0.05)
+        with writer.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        
+        holder = sqlite3.connect(self.path, check_same_thread=False)
+        self.addCleanup(holder.close)
+        holder.execute('BEGIN IMMEDIATE')
+        timer = threading.Timer(0.05, holder.rollback)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        with writer.cursor() as cursor:
+            cursor.execute('INSERT INTO item DEFAULT VALUES')
+            cursor.execute('SELECT COUNT(*) FROM item')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class ServerTimingTest(APITestCase):
+    """Server-Timing ヘッダー（task_manager.timing）のテスト"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        Task.objects.create(user=self.user, title='タスク')
+    
+    def metrics(self, response):
+        metrics = {}
+        for value in response['Server-Timing'].split(', '):
+            name, *params = value.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+    
+    def test_header(self):
+        """全体・SQL・認証・シリアライズの時間と SQL の件数を返す"""
+        token_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('task-list-create'))
+        metrics = self.metrics(response)
+        self.assertEqual(set(metrics), {'total', 'db', 'auth', 'serialize'})
+        self.assertEqual(metrics['db']['desc'], f'"{len(queries)} queries"')
+        self.assertGreaterEqual(float(metrics['total']['dur']), float(metrics['db']['dur']))
+    
+    @override_settings(SERVER_TIMING={'EXPLAIN_THRESHOLD_MS': 0})
+    def test_explain_slowest_query(self):
+        """閾値を超えた最も遅い SELECT の実行計画を記録する"""
+        with self.assertLogs('task_manager.timing', 'WARNING') as logs:
+            self.client.get(reverse('task-list-create'))
+        record = logs.records[0]
+        self.assertTrue(record.sql.startswith('SELECT'))
+        self.assertTrue(record.plan)
+    
+    @override_settings(SERVER_TIMING={'ENABLED': False})
+    def test_disabled(self):
+        response = self.client.get(reverse('task-list-create'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class MetricsTest(APITestCase):
+    """/metrics（task_manager.metrics）のテスト"""
+    
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+    
+    @override_settings(METRICS={'ALLOWED_IPS': ['127.0.0.1']})
+    def test_request_metrics(self):
+        """URL 名ごとの件数・処理時間・SQL の件数とキャッシュのヒット数"""
+        token_cache.clear()
+        self.client.get(reverse('task-list-create'))
+        self.client.get(reverse('task-list-create'))
+        self.client.get(reverse('task-detail', args=[0]))
+        
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        lines = response.content.decode().splitlines()
+        self.assertIn(
+            'http_requests_total{view="task-list-create",method="GET",status="200"} 2', lines
+        )
+        self.assertIn('http_requests_total{view="task-detail",method="GET",status="404"} 1', lines)
+        self.assertIn(
+            'http_request_duration_seconds_count{view="task-list-create"} 2', lines
+        )
+        self.assertIn('http_request_db_queries_bucket{view="task-list-create",le="+Inf"} 2', lines)
+        self.assertIn('cache_requests_total{cache="token_local",result="hit"} 2', lines)
+        self.assertIn('cache_requests_total{cache="token_local",result="miss"} 1', lines)
+    
+    def test_access_control(self):
+        """トークンか許可された接続元からのみ取得できる"""
+        url = reverse('metrics')
+        with override_settings(METRICS={'TOKEN': 'secret', 'ALLOWED_IPS': ['10.0.0.0/8']}):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+            response = self.client.get(url, REMOTE_ADDR='10.1.2.3')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            
+            self.client.credentials(HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+            self.client.credentials(HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        
+        with override_settings(METRICS={}):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_multiprocess_aggregation(self):
+        """METRICS['DIRECTORY'] の全プロセス分を合算する"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        labels = [['view', 'task-list-create']]
+        other = {
+            'counters': [['http_request_errors_total', labels, 3]],
+            'histograms': [['http_request_duration_seconds', labels, [1] * 11 + [0.5, 1]]],
+        }
+        with open(os.path.join(directory.name, '1.json'), 'w') as file:
+            json.dump(other, file)
+        
+        metrics.registry.inc('http_request_errors_total', (('view', 'task-list-create'),))
+        metrics.registry.observe(
+            'http_request_duration_seconds', (('view', 'task-list-create'),), 0.25
+        )
+        with override_settings(METRICS={'DIRECTORY': directory.name}):
+            text = metrics.render(metrics.collect())
+        self.assertIn('http_request_errors_total{view="task-list-create"} 4', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="task-list-create",le="0.1"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="task-list-create",le="0.25"} 2', text)
+        self.assertIn('http_request_duration_seconds_sum{view="task-list-create"} 0.75', text)
+        self.assertIn('http_request_duration_seconds_count{view="task-list-create"} 2', text)
+        self.assertTrue(os.path.exists(os.path.join(directory.name, f'{os.getpid()}.json')))
+
+
+class QueryBudgetTest(APITestCase):
+    """クエリバジェットのテスト"""
+    
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.url = reverse('task-list-create')
+        # 一覧の上限を 0 に下げる（最初の統計行の読み込みで超える）
+        self.budget = mock.patch.dict(TaskListCreateView.query_budget.methods, {'GET': 0})
+        self.budget.start()
+        self.addCleanup(self.budget.stop)
+    
+    def test_exceeded_raises_with_stack(self):
+        """テストでは上限の超過を発行元のスタックトレース付きで失敗にする"""
+        with enforce_query_budgets(), self.assertLogs('django.request', 'ERROR'), \
+                self.assertRaises(QueryBudgetExceeded) as context:
+            self.client.get(self.url)
+        message = str(context.exception)
+        self.assertIn('(budget 0)', message)
+        self.assertIn(os.path.join('tasks', 'statistics.py'), message)
+        self.assertIn('in load_statistics', message)
+        self.assertNotIn('middleware.py', message)
+    
+    def test_exceeded_logged_at_runtime(self):
+        """実行時は WARNING を記録してレスポンスはそのまま返す"""
+        with override_settings(QUERY_BUDGET={'ENABLED': True}), \
+                self.assertLogs('task_manager.query_budgets', 'WARNING') as logs:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('GET /api/tasks/ (task-list-create)', logs.output[0])
+        self.assertEqual(logs.records[0].budget, 0)
+    
+    def test_unbudgeted_not_counted(self):
+        """認証と統計行の再集計の SQL は上限に含めない（上限は通常のリクエストの件数）"""
+        self.budget.stop()
+        with enforce_query_budgets(), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(len(queries), TaskListCreateView.query_budget.limit('GET'))
+    
+    def test_repeated_queries(self):
+        """パラメーターや IN 句の件数だけが違う SQL の繰り返しを検出（許可したものを除く）"""
+        budget = QueryBudget(allow_duplicates=[r'^INSERT'])
+        queries = [Query('default', sql, []) for sql in [
+            'SELECT * FROM t WHERE id = %s',
+            'SELECT * FROM t WHERE id = %s',
+            'SELECT * FROM t WHERE id IN (%s, %s)',
+            'SELECT * FROM t WHERE id IN (%s)',
+            'INSERT INTO t VALUES (%s)',
+            'INSERT INTO t VALUES (%s)',
+            'SELECT * FROM u',
+        ]]
+        self.assertEqual([description for description, _ in budget.check('GET', queries)], [
+            'repeated 2 times on default: SELECT * FROM t WHERE id = %s',
+            'repeated 2 times on default: SELECT * FROM t WHERE id IN (...)',
+        ])
+
+
+class LoggingPipelineTest(SimpleTestCase):
+    """キュー経由の構造化ログ（task_manager.log）のテスト"""
+    
+    def make_record(self, msg='hello %s', args=('world',), **extra):
+        record = logging.LogRecord('tasks', logging.INFO, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+    
+    def test_json_format(self):
+        """1 行の JSON にリクエストIDと extra を含める"""
+        handler = BoundedQueueHandler(start=False)
+        record = self.make_record(latency_ms=1.5)
+        token = request_id_var.set('abc')
+        try:
+            handler.handle(record)
+        finally:
+            request_id_var.reset(token)
+        line = JSONFormatter().format(handler.queue.get_nowait())
+        self.assertNotIn('\n', line)
+        data = json.loads(line)
+        self.assertEqual(data['msg'], 'hello world')
+        self.assertEqual(data['request_id'], 'abc')
+        self.assertEqual(data['latency_ms'], 1.5)
+    
+    def test_drop_new(self):
+        """満杯のキューには積まず、件数を後で WARNING として出力する"""
+        handler = BoundedQueueHandler(queue_size=2, start=False)
+        for index in range(3):
+            handler.handle(self.make_record(args=(index,)))
+        self.assertEqual(handler.dropped, 1)
+        self.assertEqual(handler.queue.get_nowait().msg, 'hello 0')
+        
+        handler.handle(self.make_record(args=(3,)))
+        messages = [handler.queue.get_nowait().msg for _ in range(2)]
+        self.assertEqual(messages, ['hello 1', 'Log queue full: dropped 1 records'])
+        self.assertEqual(handler.dropped, 1)  # 'hello 3' は入らなかった
+    
+    def test_drop_old(self):
+        """drop_policy='old' では古いレコードを捨てる"""
+        handler = BoundedQueueHandler(queue_size=2, drop_policy='old', start=False)
+        for index in range(3):
+            handler.handle(self.make_record(args=(index,)))
+        messages = [handler.queue.get_nowait().msg for _ in range(2)]
+        self.assertEqual(messages, ['hello 1', 'hello 2'])
+        self.assertEqual(handler.dropped, 1)
+    
+    def test_writes_file(self):
+        """リスナーのスレッドがファイルに書き込み、close で書き出す"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        filename = os.path.join(directory.name, 'app.log')
+        handler = BoundedQueueHandler(filename=filename)
+        handler.handle(self.make_record())
+        handler.handle(self.make_record(msg='second', args=()))
+        handler.close()
+        with open(filename, encoding='utf-8') as file:
+            lines = [json.loads(line) for line in file]
+        self.assertEqual([line['msg'] for line in lines], ['hello world', 'second'])
+    
+    def test_request_id(self):
+        """X-Request-ID を引き継ぎ（不正な値は振り直し）、処理中のログに付ける"""
+        seen = []
+        
+        def view(request):
+            seen.append(request_id_var.get())
+            return HttpResponse()
+        
+        middleware = request_logging_middleware(view)
+        with self.assertLogs('task_manager.request') as logs:
+            response = middleware(RequestFactory().get('/', HTTP_X_REQUEST_ID='req-1'))
+            generated = middleware(RequestFactory().get('/', HTTP_X_REQUEST_ID='bad id'))
+        self.assertEqual(response['X-Request-ID'], 'req-1')
+        self.assertNotEqual(generated['X-Request-ID'], 'bad id')
+        self.assertEqual(seen, ['req-1', generated['X-Request-ID']])
+        self.assertEqual(logs.records[0].status, 200)
+        self.assertIn('latency_ms', vars(logs.records[0]))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(SimpleTestCase):
+    """リードレプリカへの振り分けのテスト"""
+    
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        routers.start_request()
+    
+    def test_reads_go_to_replica(self):
+        """タスクと認証の読み取りはレプリカ、それ以外は既定の振り分け"""
+        self.assertEqual(self.router.db_for_read(Task), 'replica')
+        self.assertEqual(self.router.db_for_read(Token), 'replica')
+        self.assertIsNone(self.router.db_for_read(Session))
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertIsNone(self.router.db_for_read(Task))
+    
+    def test_write_pins_request(self):
+        """書き込み後は同じリクエスト内の読み取りを default に固定"""
+        self.assertEqual(self.router.db_for_write(Task), 'default')
+        self.assertEqual(self.router.db_for_read(Task), 'default')
+        with routers.use_primary():
+            routers.start_request()
+            self.assertEqual(self.router.db_for_read(Task), 'replica')
+    
+    def test_unsafe_method_pinned(self):
+        """POST などのリクエストは最初から default を読む"""
+        seen = []
+        middleware = replica_routing_middleware(
+            lambda request: seen.append(self.router.db_for_read(Task))
+        )
+        middleware(RequestFactory().post('/'))
+        middleware(RequestFactory().get('/'))
+        self.assertEqual(seen, ['default', 'replica'])
+    
+    def test_sticky_after_write(self):
+        """書き込んだユーザーは次のリクエストでも default を読む"""
+        routers.set_user(1)
+        self.router.db_for_write(Task)
+        
+        routers.start_request()
+        routers.set_user(1)
+        self.assertEqual(self.router.db_for_read(Task), 'default')
+        
+        routers.start_request()
+        routers.set_user(2)
+        self.assertEqual(self.router.db_for_read(Task), 'replica')
+
+
+@unittest.skipUnless(
+    'replica' in settings.DATABASES,
+    'DATABASE_REPLICA に 2 つ目の SQLite ファイルを指定した場合のみ実行'
+)
+class ReplicaIntegrationTest(TransactionTestCase):
+    """2 つ目の SQLite ファイルをレプリカとして使う結合テスト（複製はされない）"""
+    
+    databases = {'default', *settings.DATABASE_REPLICAS}
+    
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('task-list-create')
+    
+    def test_read_your_writes(self):
+        """作成直後は default、固定期間が過ぎるとレプリカから読む"""
+        response = self.client.post(self.url, {'title': 'タスク'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        # 認証はレプリカに無いトークンを default で再確認して通る
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 1)
+        
+        # タスクがまだ複製されていないレプリカを再現
+        User.objects.using('replica').create(pk=self.user.pk, username='testuser')
+        TaskStatistics.objects.using('replica').create(user_id=self.user.pk)
+        cache.delete(routers.STICKY_KEY.format(self.user.pk))
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 0)
+        self.assertTrue(queries.captured_queries)
+    
+    def test_read_your_writes_with_session(self):
+        """セッション認証でも書き込み後の読み取りは default に固定される"""
+        client = APIClient()
+        client.force_login(self.user)
+        # セッションのユーザーは振り分けの前に読まれるため、複製済みの状態にする
+        User.objects.using('replica').create(
+            pk=self.user.pk, username='testuser', password=self.user.password
+        )
+        TaskStatistics.objects.using('replica').create(user_id=self.user.pk)
+        
+        response = client.post(self.url, {'title': 'タスク'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNotNone(cache.get(routers.STICKY_KEY.format(self.user.pk)))
+        self.assertEqual(client.get(self.url).data['count'], 1)
+
+
+@override_settings(TASK_SHARDS=['shard0', 'shard1'])
+class TaskShardRouterTest(SimpleTestCase):
+    """ユーザー単位のシャーディングの振り分けのテスト"""
+    
+    def setUp(self):
+        self.router = TaskShardRouter()
+        routers.start_request()
+    
+    def test_shard_for_is_stable(self):
+        """同じユーザーは常に同じシャード、全体では両方に分散"""
+        shards = [sharding.shard_for(user_id) for user_id in range(1, 101)]
+        self.assertEqual(shards, [sharding.shard_for(user_id) for user_id in range(1, 101)])
+        self.assertEqual(set(shards), {'shard0', 'shard1'})
+    
+    def test_route_by_hint_instance_and_request_user(self):
+        """ヒント・インスタンス・リクエストのユーザーの順にシャードを決める"""
+        self.assertIsNone(self.router.db_for_read(Task))
+        self.assertIsNone(self.router.db_for_read(User))
+        
+        routers.set_user(1)
+        self.assertEqual(self.router.db_for_read(Task), sharding.shard_for(1))
+        self.assertEqual(
+            self.router.db_for_write(Task, instance=Task(user_id=2)), sharding.shard_for(2)
+        )
+        self.assertEqual(self.router.db_for_read(TaskChange, user_id=3), sharding.shard_for(3))
+    
+    def test_disabled(self):
+        """TASK_SHARDS が空なら振り分けない"""
+        routers.set_user(1)
+        with override_settings(TASK_SHARDS=[]):
+            self.assertIsNone(self.router.db_for_read(Task))
+            self.assertEqual(sharding.shard_for(1), 'default')
+
+
+@unittest.skipUnless(
+    len(settings.TASK_SHARDS) >= 2,
+    'TASK_SHARD_COUNT に 2 以上を指定した場合のみ実行'
+)
+class TaskShardIntegrationTest(TransactionTestCase):
+    """SQLite ファイルをシャードとして使う結合テスト"""
+    
+    databases = {'default', *settings.TASK_SHARDS}
+    
+    def setUp(self):
+        token_cache.clear()
+        self.clients = {}
+        # 異なるシャードに振り分けられる 2 ユーザー
+        for index in range(1, 100):
+            user = User.objects.create_user(username=f'user{index}', password='testpass123')
+            if sharding.shard_for(user.pk) not in self.clients:
+                client = APIClient()
+                client.credentials(
+                    HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key
+                )
+                self.clients[sharding.shard_for(user.pk)] = (user, client)
+            if len(self.clients) == 2:
+                break
+    
+    def test_tasks_stored_on_user_shard(self):
+        """タスク・統計・変更履歴はユーザーのシャードにだけ保存される"""
+        for shard, (user, client) in self.clients.items():
+            response = client.post(reverse('task-list-create'), {'title': shard})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            response = client.get(reverse('task-statistics'))
+            self.assertEqual(response.data['total_tasks'], 1)
+        
+        for shard, (user, client) in self.clients.items():
+            self.assertEqual(
+                list(Task.objects.using(shard).values_list('title', flat=True)), [shard]
+            )
+            self.assertTrue(TaskChange.objects.using(shard).filter(user=user).exists())
+        self.assertFalse(Task.objects.using('default').exists())
+        self.assertEqual(sharding.aggregate_statistics()['total']['total'], 2)
+    
+    def test_session_authentication(self):
+        """セッション認証のリクエストもユーザーのシャードに振り分ける"""
+        for shard, (user, _) in self.clients.items():
+            client = APIClient()
+            client.force_login(user)
+            response = client.post(reverse('task-list-create'), {'title': shard})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(client.get(reverse('task-statistics')).data['total_tasks'], 1)
+            self.assertEqual(client.get(reverse('task-list-create')).data['count'], 1)
+            self.assertTrue(Task.objects.using(shard).filter(user=user).exists())
+        self.assertFalse(Task.objects.using('default').exists())
+    
+    def test_rebalance(self):
+        """シャードの並びを変えると、ID と変更履歴を保ったまま移動する"""
+        for shard, (user, client) in self.clients.items():
+            client.post(reverse('task-list-create'), {'title': shard})
+        before = {task.pk: task.created_at for task in self.all_tasks()}
+        
+        with override_settings(TASK_SHARDS=list(reversed(settings.TASK_SHARDS))):
+            call_command('rebalance_task_shards', stdout=open(os.devnull, 'w'))
+            for user, client in self.clients.values():
+                self.assertEqual(
+                    Task.objects.using(sharding.shard_for(user.pk)).filter(user=user).count(), 1
+                )
+                response = client.get(reverse('task-changes'))
+                self.assertEqual(len(response.data['changes']), 1)
+                self.assertEqual(response.data['deleted'], [])
+        
+        self.assertEqual({task.pk: task.created_at for task in self.all_tasks()}, before)
+    
+    def test_delete_user(self):
+        """ユーザー削除でシャード上のタスクも削除される"""
+        for shard, (user, client) in self.clients.items():
+            client.post(reverse('task-list-create'), {'title': shard})
+            user.delete()
+            self.assertFalse(Task.objects.using(shard).exists())
+            self.assertFalse(TaskStatistics.objects.using(shard).exists())
+    
+    def all_tasks(self):
+        return [task for shard in settings.TASK_SHARDS for task in Task.objects.using(shard)]
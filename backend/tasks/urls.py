@@ -1,10 +1,15 @@
 # backend/tasks/urls.py
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('', views.TaskListCreateView.as_view(), name='task-list-create'),
+    path('batch/', views.TaskBatchView.as_view(), name='task-batch'),
+    path('export/', views.TaskExportView.as_view(), name='task-export'),
+    path('import/', views.TaskImportView.as_view(), name='task-import'),
     path('<int:pk>/', views.TaskDetailView.as_view(), name='task-detail'),
     path('<int:pk>/toggle/', views.toggle_task_completion, name='task-toggle'),
     path('statistics/', views.task_statistics, name='task-statistics'),
+    path('changes/', views.task_changes, name='task-changes'),
+    path('events/', async_views.task_events, name='task-events'),
 ]
\ No newline at end of file
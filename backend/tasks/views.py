@@ -1,19 +1,50 @@
 # backend/tasks/views.py
 from rest_framework import generics, status, filters
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
-from .models import Task
-from .serializers import TaskSerializer, TaskCreateSerializer, TaskUpdateSerializer
+from django.db import connections, router, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Case, Value, When
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from task_manager.query_budgets import query_budget
+from . import changes, conditional, export, imports, statistics
+from .models import Task, TaskChange
+from .pagination import TaskKeysetPagination
+from .search import TaskSearchFilter
+from .serializers import (
+    TaskSerializer, TaskCreateSerializer, TaskUpdateSerializer, TaskBatchSerializer
+)
 
 
-class TaskListCreateView(generics.ListCreateAPIView):
-    """タスク一覧取得・作成API"""
+# 差分同期 API の 1 回あたりの変更件数
+CHANGES_DEFAULT_LIMIT = 100
+CHANGES_MAX_LIMIT = 1000
+
+# is_completed を反転する式（UPDATE ... SET is_completed = NOT is_completed 相当）
+TOGGLED_COMPLETION = Case(When(is_completed=True, then=Value(False)), default=Value(True))
+
+# SQL の上限（@query_budget）は通常のリクエストの件数
+# 認証と、統計行が無い初回の再集計は数えない（query_budgets.unbudgeted）
+# 件数やパラメーター数の上限で分割される一括処理の SQL は繰り返しを許す
+BULK_TASK_SQL = (
+    r'^SELECT .*\bIN \(\.\.\.\)',
+    r'^INSERT INTO\W+tasks_task(change)?\W',
+    r'^UPDATE\W+tasks_task\W+SET .*\bCASE WHEN\b',
+    r'^DELETE FROM\W+tasks_task\W',
+)
+
+
+class TaskFilterMixin:
+    """タスク一覧の絞り込み・検索・並び替え（一覧とエクスポートで共通）"""
     
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # TaskSearchFilter は関連度順の並び替えを行うため OrderingFilter の後に置く
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, TaskSearchFilter]
     filterset_fields = ['is_completed', 'priority']
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'updated_at', 'due_date', 'priority']
@@ -22,6 +53,22 @@ class TaskListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         """現在ログイン中のユーザーのタスクのみ取得"""
         return Task.objects.filter(user=self.request.user)
+
+
+@query_budget(GET=3, POST=3)
+class TaskListCreateView(TaskFilterMixin, generics.ListCreateAPIView):
+    """タスク一覧取得・作成API"""
+    
+    keyset_pagination_class = TaskKeysetPagination
+    
+    @property
+    def paginator(self):
+        """?pagination=cursor（または cursor）指定時はキーセットページネーションを使用"""
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = self.keyset_pagination_class()
+        return super().paginator
     
     def get_serializer_class(self):
         """メソッドに応じてシリアライザーを切り替え"""
@@ -29,11 +76,86 @@ class TaskListCreateView(generics.ListCreateAPIView):
             return TaskCreateSerializer
         return TaskSerializer
     
+    def list(self, request, *args, **kwargs):
+        """一覧取得（変更が無ければシリアライズせずに 304 を返す）"""
+        etag = conditional.task_validators(
+            request.user, statistics.load_statistics(request.user)
+        )
+        response = conditional.not_modified(request, etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return conditional.set_validators(response, etag)
+    
     def perform_create(self, serializer):
         """タスク作成時にユーザーを自動設定"""
         serializer.save(user=self.request.user)
 
 
+# 本体の SQL はレスポンスを返した後に実行されるため、ビューの SQL は無い
+@query_budget(GET=0)
+class TaskExportView(TaskFilterMixin, generics.GenericAPIView):
+    """タスクのエクスポートAPI（NDJSON / CSV）
+
+    一覧と同じ絞り込み・検索・並び替えを適用した全件を、ページ分割せずに
+    ストリーミングで返す。形式は ?format=ndjson|csv または Accept で指定する。
+    """
+    
+    renderer_classes = [export.NDJSONRenderer, export.CSVRenderer]
+    
+    def get(self, request):
+        queryset = export.export_queryset(self.filter_queryset(self.get_queryset()))
+        renderer = request.accepted_renderer
+        if isinstance(request._request, ASGIRequest):
+            content = export.astream_tasks(queryset, renderer)
+        else:
+            content = export.stream_tasks(queryset, renderer)
+        response = StreamingHttpResponse(
+            content, content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = f'attachment; filename="tasks.{renderer.extension}"'
+        return response
+
+
+# バッチの数だけ INSERT と統計の UPDATE が繰り返される
+@query_budget(allow_duplicates=BULK_TASK_SQL + (r'^UPDATE\W+tasks_taskstatistics\W',))
+class TaskImportView(APIView):
+    """タスクのインポートAPI（NDJSON / CSV）
+
+    リクエスト本文（Content-Type: application/x-ndjson または text/csv）か
+    multipart/form-data の file を 1 行ずつ読み込み、有効な行をまとめて登録する。
+    不正な行は登録せず、行番号とエラーを返す（先頭 imports.MAX_ERRORS 件）。
+    ?dry_run=true の場合は検証のみ行う。
+    """
+    
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    
+    def post(self, request):
+        if request.content_type.startswith('multipart/form-data'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response(
+                    {'file': ['ファイルを指定してください。']},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            fmt = imports.detect_format(upload.content_type, upload.name)
+            lines = upload
+        else:
+            # request.data を使わずに本文を 1 行ずつ読む
+            fmt = imports.detect_format(request.content_type)
+            lines = request.stream or []
+        if fmt is None:
+            return Response(
+                {'error': 'NDJSON（application/x-ndjson）または CSV（text/csv）を指定してください。'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true')
+        importer = imports.TaskImporter(request.user, dry_run=dry_run)
+        return Response(importer.run(imports.read_records(lines, fmt)))
+
+
+@query_budget(4, GET=2)
 class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
     """タスク詳細取得・更新・削除API"""
     
@@ -48,53 +170,267 @@ class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
         if self.request.method in ['PUT', 'PATCH']:
             return TaskUpdateSerializer
         return TaskSerializer
+    
+    def retrieve(self, request, *args, **kwargs):
+        """詳細取得（変更が無ければ 304 を返す）"""
+        etag = conditional.task_validators(
+            request.user, statistics.load_statistics(request.user), kwargs.get('pk')
+        )
+        response = conditional.not_modified(request, etag)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return conditional.set_validators(response, etag)
+
+
+# 1000 件の操作で SQLite のパラメーター数の上限により分割された場合まで
+@query_budget(POST=22, allow_duplicates=BULK_TASK_SQL)
+class TaskBatchView(APIView):
+    """タスク一括操作API
+
+    create / update / delete / toggle を混在させた操作列を受け取り、
+    全件の検証に成功した場合のみ 1 トランザクションでまとめて適用する。
+    """
+    
+    permission_classes = [IsAuthenticated]
+    batch_size = 500
+    
+    def post(self, request):
+        envelope = TaskBatchSerializer(data=request.data)
+        envelope.is_valid(raise_exception=True)
+        operations = envelope.validated_data['operations']
+        
+        ids = [operation['id'] for operation in operations if operation['op'] != 'create']
+        tasks = Task.objects.filter(user=request.user).in_bulk(ids)
+        
+        validated, errors = self.validate_operations(operations, tasks)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        using = router.db_for_write(Task, user_id=request.user.pk)
+        with transaction.atomic(using=using), statistics.batched(), changes.batched():
+            changed = self.apply(request.user, validated)
+        
+        context = {'request': request}
+        results = []
+        for index, operation, task in changed:
+            result = {'index': index, 'op': operation}
+            if operation == 'delete':
+                result['status'] = status.HTTP_204_NO_CONTENT
+            else:
+                result['status'] = (
+                    status.HTTP_201_CREATED if operation == 'create' else status.HTTP_200_OK
+                )
+                result['data'] = TaskSerializer(task, context=context).data
+            results.append(result)
+        return Response({'results': results})
+    
+    def validate_operations(self, operations, tasks):
+        """各操作を既存のシリアライザーで検証"""
+        validated = []
+        errors = []
+        seen = set()
+        for index, operation in enumerate(operations):
+            op = operation['op']
+            error = {'index': index, 'op': op}
+            
+            if op == 'create':
+                serializer = TaskCreateSerializer(data=operation['data'])
+                if serializer.is_valid():
+                    validated.append((index, op, None, serializer.validated_data))
+                else:
+                    errors.append({**error, 'status': status.HTTP_400_BAD_REQUEST,
+                                   'errors': serializer.errors})
+                continue
+            
+            task = tasks.get(operation['id'])
+            if task is None:
+                errors.append({**error, 'status': status.HTTP_404_NOT_FOUND,
+                               'errors': {'id': 'タスクが見つかりません。'}})
+                continue
+            if task.pk in seen:
+                errors.append({**error, 'status': status.HTTP_400_BAD_REQUEST,
+                               'errors': {'id': '同じタスクを複数回操作することはできません。'}})
+                continue
+            seen.add(task.pk)
+            
+            if op == 'update':
+                serializer = TaskUpdateSerializer(task, data=operation['data'], partial=True)
+                if serializer.is_valid():
+                    validated.append((index, op, task, serializer.validated_data))
+                else:
+                    errors.append({**error, 'status': status.HTTP_400_BAD_REQUEST,
+                                   'errors': serializer.errors})
+            else:
+                validated.append((index, op, task, None))
+        return validated, errors
+    
+    def apply(self, user, validated):
+        """bulk_create / bulk_update / DELETE / UPDATE をそれぞれ 1 回ずつ発行"""
+        now = timezone.now()
+        changed = []
+        created = []
+        updated = []
+        update_fields = {'updated_at'}
+        delete_ids = []
+        toggled = []
+        
+        for index, op, task, data in validated:
+            if op == 'create':
+                task = Task(user=user, **data)
+                created.append(task)
+            elif op == 'update':
+                previous = dict(task._loaded_values)
+                for field, value in data.items():
+                    setattr(task, field, value)
+                task.updated_at = now
+                update_fields.update(data)
+                updated.append((task, previous))
+            elif op == 'delete':
+                delete_ids.append(task.pk)
+            else:
+                toggled.append(task)
+            changed.append((index, op, task))
+        
+        if created:
+            Task.objects.bulk_create(created, batch_size=self.batch_size)
+            for task in created:
+                statistics.task_created(task)
+            changes.record(user.pk, [task.pk for task in created])
+        
+        if updated:
+            Task.objects.bulk_update(
+                [task for task, _ in updated], sorted(update_fields), batch_size=self.batch_size
+            )
+            for task, previous in updated:
+                statistics.task_changed(task, previous)
+            changes.record(user.pk, [task.pk for task, _ in updated])
+        
+        if delete_ids:
+            Task.objects.filter(user=user, pk__in=delete_ids).delete()
+        
+        if toggled:
+            # 完了状態の反転は 1 回の UPDATE で行う
+            Task.objects.filter(user=user, pk__in=[task.pk for task in toggled]).update(
+                is_completed=TOGGLED_COMPLETION, updated_at=now
+            )
+            for task in toggled:
+                previous = {'is_completed': task.is_completed, 'priority': task.priority}
+                task.is_completed = not task.is_completed
+                task.updated_at = now
+                statistics.task_changed(task, previous)
+            changes.record(user.pk, [task.pk for task in toggled])
+        
+        return changed
+
+
+def toggle_task(user, pk):
+    """完了状態をユーザー条件付きの 1 回の UPDATE で反転し、更新後のタスクを返す
+
+    RETURNING に対応したバックエンドでは UPDATE の結果をそのまま使い、
+    それ以外では UPDATE 後に 1 回だけ再取得する。該当なしなら None。
+    """
+    now = timezone.now()
+    using = router.db_for_write(Task, user_id=user.pk)
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        if connection.vendor in ('sqlite', 'postgresql') and connection.features.can_return_columns_from_insert:
+            qn = connection.ops.quote_name
+            columns = ', '.join(qn(field.column) for field in Task._meta.concrete_fields)
+            sql = (
+                f'UPDATE {qn(Task._meta.db_table)} '
+                f'SET {qn("is_completed")} = NOT {qn("is_completed")}, {qn("updated_at")} = %s '
+                f'WHERE {qn("id")} = %s AND {qn("user_id")} = %s '
+                f'RETURNING {columns}'
+            )
+            params = [connection.ops.adapt_datetimefield_value(now), pk, user.pk]
+            tasks = list(Task.objects.db_manager(using).raw(sql, params))
+        else:
+            tasks = Task.objects.db_manager(using).filter(pk=pk, user=user)
+            updated = tasks.update(is_completed=TOGGLED_COMPLETION, updated_at=now)
+            tasks = list(tasks) if updated else []
+        
+        if not tasks:
+            return None
+        task = tasks[0]
+        statistics.task_changed(
+            task, {'is_completed': not task.is_completed, 'priority': task.priority}
+        )
+        changes.record(user.pk, [task.pk])
+    return task
 
 
+@query_budget(3)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def toggle_task_completion(request, pk):
     """タスクの完了状態を切り替え"""
-    try:
-        task = Task.objects.get(pk=pk, user=request.user)
-        task.is_completed = not task.is_completed
-        task.save()
-        
-        serializer = TaskSerializer(task)
-        return Response(serializer.data)
-    
-    except Task.DoesNotExist:
+    task = toggle_task(request.user, pk)
+    if task is None:
         return Response(
             {'error': 'タスクが見つかりません。'},
             status=status.HTTP_404_NOT_FOUND
         )
+    
+    serializer = TaskSerializer(task, context={'request': request})
+    return Response(serializer.data)
 
 
+@query_budget(1)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def task_statistics(request):
-    """タスク統計API"""
-    user_tasks = Task.objects.filter(user=request.user)
-    
-    total_tasks = user_tasks.count()
-    completed_tasks = user_tasks.filter(is_completed=True).count()
-    pending_tasks = total_tasks - completed_tasks
+    """タスク統計API（ユーザーごとの集計カウンターから 1 クエリで取得）"""
+    row = statistics.load_statistics(request.user)
+    etag = conditional.statistics_validators(row)
+    response = conditional.not_modified(request, etag)
+    if response is None:
+        response = Response(statistics.statistics_data(row))
+    return conditional.set_validators(response, etag)
+
+
+# タスクの取得は in_bulk がパラメーター数の上限で分割する
+@query_budget(3, allow_duplicates=BULK_TASK_SQL[:1])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def task_changes(request):
+    """差分同期API
+
+    since（前回レスポンスの next_token）より後に作成・更新されたタスクと、
+    削除されたタスクの ID（トゥームストーン）を変更順に最大 limit 件分返す。
+    since を省略すると最初から同期する。
+    next_token より前の変更が後から見えることは無い前提で、SQLite でのみ成り立つ
+    （tasks.changes を参照）。
+    """
+    try:
+        since = int(request.query_params.get('since', 0))
+        limit = int(request.query_params.get('limit', CHANGES_DEFAULT_LIMIT))
+        if since < 0 or limit < 1:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {'error': 'since と limit には 0 以上（limit は 1 以上）の整数を指定してください。'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    limit = min(limit, CHANGES_MAX_LIMIT)
     
-    # 優先度別統計
-    priority_stats = {}
-    for priority, _ in Task.PRIORITY_CHOICES:
-        priority_stats[priority] = user_tasks.filter(priority=priority).count()
+    entries = list(
+        TaskChange.objects.filter(user=request.user, id__gt=since)
+        .order_by('id').values_list('id', 'task_id')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
     
-    # 期限切れタスク
-    from django.utils import timezone
-    overdue_tasks = user_tasks.filter(
-        due_date__lt=timezone.now(),
-        is_completed=False
-    ).count()
+    task_ids = list(dict.fromkeys(task_id for _, task_id in entries))
+    tasks = Task.objects.filter(user=request.user).in_bulk(task_ids) if task_ids else {}
+    context = {'request': request}
     
     return Response({
-        'total_tasks': total_tasks,
-        'completed_tasks': completed_tasks,
-        'pending_tasks': pending_tasks,
-        'overdue_tasks': overdue_tasks,
-        'priority_stats': priority_stats,
-    })
\ No newline at end of file
+        'changes': [
+            TaskSerializer(tasks[task_id], context=context).data
+            for task_id in task_ids if task_id in tasks
+        ],
+        'deleted': [task_id for task_id in task_ids if task_id not in tasks],
+        'next_token': str(entries[-1][0] if entries else since),
+        'has_more': has_more,
+    })
+